@@ -1,12 +1,14 @@
-from modules.logger_setup import setup_logger
+from modules.logger_setup import get_logger
 import json
-from typing import List, Tuple
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
 from pydantic import BaseModel, field_validator
 import warnings
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 # Set up logger specifically for embeddings
-logger = setup_logger(log_dir="logs/create_embeddings")
+logger = get_logger(__name__)
 
 import nltk
 import pandas as pd
@@ -51,13 +53,44 @@ class ReviewInput(BaseModel):
         return v
 
 
+# Stage names recorded by analyze_reviews(timings=...), in execution order
+ANALYSIS_STAGES = (
+    "preprocess",
+    "corpus",
+    "lda",
+    "tfidf",
+    "hdbscan",
+    "label_assignment",
+    "sentiment",
+    "summaries",
+    "json",
+)
+
+
+@contextmanager
+def _timed(timings: Optional[dict], stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+_english_stopwords = None
+
+
 def _preprocess_text(texts):
+    global _english_stopwords
+    if _english_stopwords is None:
+        # stopwords.words() rebuilds the list on every call
+        _english_stopwords = set(stopwords.words("english"))
     preprocessed_texts = [
         [
             word
             for word in word_tokenize(document.lower())
             if word.isalpha()
-            and word not in stopwords.words("english")
+            and word not in _english_stopwords
             and word not in additional_stopwords
         ]
         for document in texts
@@ -65,6 +98,23 @@ def _preprocess_text(texts):
     return preprocessed_texts
 
 
+def _build_corpus(preprocessed_texts):
+    dictionary = corpora.Dictionary(preprocessed_texts)
+    corpus = [dictionary.doc2bow(text) for text in preprocessed_texts]
+    return dictionary, corpus
+
+
+def _train_lda(dictionary, corpus, num_topics):
+    return models.LdaModel(
+        corpus=corpus,
+        id2word=dictionary,
+        num_topics=num_topics,
+        random_state=42,
+        passes=20,  # Increase passes
+        iterations=150,  # Increase iterations
+    )
+
+
 def _get_tfidf_embeddings(sentences, vectorizer=None):
     if vectorizer is None:
         vectorizer = TfidfVectorizer(max_df=0.85, min_df=2, ngram_range=(1, 2))
@@ -83,6 +133,30 @@ def _calculate_center(df):
     return centers
 
 
+def _cluster_embeddings(embeddings):
+    clusterer = HDBSCAN(
+        min_cluster_size=2,
+        min_samples=2,
+        metric="euclidean",
+        cluster_selection_method="leaf",
+        prediction_data=True,
+    )
+    clusterer.fit(embeddings)
+    return clusterer.labels_
+
+
+def _assign_cluster_labels(centers, label_embeddings, threshold=0.5):
+    assigned_labels = {}
+    for cluster_id, centroid in centers.items():
+        similarities = cosine_similarity([centroid], label_embeddings)[0]
+        assigned_labels[cluster_id] = [
+            i for i, sim in enumerate(similarities) if sim > threshold
+        ]
+        if not assigned_labels[cluster_id]:
+            assigned_labels[cluster_id] = [np.argmax(similarities)]
+    return assigned_labels
+
+
 def _find_closest_sentence(df, centers):
     closest_sentences = {}
     for cluster, center in centers.items():
@@ -114,12 +188,57 @@ def _get_combined_categories(ldamodel, num_topics, num_keywords=5):
     return most_common_keywords
 
 
-def analyze_reviews(reviews: List[str]) -> Tuple[dict, dict]:
+def score_sentiment(reviews: List[str]) -> Tuple[List[float], List[float]]:
+    """
+    Score each review with TextBlob, scaled to the 0-5 range used across Opinio.
+
+    Returns:
+        Tuple[List[float], List[float]]: Sentiments and polarities, one per review.
+    """
+    scores = [TextBlob(review).sentiment for review in reviews]
+    sentiments = [score[0] * 2.5 + 2.5 for score in scores]
+    polarities = [score[1] * 2.5 + 2.5 for score in scores]
+    return sentiments, polarities
+
+
+def _summarize_categories(df):
+    categories_summaries_sentiments = defaultdict(list)
+    categories_summaries_polarities = defaultdict(list)
+    for i, row in df.iterrows():
+        for label in row["named_labels"]:
+            categories_summaries_sentiments[label].append(row["sentiment"])
+            categories_summaries_polarities[label].append(row["polarity"])
+    df_summaries = pd.DataFrame(
+        {
+            "Category": categories_summaries_sentiments.keys(),
+            "Average Sentiment": [
+                np.mean(vals) for vals in categories_summaries_sentiments.values()
+            ],
+            "Average Polarity": [
+                np.mean(vals) for vals in categories_summaries_polarities.values()
+            ],
+        }
+    )
+
+    # Convert all int64 and float64 in summaries DataFrame
+    for col in ["Average Sentiment", "Average Polarity"]:
+        df_summaries[col] = (
+            df_summaries[col]
+            .astype(float)
+            .apply(lambda x: x.item() if isinstance(x, (np.int64, np.float64)) else x)
+        )
+    return df_summaries
+
+
+def analyze_reviews(
+    reviews: List[str], timings: Optional[dict] = None
+) -> Tuple[dict, dict]:
     """
     Analyze a list of reviews to extract topics, sentiments, and polarities.
 
     Args:
         reviews (List[str]): A list of review strings.
+        timings (Optional[dict]): If given, filled with seconds spent per stage (see ANALYSIS_STAGES).
 
     Returns:
         Tuple[dict, dict]: A tuple containing two JSON objects:
@@ -130,113 +249,78 @@ def analyze_reviews(reviews: List[str]) -> Tuple[dict, dict]:
     ReviewInput(reviews=reviews)
 
     logger.info("Starting review analysis")
-    preprocessed_reviews = _preprocess_text(reviews)
-    dictionary = corpora.Dictionary(preprocessed_reviews)
-    corpus = [dictionary.doc2bow(text) for text in preprocessed_reviews]
+    with _timed(timings, "preprocess"):
+        preprocessed_reviews = _preprocess_text(reviews)
+    with _timed(timings, "corpus"):
+        dictionary, corpus = _build_corpus(preprocessed_reviews)
     num_topics = 10  # Increase the number of topics
-    lda_model = models.LdaModel(
-        corpus=corpus,
-        id2word=dictionary,
-        num_topics=num_topics,
-        random_state=42,
-        passes=20,  # Increase passes
-        iterations=150,  # Increase iterations
-    )
-    labels = _get_combined_categories(lda_model, num_topics)
+    with _timed(timings, "lda"):
+        lda_model = _train_lda(dictionary, corpus, num_topics)
+        labels = _get_combined_categories(lda_model, num_topics)
     processed_reviews = [" ".join(text) for text in preprocessed_reviews]
     df = pd.DataFrame(reviews, columns=["Sentences"])
     df["processed_sentences"] = processed_reviews
     label_texts = [" ".join([label, "review is"]) for label in labels]
 
     # Use the same TF-IDF vectorizer for both reviews and label texts
-    embeddings, vectorizer = _get_tfidf_embeddings(processed_reviews)
-    label_embeddings, _ = _get_tfidf_embeddings(label_texts, vectorizer)
+    with _timed(timings, "tfidf"):
+        embeddings, vectorizer = _get_tfidf_embeddings(processed_reviews)
+        label_embeddings, _ = _get_tfidf_embeddings(label_texts, vectorizer)
 
     df["tfidf_embeddings"] = list(embeddings)  # Ensure embeddings are added as a list
-    clusterer = HDBSCAN(
-        min_cluster_size=2,
-        min_samples=2,
-        metric="euclidean",
-        cluster_selection_method="leaf",
-        prediction_data=True,
-    )
-    clusterer.fit(embeddings)
-    df["Cluster"] = clusterer.labels_
-    centers = _calculate_center(df)
-    threshold = 0.5  # Lower the threshold to allow more categories
-    assigned_labels = {}
-    for cluster_id, centroid in centers.items():
-        similarities = cosine_similarity([centroid], label_embeddings)[0]
-        assigned_labels[cluster_id] = [
-            i for i, sim in enumerate(similarities) if sim > threshold
-        ]
-        if not assigned_labels[cluster_id]:
-            assigned_labels[cluster_id] = [np.argmax(similarities)]
+    with _timed(timings, "hdbscan"):
+        df["Cluster"] = _cluster_embeddings(embeddings)
 
-    df["assigned_label"] = df["Cluster"].map(assigned_labels)
+    with _timed(timings, "label_assignment"):
+        centers = _calculate_center(df)
+        # Lower the threshold to allow more categories
+        assigned_labels = _assign_cluster_labels(centers, label_embeddings, 0.5)
 
-    # Create a dictionary to map indices to labels
-    label_dict = {i: label for i, label in enumerate(labels)}
+        df["assigned_label"] = df["Cluster"].map(assigned_labels)
 
-    # Apply the mapping with a check for iterable values
-    df["named_labels"] = df["assigned_label"].apply(
-        lambda x: [label_dict[num] for num in x] if isinstance(x, list) else []
-    )
-
-    sentiments = [TextBlob(review).sentiment[0] * 2.5 + 2.5 for review in reviews]
-    polarities = [TextBlob(review).sentiment[1] * 2.5 + 2.5 for review in reviews]
-    df["sentiment"] = sentiments
-    df["polarity"] = polarities
+        # Create a dictionary to map indices to labels
+        label_dict = {i: label for i, label in enumerate(labels)}
 
-    # Convert all int64 and float64 to standard Python types
-    for col in ["sentiment", "polarity"]:
-        df[col] = (
-            df[col]
-            .astype(float)
-            .apply(lambda x: x.item() if isinstance(x, (np.int64, np.float64)) else x)
+        # Apply the mapping with a check for iterable values
+        df["named_labels"] = df["assigned_label"].apply(
+            lambda x: [label_dict[num] for num in x] if isinstance(x, list) else []
         )
 
+    with _timed(timings, "sentiment"):
+        sentiments, polarities = score_sentiment(reviews)
+        df["sentiment"] = sentiments
+        df["polarity"] = polarities
+
+        # Convert all int64 and float64 to standard Python types
+        for col in ["sentiment", "polarity"]:
+            df[col] = (
+                df[col]
+                .astype(float)
+                .apply(
+                    lambda x: x.item() if isinstance(x, (np.int64, np.float64)) else x
+                )
+            )
+
     df.drop(
         columns=["tfidf_embeddings", "processed_sentences", "Sentences", "Cluster"],
         inplace=True,
     )
 
-    categories_summaries_sentiments = defaultdict(list)
-    categories_summaries_polarities = defaultdict(list)
-    for i, row in df.iterrows():
-        for label in row["named_labels"]:
-            categories_summaries_sentiments[label].append(row["sentiment"])
-            categories_summaries_polarities[label].append(row["polarity"])
-    df_summaries = pd.DataFrame(
-        {
-            "Category": categories_summaries_sentiments.keys(),
-            "Average Sentiment": [
-                np.mean(vals) for vals in categories_summaries_sentiments.values()
-            ],
-            "Average Polarity": [
-                np.mean(vals) for vals in categories_summaries_polarities.values()
-            ],
-        }
-    )
-
-    # Convert all int64 and float64 in summaries DataFrame
-    for col in ["Average Sentiment", "Average Polarity"]:
-        df_summaries[col] = (
-            df_summaries[col]
-            .astype(float)
-            .apply(lambda x: x.item() if isinstance(x, (np.int64, np.float64)) else x)
-        )
+    with _timed(timings, "summaries"):
+        df_summaries = _summarize_categories(df)
 
     # Convert DataFrames to JSON
-    df_json = df.to_json(
-        orient="records"
-    )  # Convert processed reviews DataFrame to JSON
-    df_summaries_json = df_summaries.to_json(
-        orient="records"
-    )  # Convert summaries DataFrame to JSON
+    with _timed(timings, "json"):
+        df_json = df.to_json(
+            orient="records"
+        )  # Convert processed reviews DataFrame to JSON
+        df_summaries_json = df_summaries.to_json(
+            orient="records"
+        )  # Convert summaries DataFrame to JSON
+        analyzed, summaries = json.loads(df_json), json.loads(df_summaries_json)
 
     logger.info("Review analysis completed")
-    return json.loads(df_json), json.loads(df_summaries_json)  # Return JSON objects
+    return analyzed, summaries  # Return JSON objects
 
 
 if __name__ == "__main__":
@@ -4,14 +4,14 @@ import time
 import uuid
 from flask import jsonify
 import pandas as pd
-import requests
 import numpy as np
-from modules.logger_setup import setup_logger
+from modules import http_client
+from modules.logger_setup import get_logger
 from pydantic import BaseModel, Field, ValidationError
 from datetime import datetime
 from modules.create_embeddings import analyze_reviews
 
-logger = setup_logger(log_dir="logs/fetch_reviews")
+logger = get_logger(__name__)
 
 
 class BrokenReviewsApi(Exception):
@@ -65,12 +65,14 @@ def fetch_reviews(business_id, n_reviews, retries=3):
             logger.info(
                 f"Fetching page {page} (attempt {attempt + 1}) with params: {params}"
             )
-            response = requests.get(url, headers=headers, params=params)
-            logger.debug(f"Response status code: {response.status_code}")
+            response = http_client.get(
+                url, headers=headers, params=params, max_retries=0
+            )
+            logger.debug("Response status code: %s", response.status_code)
             if response.status_code == 200:
                 try:
                     reviews_data = response.json()
-                    logger.debug(f"Response JSON: {reviews_data}")
+                    logger.debug("Response JSON: %s", reviews_data)
                     data = reviews_data.get("data", {})
                     reviews = data.get("reviews", [])
                     total_reviews = data.get("total", 0)
@@ -90,7 +92,7 @@ def fetch_reviews(business_id, n_reviews, retries=3):
                         try:
                             validated_review = Review(**review_entry)
                             reviews_list.append(validated_review.dict())
-                            logger.debug(f"Validated review: {validated_review.dict()}")
+                            logger.debug("Validated review: %s", validated_review)
                         except ValidationError as e:
                             logger.error(f"Validation error: {e}")
 
@@ -1,46 +1,157 @@
+import atexit
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
 import os
-from datetime import datetime
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from datetime import datetime, timezone
 
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for the classic format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
 
-def setup_logger(log_dir="logs", log_level=logging.INFO):
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_lock = threading.Lock()
+_state = {"pid": None, "listener": None, "handler": None}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON, including any `extra` fields.
     """
-    Sets up a logger that logs messages to a specified directory with daily log files.
 
-    Parameters:
-    log_dir (str): The directory where log files will be stored.
-    log_level (int): The logging level (e.g., logging.INFO, logging.DEBUG).
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Merges the message arguments and traceback in the calling thread (the
+    only state that may change later), leaving formatting to the listener.
     """
-    # Create log directory if it doesn't exist
-    os.makedirs(log_dir, exist_ok=True)
 
-    # Configure the logger
-    logger = logging.getLogger()
-    logger.setLevel(log_level)
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # logging.shutdown() closes handlers; drain the queue to disk first
+        with _lock:
+            if _state["handler"] is self:
+                _stop_listener()
+        super().close()
+
+
+def configure_logging(log_dir=LOG_DIR, log_level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """
+    Configures logging once per process.
+
+    The root logger gets a queue handler, and a background QueueListener
+    writes to `<log_dir>/app.log` (rotated daily), so callers never wait on
+    disk I/O. Calling it again in the same process is a no-op; a forked child
+    (RQ work horse, gunicorn worker) gets its own listener.
+    """
+    with _lock:
+        if _state["pid"] == os.getpid():
+            return
+        _stop_listener()
+
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = TimedRotatingFileHandler(
+            os.path.join(log_dir, "app.log"),
+            when="midnight",
+            interval=1,
+            backupCount=30,  # Keep logs for 30 days
+            encoding="utf-8",
+        )
+        if log_format == "json":
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(
+                logging.Formatter(
+                    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+                )
+            )
+
+        log_queue = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+
+        root = logging.getLogger()
+        if _state["handler"] is not None:
+            root.removeHandler(_state["handler"])
+        root.addHandler(handler)
+        root.setLevel(log_level)
 
-    # Remove existing handlers to avoid duplicates
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
-
-    # Create formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-
-    # Create file handler with TimedRotatingFileHandler
-    log_file = os.path.join(log_dir, "app.log")
-    file_handler = TimedRotatingFileHandler(
-        log_file,
-        when="midnight",
-        interval=1,
-        backupCount=30,  # Keep logs for 30 days
-        encoding="utf-8",
-    )
-    file_handler.setLevel(log_level)
-    file_handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(file_handler)
+        _state.update(pid=os.getpid(), listener=listener, handler=handler)
 
+
+def _stop_listener():
+    listener = _state["listener"]
+    _state["listener"] = None
+    # A listener inherited through fork has no running thread in this process
+    if listener is not None and _state["pid"] == os.getpid():
+        listener.stop()
+
+
+def _reset_after_fork():
+    # The parent's lock and listener thread do not survive the fork
+    global _lock
+    _lock = threading.Lock()
+    if _state["pid"] is not None:
+        _state["pid"] = None
+        configure_logging()
+
+
+atexit.register(lambda: _stop_listener())
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_logger(name):
+    """
+    Returns the named logger, configuring process-wide logging on first use.
+    """
+    configure_logging()
+    return logging.getLogger(name)
+
+
+def setup_logger(log_dir="logs", log_level=logging.INFO):
+    """
+    Kept for existing callers: returns a logger named after `log_dir`.
+
+    Logging is configured once per process (see configure_logging); the
+    directory now only names the logger, e.g. "logs/analyze" -> "analyze".
+
+    Parameters:
+    log_dir (str): Used to derive the logger name.
+    log_level (int): The logging level for this logger.
+    """
+    logger = get_logger(os.path.basename(os.path.normpath(log_dir)) or "opinio")
+    logger.setLevel(log_level)
     return logger
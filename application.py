@@ -1,16 +1,27 @@
 import json
-import os
 import time
 import uuid
-from flask import Flask, jsonify, request, Response
+from flask import Flask, jsonify, request, Response, stream_with_context
 from openai import AzureOpenAI  # Change this import
-import requests
 from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from connectors.insights_jobs import request_insights
 from connectors.publish import publish_job_status
-from connectors.worker_tasks import initial_onboarding, poll_new_reviews, resume_fetch
+from connectors.worker_tasks import (
+    initial_onboarding,
+    poll_new_reviews,
+    rebuild_stats,
+    resume_fetch,
+)
 import redis
 from modules.fetch_reviews import fetch_and_analyze_yelp_reviews, fetch_reviews
 from connectors.factory import ConnectorFactory
+from connectors.rate_limiter import rapidapi_limiter
+from connectors.yelp import RAPIDAPI_BASE_URL
+from connectors.checkpoint import CheckpointStore
+from connectors.dedup import ReviewDedupIndex
+from connectors.near_duplicates import NearDuplicateIndex
 from models.models import (
     InboxModel,
     ReviewModel,
@@ -18,10 +29,14 @@ from models.models import (
     ConnectionModel,
     CompanyModel,
     JobModel,
+    JobTimingsModel,
     InboxEditorModel,  # Make sure this import is added
 )
-from modules.generate_insights import generate_insights_for_company
-from modules.logger_setup import setup_logger
+from modules import llm_gateway, metrics, profiling
+from modules.ai_responses import generate_response, stream_response
+from modules.company_stats import COMPANY_STATS_DEFAULT_WEEKS, company_stats
+from modules import inbox_index
+from modules.logger_setup import get_logger
 
 from models.status_constants import status_constants
 from flask_cors import CORS
@@ -36,8 +51,12 @@ import logging
 logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
 
+logger = get_logger("application")
+
 app = Flask(__name__)
 CORS(app)
+profiling.init_app(app)
+metrics.init_app(app)
 
 redis_conn = redis.Redis()
 q = Queue("default", connection=redis_conn)
@@ -49,6 +68,11 @@ def home():
     return "Welcome to the Flask App!"
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/status", methods=["GET"])
 def status():
     return jsonify({"status": "Opinio is working!"})
@@ -71,8 +95,7 @@ def add_connection():
     request_data = request.get_json()
     try:
         if request_data:
-            logger = setup_logger(log_dir="logs/manage_connections")
-            logger.info(f"Adding connection:{json.dumps(request_data)}")
+            logger.info("Adding connection: %s", request_data)
             # Create the desired object structure
             connector = {
                 "type": request_data["name"],  # Use the name for type
@@ -103,11 +126,10 @@ def add_connection():
 
 @app.route("/remove_connection", methods=["POST"])
 def remove_connection():
-    logger = setup_logger(log_dir="logs/manage_connections")
     request_data = request.get_json()
 
     if request_data:
-        logger.info(f"Removing connection: {json.dumps(request_data)}")
+        logger.info("Removing connection: %s", request_data)
         user_id = request_data.get("user_id")
         connector_type = request_data.get("type")
         if not connector_type:  # Check if 'type' is present
@@ -116,16 +138,34 @@ def remove_connection():
         company_id = request_data.get("company_id")
 
         company = CompanyModel.get_company_by_id(company_id)
+        removed = next(
+            (c for c in company.connectors or [] if c.type == connector_type), None
+        )
         result = company.remove_connector(
             connector_type, user_id
         )  # Call the remove_connector methodc
+        if result["status"] == "success":
+            # Removed reviews must be ingested again if the connector comes back
+            ReviewDedupIndex(company_id).clear()
+            # Drop the removed reviews from the rollups
+            q.enqueue(rebuild_stats, company_id, job_timeout=1800)
+            # Rebuilt from the remaining reviews on the next inbox query
+            inbox_index.clear_company_index(company_id)
+            # Removed representatives must not group later reviews
+            NearDuplicateIndex(company_id).clear()
+            # A resumed fetch must not skip the reviews that were just deleted
+            try:
+                business_id = removed.config["business_id"]
+            except (AttributeError, KeyError, TypeError):
+                business_id = None
+            if business_id:
+                CheckpointStore().clear(company_id, business_id)
 
         return jsonify(result), 200
 
 
 @app.route("/reviews", methods=["POST"])
 def sync_reviews_wrapper():
-    logger = setup_logger(log_dir="logs/ingest_reviews")
     request_data = request.get_json()
     user_connectors = request_data.get("connectors", None)
     user_id = request_data.get("user_id", None)
@@ -271,17 +311,7 @@ def job_status_webhook():
             # Send the initial job status or a "no job" message
             most_recent_job = JobModel.get_most_recent_job(company_id)
             if most_recent_job:
-                job_data = {
-                    "job_id": most_recent_job.job_id,
-                    "company_id": most_recent_job.company_id,
-                    "connector_type": most_recent_job.connector_type,
-                    "status": most_recent_job.status,
-                    "total_reviews_fetched": most_recent_job.total_reviews_fetched,
-                    "last_sync": most_recent_job.last_sync,
-                    "error_message": most_recent_job.error_message,
-                    "created_at": most_recent_job.created_at,
-                    "updated_at": most_recent_job.updated_at,
-                }
+                job_data = most_recent_job.to_dict()
             else:
                 job_data = {"status": "no_job", "message": "No recent jobs found"}
 
@@ -296,17 +326,7 @@ def job_status_webhook():
                         most_recent_job = JobModel.get_most_recent_job(company_id)
                         pubsub.subscribe(channel)
                         if most_recent_job:
-                            job_data = {
-                                "job_id": most_recent_job.job_id,
-                                "company_id": most_recent_job.company_id,
-                                "connector_type": most_recent_job.connector_type,
-                                "status": most_recent_job.status,
-                                "total_reviews_fetched": most_recent_job.total_reviews_fetched,
-                                "last_sync": most_recent_job.last_sync,
-                                "error_message": most_recent_job.error_message,
-                                "created_at": most_recent_job.created_at,
-                                "updated_at": most_recent_job.updated_at,
-                            }
+                            job_data = most_recent_job.to_dict()
                             yield f"data: {json.dumps(job_data)}\n\n"
 
                 else:
@@ -342,17 +362,7 @@ def get_most_recent_job():
                 404,
             )
 
-        job_data = {
-            "job_id": job.job_id,
-            "company_id": job.company_id,
-            "connector_type": job.connector_type,
-            "status": job.status,
-            "total_reviews_fetched": job.total_reviews_fetched,
-            "last_sync": job.last_sync,
-            "error_message": job.error_message,
-            "created_at": job.created_at,
-            "updated_at": job.updated_at,
-        }
+        job_data = job.to_dict()
 
         return jsonify({"status": "success", "job": job_data}), 200
 
@@ -360,6 +370,38 @@ def get_most_recent_job():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route("/job_timings", methods=["GET"])
+def get_job_timings():
+    company_id = request.args.get("company_id")
+
+    if not company_id:
+        return jsonify({"status": "error", "message": "Company ID is required"}), 400
+
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+
+    try:
+        history = JobTimingsModel.fetch_history(
+            company_id, limit=limit, since=request.args.get("since")
+        )
+        return jsonify(
+            {"status": "success", "data": [item.to_dict() for item in history]}
+        )
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/rapidapi_quota", methods=["GET"])
+def get_rapidapi_quota():
+    try:
+        usage = rapidapi_limiter(base_url=RAPIDAPI_BASE_URL).usage()
+        return jsonify({"status": "success", "data": usage}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @app.route("/get_inbox_reviews", methods=["GET"])
 def get_inbox_reviews():
     company_id = request.args.get("company_id")
@@ -369,6 +411,9 @@ def get_inbox_reviews():
         request.args.get("page_size", 10)
     )  # Get the number of items per page, default to 10
 
+    if any(request.args.get(name) for name in INBOX_FILTER_PARAMS):
+        return search_inbox_reviews(company_id, user_id, page, per_page)
+
     reviews = list(InboxModel.fetch_inbox_items_by_user_id(user_id))
 
     if not len(reviews):
@@ -410,6 +455,75 @@ def get_inbox_reviews():
     return jsonify(response), 200
 
 
+INBOX_FILTER_PARAMS = (
+    "label",
+    "rating",
+    "platform",
+    "q",
+    "unread",
+    "starred",
+    "date_from",
+    "date_to",
+    "sort",
+)
+
+
+def _list_arg(name):
+    value = request.args.get(name)
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def _flag_arg(name):
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+
+def search_inbox_reviews(company_id, user_id, page, per_page):
+    """
+    Filtered/searched inbox page, served from the inbox index.
+
+    Filters: label, rating, platform (comma-separated alternatives), q
+    (keywords, all must match), unread, starred, date_from, date_to (ISO
+    dates), sort ("newest" or "oldest").
+    """
+    if not company_id or not user_id:
+        return (
+            jsonify(
+                {"status": "error", "message": "company_id and user_id are required"}
+            ),
+            400,
+        )
+
+    try:
+        review_ids, total = inbox_index.search(
+            company_id,
+            user_id,
+            labels=_list_arg("label"),
+            ratings=_list_arg("rating"),
+            platforms=_list_arg("platform"),
+            query=request.args.get("q"),
+            unread=_flag_arg("unread"),
+            starred=_flag_arg("starred"),
+            date_from=request.args.get("date_from"),
+            date_to=request.args.get("date_to"),
+            newest_first=request.args.get("sort", "newest") != "oldest",
+            page=page,
+            per_page=per_page,
+        )
+        reviews = InboxModel.fetch_inbox_items(user_id, review_ids)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    response = {
+        "status": "success",
+        "reviews": [review.to_simple_dict() for review in reviews],
+        "total_reviews": total,
+        "page": page,
+        "per_page": per_page,
+    }
+
+    return jsonify(response), 200
+
+
 @app.route("/update_inbox_item", methods=["POST"])
 def update_inbox_item():
     request_data = request.get_json()
@@ -443,6 +557,9 @@ def update_inbox_item():
             inbox_item.labels = labels
 
         inbox_item.save()  # Assuming there's a save method to persist changes
+        inbox_index.set_user_flags(
+            user_id, review_id, is_read=is_read, is_starred=is_starred
+        )
 
         return (
             jsonify(
@@ -530,53 +647,80 @@ def generate_ai_response():
             200,
         )
 
+    except llm_gateway.LLMBusyError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except llm_gateway.LLMError as e:
+        return jsonify({"status": "error", "message": str(e)}), 502
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-def generate_response(review_text):
-    # Configuration
-    API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": API_KEY,
-    }
+@app.route("/generate_ai_response/stream", methods=["GET", "POST"])
+def generate_ai_response_stream():
+    """
+    Streams the AI response as server-sent events while it is generated.
 
-    # Payload for the request
-    payload = {
-        "messages": [
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "You are a customer service representative responding to a review.",
-                    }
-                ],
-            },
-            {"role": "user", "content": review_text},
-        ],
-        "temperature": 0.7,
-        "top_p": 0.95,
-        "max_tokens": 800,
-    }
+    Sends `data: {"delta": ...}` per chunk, then an `event: done` carrying the
+    full response once it is saved to the inbox item, or an `event: error`.
+    Accepts query parameters (for EventSource) or a JSON body.
+    """
+    data = request.get_json(silent=True) or request.args
 
-    ENDPOINT = "https://opinio.openai.azure.com/openai/deployments/4o-mini/chat/completions?api-version=2024-02-15-preview"
+    review_id = data.get("review_id")
+    user_id = data.get("user_id")
 
-    # Send request
-    try:
-        response = requests.post(ENDPOINT, headers=headers, json=payload)
-        response.raise_for_status()  # Will raise an HTTPError if the HTTP request returned an unsuccessful status code
-    except requests.RequestException as e:
-        raise SystemExit(f"Failed to make the request. Error: {e}")
-
-    # Handle the response
-    return (
-        response.json()
-        .get("choices", [{}])[0]
-        .get("message", {})
-        .get("content", "")
-        .strip()
+    if not review_id or not user_id:
+        return (
+            jsonify(
+                {"status": "error", "message": "Review ID and User ID are required"}
+            ),
+            400,
+        )
+
+    inbox_item = InboxModel.fetch_inbox_item_by_user_id_and_review_id(
+        user_id, review_id
+    )
+
+    if not inbox_item:
+        return jsonify({"status": "error", "message": "Review not found"}), 404
+
+    review_text = inbox_item.review_text
+
+    if not review_text:
+        return jsonify({"status": "error", "message": "Review text is required"}), 400
+
+    def event_stream():
+        pieces = []
+        try:
+            for piece in stream_response(review_text):
+                pieces.append(piece)
+                yield f"data: {json.dumps({'delta': piece})}\n\n"
+
+            ai_response = "".join(pieces).strip()
+            # Only the response changes; a full save() would overwrite edits
+            # made to the item while the stream was running
+            inbox_item.update(actions=[InboxModel.ai_response.set(ai_response)])
+
+            done = {
+                "ai_response": ai_response,
+                "review_id": review_id,
+                "user_id": user_id,
+            }
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        except llm_gateway.LLMBusyError as e:
+            yield f"event: error\ndata: {json.dumps({'status': 503, 'message': str(e)})}\n\n"
+        except llm_gateway.LLMError as e:
+            yield f"event: error\ndata: {json.dumps({'status': 502, 'message': str(e)})}\n\n"
+        except Exception as e:
+            logger.exception("Streaming AI response failed for review %s", review_id)
+            yield f"event: error\ndata: {json.dumps({'status': 500, 'message': str(e)})}\n\n"
+
+    return Response(
+        # Keeps the request context (and its metrics label) while streaming
+        stream_with_context(event_stream()),
+        content_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -696,27 +840,87 @@ def generate_insights():
         )
 
     try:
-        insights = generate_insights_for_company(company_id)
+        # Runs in the worker; requests made while a job is in flight join it
+        job_id, joined = request_insights(company_id, q)
 
         return (
             jsonify(
                 {
-                    "status": "success",
-                    "data": insights,
+                    "status": "accepted",
+                    "data": {
+                        "job_id": job_id,
+                        "joined": joined,
+                        "status_channel": f"job_status:{company_id}",
+                    },
                 }
             ),
-            200,
+            202,
         )
 
     except Exception as e:
         return (
             jsonify(
-                {"status": "error", "message": f"Failed to generate insights: {str(e)}"}
+                {"status": "error", "message": f"Failed to queue insights: {str(e)}"}
             ),
             500,
         )
 
 
+@app.route("/insights_job", methods=["GET"])
+def get_insights_job():
+    job_id = request.args.get("job_id")
+
+    if not job_id:
+        return jsonify({"status": "error", "message": "Job ID is required"}), 400
+
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    job_data = {"job_id": job.id, "status": job.get_status()}
+    if job.is_finished:
+        job_data["result"] = job.result
+    elif job.is_failed:
+        job_data["message"] = "Insights job failed"
+    return jsonify({"status": "success", "job": job_data}), 200
+
+
+@app.route("/company_stats", methods=["GET"])
+def get_company_stats():
+    company_id = request.args.get("company_id")
+
+    if not company_id:
+        return jsonify({"status": "error", "message": "Company ID is required"}), 400
+
+    try:
+        weeks = int(request.args.get("weeks", COMPANY_STATS_DEFAULT_WEEKS))
+    except ValueError:
+        return jsonify({"status": "error", "message": "weeks must be an integer"}), 400
+    if not 1 <= weeks <= 520:
+        return (
+            jsonify({"status": "error", "message": "weeks must be between 1 and 520"}),
+            400,
+        )
+
+    try:
+        return jsonify({"status": "success", "data": company_stats(company_id, weeks)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/rebuild_company_stats", methods=["POST"])
+def rebuild_company_stats_wrapper():
+    data = request.json
+    company_id = data.get("company_id")
+
+    if not company_id:
+        return jsonify({"status": "error", "message": "Company ID is required"}), 400
+
+    job = q.enqueue(rebuild_stats, company_id, job_timeout=1800)
+    return jsonify({"status": "accepted", "data": {"job_id": job.id}}), 202
+
+
 @app.route("/fetch_insights", methods=["GET"])
 def fetch_insights():
     company_id = request.args.get("company_id")
@@ -0,0 +1,160 @@
+"""
+Per-stage micro-benchmarks for `analyze_reviews`.
+
+Times each analysis stage (see modules.create_embeddings.ANALYSIS_STAGES) on
+synthetic corpora of several sizes and compares the medians with a stored
+baseline. The run exits non-zero when a stage got slower than the baseline by
+more than --max-regression percent.
+
+    python -m benchmarks.analysis_benchmark                    # check against baseline
+    python -m benchmarks.analysis_benchmark --update-baseline  # record a new baseline
+
+A missing baseline is a failure when CI is set (or with --require-baseline),
+so the gate cannot pass silently; record one on the reference machine.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.corpus import synthetic_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "analysis.json")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = (50, 225, 1000)
+MAX_REGRESSION_PCT = float(os.getenv("ANALYSIS_BENCH_MAX_REGRESSION", 25))
+# Stages faster than this in the baseline are too noisy to gate on
+MIN_GATED_SECONDS = float(os.getenv("ANALYSIS_BENCH_MIN_SECONDS", 0.01))
+
+
+def run_sizes(sizes, repeats: int, seed: int) -> dict:
+    """
+    Returns {size: {stage: median seconds}} plus a `total` entry per size.
+    """
+    from modules.create_embeddings import ANALYSIS_STAGES, analyze_reviews
+
+    results = {}
+    for size in sizes:
+        corpus = synthetic_corpus(size, seed)
+        # Warm-up run so lazy imports and NLTK corpora loading are not timed
+        analyze_reviews(corpus[: min(size, 50)])
+
+        runs = []
+        for _ in range(repeats):
+            timings = {}
+            analyze_reviews(corpus, timings=timings)
+            runs.append(timings)
+
+        medians = {
+            stage: round(statistics.median(run.get(stage, 0.0) for run in runs), 4)
+            for stage in ANALYSIS_STAGES
+        }
+        medians["total"] = round(
+            statistics.median(sum(run.values()) for run in runs), 4
+        )
+        results[str(size)] = medians
+        print(f"{size:>6} reviews: {json.dumps(medians)}", flush=True)
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, max_regression_pct: float):
+    regressions = []
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if before is None or before < MIN_GATED_SECONDS:
+                continue
+            change_pct = (seconds - before) / before * 100
+            if change_pct > max_regression_pct:
+                regressions.append(
+                    {
+                        "size": int(size),
+                        "stage": stage,
+                        "baseline_seconds": before,
+                        "seconds": seconds,
+                        "change_pct": round(change_pct, 1),
+                    }
+                )
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION_PCT)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--require-baseline",
+        action="store_true",
+        default=os.getenv("CI", "").lower() not in ("", "0", "false"),
+        help="Fail when no baseline exists (default when CI is set)",
+    )
+    args = parser.parse_args()
+
+    results = run_sizes(args.sizes, args.repeats, args.seed)
+    report = {
+        "benchmark": "analysis",
+        "git_commit": git_commit(),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "config": {"repeats": args.repeats, "seed": args.seed},
+        "results": results,
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output_path = os.path.join(
+        RESULTS_DIR,
+        f"analysis_{datetime.datetime.utcnow():%Y%m%dT%H%M%S}_{report['git_commit']}.json",
+    )
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated at {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(
+            f"No baseline at {args.baseline}; run with --update-baseline to record one"
+        )
+        if args.require_baseline:
+            sys.exit(1)
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(
+        results, baseline.get("results", {}), args.max_regression
+    )
+    if regressions:
+        print(
+            f"{len(regressions)} stage(s) regressed more than {args.max_regression}% "
+            f"against baseline {baseline.get('git_commit')}:"
+        )
+        for regression in regressions:
+            print(f"  {json.dumps(regression)}")
+        sys.exit(1)
+    print(f"No stage regressed more than {args.max_regression}% against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Synthetic review corpus for the analysis benchmarks.
+
+Reviews are assembled from a few topics (staff, equipment, cleanliness, ...)
+with a positive or negative slant, so topic modelling and clustering see
+roughly the structure of real gym/restaurant reviews. Output is deterministic
+for a given size and seed.
+"""
+
+import random
+from typing import List
+
+TOPICS = {
+    "staff": (
+        ["staff", "trainer", "front desk", "manager", "coach"],
+        ["friendly", "helpful", "knowledgeable", "welcoming", "attentive"],
+        ["rude", "dismissive", "slow", "unprofessional", "absent"],
+    ),
+    "equipment": (
+        ["equipment", "machines", "weights", "treadmills", "squat racks"],
+        ["modern", "well maintained", "plentiful", "top notch", "varied"],
+        ["broken", "outdated", "crowded", "rusty", "missing"],
+    ),
+    "cleanliness": (
+        ["locker room", "showers", "floors", "bathrooms", "mats"],
+        ["spotless", "clean", "fresh", "tidy", "sanitized"],
+        ["dirty", "smelly", "sticky", "filthy", "neglected"],
+    ),
+    "pricing": (
+        ["membership", "price", "fees", "contract", "day pass"],
+        ["affordable", "fair", "worth it", "transparent", "reasonable"],
+        ["overpriced", "hidden", "expensive", "confusing", "unfair"],
+    ),
+    "classes": (
+        ["classes", "yoga", "spin", "schedule", "instructors"],
+        ["energetic", "fun", "challenging", "motivating", "organized"],
+        ["cancelled", "boring", "packed", "chaotic", "repetitive"],
+    ),
+}
+
+TEMPLATES = (
+    "The {noun} {verb} {adjective}.",
+    "I found the {noun} really {adjective} every time I visited.",
+    "Honestly the {noun} {verb} {adjective} and that matters to me.",
+    "{Noun} {verb} {adjective}, which I did not expect.",
+)
+
+FILLER = (
+    "I come here three times a week.",
+    "Parking can be tricky in the evening.",
+    "Been a member for two years now.",
+    "Would tell my friends about it.",
+    "Open late which suits my schedule.",
+)
+
+
+def synthetic_review(rng: random.Random) -> str:
+    sentences = []
+    for topic in rng.sample(sorted(TOPICS), rng.randint(1, 3)):
+        nouns, positive, negative = TOPICS[topic]
+        noun = rng.choice(nouns)
+        adjective = rng.choice(positive if rng.random() < 0.65 else negative)
+        verb = "are" if noun.endswith("s") else "is"
+        template = rng.choice(TEMPLATES)
+        sentences.append(
+            template.format(
+                noun=noun, Noun=noun.capitalize(), verb=verb, adjective=adjective
+            )
+        )
+    if rng.random() < 0.5:
+        sentences.append(rng.choice(FILLER))
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+
+
+def synthetic_corpus(n_reviews: int, seed: int = 0) -> List[str]:
+    """
+    Returns `n_reviews` synthetic review texts.
+    """
+    rng = random.Random(seed)
+    return [synthetic_review(rng) for _ in range(n_reviews)]
@@ -0,0 +1,359 @@
+"""
+End-to-end ingest throughput benchmark.
+
+Drives `/reviews` initial and poll jobs through the Flask app against DynamoDB
+Local (`docker-compose up -d`), a local Redis and the RapidAPI stand-in
+(modules/rapidapi_standin.py), which this script starts itself. Each company
+size runs in its own process so peak RSS is measured per size.
+
+    python -m benchmarks.ingest_benchmark --sizes 100 1000 10000
+
+Results are written as JSON to benchmarks/results/ so they can be diffed
+across commits, e.g. with `--compare benchmarks/results/<previous>.json`.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = (100, 1000, 10000)
+
+
+def percentile(values, pct: float) -> float:
+    """
+    Nearest-rank percentile, good enough for a handful of job latencies.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class DynamoCallCounter:
+    """
+    Counts the DynamoDB operations PynamoDB dispatches while it is installed.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self):
+        from pynamodb.connection.base import Connection
+
+        self._original = Connection.dispatch
+        counter = self
+
+        def dispatch(connection, operation_name, *args, **kwargs):
+            with counter._lock:
+                counter.calls[operation_name] += 1
+            return counter._original(connection, operation_name, *args, **kwargs)
+
+        Connection.dispatch = dispatch
+        return self
+
+    def uninstall(self):
+        from pynamodb.connection.base import Connection
+
+        if self._original is not None:
+            Connection.dispatch = self._original
+            self._original = None
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.calls)
+
+
+def ensure_tables():
+    from models.models import (
+        CompanyModel,
+        CompanyStatsModel,
+        InboxModel,
+        JobModel,
+        JobTimingsModel,
+        ReviewModel,
+    )
+
+    for model in (
+        CompanyModel,
+        JobModel,
+        JobTimingsModel,
+        ReviewModel,
+        InboxModel,
+        CompanyStatsModel,
+    ):
+        if not model.exists():
+            model.create_table(
+                read_capacity_units=10, write_capacity_units=10, wait=True
+            )
+
+
+def create_company(company_id: str, business_id: str):
+    from models.models import CompanyModel
+
+    company = CompanyModel(
+        company_id=company_id,
+        company_name=f"Benchmark {company_id}",
+        industry_id="benchmark",
+        country="CA",
+        city="Toronto",
+        connectors=[
+            {
+                "type": "Yelp",
+                "config": {"business_id": business_id},
+                "last_sync": None,
+            }
+        ],
+    )
+    company.save()
+    return company
+
+
+def delete_company_data(company_id: str, user_id: str):
+    from connectors.dedup import ReviewDedupIndex
+    from models.models import CompanyModel, InboxModel, JobModel, ReviewModel
+
+    for model, hash_key in (
+        (ReviewModel, company_id),
+        (InboxModel, user_id),
+        (JobModel, company_id),
+    ):
+        with model.batch_write() as batch:
+            for item in model.query(hash_key):
+                batch.delete(item)
+    try:
+        CompanyModel.get(company_id).delete()
+    except CompanyModel.DoesNotExist:
+        pass
+    ReviewDedupIndex(company_id).clear()
+
+
+def post_reviews(client, company_id: str, user_id: str, action: str) -> float:
+    start = time.perf_counter()
+    response = client.post(
+        "/reviews",
+        json={"company_id": company_id, "user_id": user_id, "action": action},
+    )
+    elapsed = time.perf_counter() - start
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f"/reviews {action} failed with {response.status_code}: {response.get_data(as_text=True)}"
+        )
+    return elapsed
+
+
+def run_size(size: int, repeats: int, polls: int, keep_data: bool) -> dict:
+    """
+    Runs `repeats` onboardings of a `size`-review company, each followed by
+    `polls` poll jobs, and returns the measurements. Called in a child process.
+    """
+    from application import app
+    from models.models import ReviewModel
+
+    ensure_tables()
+    counter = DynamoCallCounter().install()
+    client = app.test_client()
+
+    initial_latencies, poll_latencies = [], []
+    reviews_ingested = 0
+    initial_calls, poll_calls = Counter(), Counter()
+    try:
+        for run in range(repeats):
+            company_id = f"bench-{size}-{uuid.uuid4().hex[:8]}"
+            user_id = f"bench-user-{company_id}"
+            create_company(company_id, f"synthetic-{size}-{run}")
+            try:
+                before = counter.snapshot()
+                initial_latencies.append(
+                    post_reviews(client, company_id, user_id, "initial")
+                )
+                initial_calls += counter.snapshot() - before
+
+                for _ in range(polls):
+                    before = counter.snapshot()
+                    poll_latencies.append(
+                        post_reviews(client, company_id, user_id, "poll")
+                    )
+                    poll_calls += counter.snapshot() - before
+
+                reviews_ingested += ReviewModel.count(company_id)
+            finally:
+                if not keep_data:
+                    delete_company_data(company_id, user_id)
+    finally:
+        counter.uninstall()
+
+    initial_seconds = sum(initial_latencies)
+    return {
+        "size": size,
+        "repeats": repeats,
+        "reviews_ingested": reviews_ingested,
+        "reviews_per_sec": (
+            round(reviews_ingested / initial_seconds, 2) if initial_seconds else 0.0
+        ),
+        "initial_job_seconds": {
+            "p50": round(percentile(initial_latencies, 50), 3),
+            "p99": round(percentile(initial_latencies, 99), 3),
+            "mean": round(statistics.fmean(initial_latencies), 3),
+        },
+        "poll_job_seconds": {
+            "p50": round(percentile(poll_latencies, 50), 3),
+            "p99": round(percentile(poll_latencies, 99), 3),
+        },
+        "dynamodb_calls_per_review": (
+            round(sum(initial_calls.values()) / reviews_ingested, 3)
+            if reviews_ingested
+            else None
+        ),
+        "dynamodb_calls": {
+            "initial": dict(initial_calls),
+            "poll": dict(poll_calls),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def start_standin(port: int):
+    from werkzeug.serving import make_server
+
+    from modules.rapidapi_standin import create_app
+
+    server = make_server("127.0.0.1", port, create_app(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous.get('git_commit')} ({previous_path}):")
+    for size, result in current["results"].items():
+        before = previous.get("results", {}).get(size)
+        if not before:
+            continue
+        for metric in ("reviews_per_sec", "dynamodb_calls_per_review", "peak_rss_mb"):
+            old, new = before.get(metric), result.get(metric)
+            if old and new is not None:
+                print(
+                    f"  {size:>6} {metric:<26} {old:>10} -> {new:<10} ({(new - old) / old:+.1%})"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--polls", type=int, default=3)
+    parser.add_argument("--standin-port", type=int, default=8090)
+    parser.add_argument("--output", help="Result file, defaults to benchmarks/results/")
+    parser.add_argument("--compare", help="Previous result file to diff against")
+    parser.add_argument("--keep-data", action="store_true")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        result = run_size(args.run_size, args.repeats, args.polls, args.keep_data)
+        print(json.dumps(result))
+        return
+
+    server = start_standin(args.standin_port)
+    env = dict(
+        os.environ,
+        RAPIDAPI_BASE_URL=f"http://127.0.0.1:{args.standin_port}",
+        RAPIDAPI_KEY=os.getenv("BENCH_RAPIDAPI_KEY", "benchmark"),
+        RAPIDAPI_RATE_PER_SEC=os.getenv("BENCH_RAPIDAPI_RATE_PER_SEC", "1000"),
+        RAPIDAPI_BURST=os.getenv("BENCH_RAPIDAPI_BURST", "1000"),
+    )
+    results = {}
+    try:
+        for size in args.sizes:
+            env["ONBOARDING_REVIEWS"] = str(size)
+            command = [
+                sys.executable,
+                "-m",
+                "benchmarks.ingest_benchmark",
+                "--run-size",
+                str(size),
+                "--repeats",
+                str(args.repeats),
+                "--polls",
+                str(args.polls),
+            ]
+            if args.keep_data:
+                command.append("--keep-data")
+            print(f"Benchmarking {size} reviews x {args.repeats}...", flush=True)
+            output = subprocess.run(
+                command, env=env, check=True, capture_output=True, text=True
+            ).stdout
+            # The app prints while importing; the result is the last line
+            results[str(size)] = json.loads(output.strip().splitlines()[-1])
+            print(json.dumps(results[str(size)], indent=2), flush=True)
+    finally:
+        server.shutdown()
+
+    report = {
+        "benchmark": "ingest",
+        "git_commit": git_commit(),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "config": {
+            "repeats": args.repeats,
+            "polls": args.polls,
+            "env": {
+                name: os.environ[name]
+                for name in (
+                    "YELP_FETCH_CONCURRENCY",
+                    "INGEST_PIPELINE_ENABLED",
+                    "PIPELINE_ANALYSIS_BATCH",
+                    "PIPELINE_PERSIST_WORKERS",
+                    "STANDIN_LATENCY_MS",
+                    "STANDIN_RATE_429",
+                    "STANDIN_RATE_5XX",
+                )
+                if name in os.environ
+            },
+        },
+        "results": results,
+    }
+    output_path = args.output or os.path.join(
+        RESULTS_DIR,
+        f"ingest_{datetime.datetime.utcnow():%Y%m%dT%H%M%S}_{report['git_commit']}.json",
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,40 @@
 import json
 import pandas as pd
-from connectors.base_review import ReviewEntry
-from models.models import InboxModel, ReviewModel
-from modules.create_embeddings import analyze_reviews
-from modules.logger_setup import setup_logger
+import redis
+from rq import Queue
+from connectors.base_review import ReviewRecord
+from connectors.checkpoint import AnalysisState
+from connectors.dedup import IngestStatus
+from connectors.near_duplicates import NEAR_DUP_ENABLED, NearDuplicateIndex
+from connectors.pipeline import INGEST_PIPELINE_ENABLED, run_pipeline
+from connectors.publish import publish_job_status
+from models.models import InboxModel, JobStatus, ReviewModel
+from modules.ai_responses import AI_DRAFTS_ENABLED, AI_DRAFTS_QUEUE
+from modules.company_stats import record_reviews
+from modules.create_embeddings import analyze_reviews, score_sentiment
+from modules.inbox_index import index_reviews
+from modules.logger_setup import get_logger
 from typing import List, Optional
+import os
 
-logger = setup_logger(log_dir="logs/analyze")
+logger = get_logger(__name__)
+
+redis_conn = redis.Redis()
+drafts_queue = Queue(AI_DRAFTS_QUEUE, connection=redis_conn)
+
+# Analyze all onboarding reviews as one batch, so they share one topic model.
+# When false, onboarding is analyzed in PIPELINE_ANALYSIS_BATCH slices that
+# overlap with the fetch but each get labels from their own topic model.
+ONBOARDING_SINGLE_TOPIC_MODEL = (
+    os.getenv("ONBOARDING_SINGLE_TOPIC_MODEL", "true").lower() == "true"
+)
 
 
 class Analyzer:
     def __init__(self, connector):
         self.connector = connector
+        self.timings = connector.timings
+        self.near_duplicates = NearDuplicateIndex(connector.company_id)
         self.table_name = "Reviews"  # Replace with your DynamoDB table name
 
     def initial_onboarding(self, config, user_id, n_reviews: int = 300):
@@ -30,7 +53,15 @@ class Analyzer:
         )
 
         try:
-            reviews_list = self.connector.fetch_historical_reviews(n_reviews)
+            reviews_list, result = self._fetch_and_process(
+                lambda on_window: self.connector.fetch_historical_reviews(
+                    n_reviews, on_window=on_window
+                ),
+                user_id,
+                analysis_batch_size=(
+                    n_reviews if ONBOARDING_SINGLE_TOPIC_MODEL else None
+                ),
+            )
             if not reviews_list:
                 return {
                     "status": 400,
@@ -40,7 +71,7 @@ class Analyzer:
             logger.error("Failed to fetch historical reviews.", exc_info=True)
             return {"status": 400, "message": "Failed to fetch historical reviews."}
 
-        return self._process_reviews(reviews_list, user_id)
+        return result
 
     def poll_new_reviews(self, config, user_id, last_sync: Optional[str] = ""):
         """
@@ -56,7 +87,12 @@ class Analyzer:
         logger.info(f"Polling for new reviews for config {config} since {last_sync}")
 
         try:
-            reviews_list = self.connector.fetch_new_reviews(last_sync)
+            reviews_list, result = self._fetch_and_process(
+                lambda on_window: self.connector.fetch_new_reviews(
+                    last_sync, on_window=on_window
+                ),
+                user_id,
+            )
             if not reviews_list:
                 return {
                     "status": 200,
@@ -66,7 +102,7 @@ class Analyzer:
             logger.error("Failed to fetch new reviews.", exc_info=True)
             return {"status": 400, "message": "Failed to fetch new reviews."}
 
-        return self._process_reviews(reviews_list, user_id)
+        return result
 
     def resume_fetch(self, config, user_id):
         """
@@ -79,76 +115,393 @@ class Analyzer:
             dict: A dictionary containing status and data or error message.
         """
         logger.info(f"Resuming fetch for config {config}")
+        totals = {"total_fetched": 0}
 
-        try:
-            reviews_list, total_fetched = self.connector.resume_fetch(
-                config.business_id
+        def fetch(on_window):
+            reviews_list, totals["total_fetched"] = self.connector.resume_fetch(
+                config.business_id, on_window=on_window
             )
+            return reviews_list
+
+        try:
+            reviews_list, result = self._fetch_and_process(fetch, user_id)
             if not reviews_list:
                 return {
                     "status": 200,
-                    "message": f"No new reviews found. Total fetched: {total_fetched}",
+                    "message": f"No new reviews found. Total fetched: {totals['total_fetched']}",
                 }
         except Exception as e:
             logger.error("Failed to resume fetching reviews.", exc_info=True)
             return {"status": 400, "message": "Failed to resume fetching reviews."}
 
-        result = self._process_reviews(reviews_list, user_id)
-        result["total_fetched"] = total_fetched
+        result["total_fetched"] = totals["total_fetched"]
         return result
 
-    def _process_reviews(self, reviews_list: List[ReviewEntry], user_id: str):
+    def _fetch_and_process(
+        self, fetch, user_id: str, analysis_batch_size: Optional[int] = None
+    ):
+        """
+        Run `fetch(on_window)` and analyze/persist the reviews it yields.
+
+        With the ingest pipeline enabled, windows are analyzed and persisted
+        while later pages are still being fetched. Otherwise everything is
+        processed in one batch once the fetch completes.
+
+        If a pipeline batch fails, the job is marked failed and the checkpoint
+        is not advanced, so a resume fetches the dropped reviews again.
+
+        Args:
+            analysis_batch_size (Optional[int]): Reviews per analysis batch
+                (each fits its own topic model); defaults to PIPELINE_ANALYSIS_BATCH.
+
+        Returns:
+            Tuple[list, Optional[dict]]: The fetched reviews and the processing result.
+        """
+        if not INGEST_PIPELINE_ENABLED:
+            reviews_list = self._timed_fetch(fetch, None)
+            if not reviews_list:
+                return reviews_list, None
+            return reviews_list, self._process_reviews(reviews_list, user_id)
+
+        options = {}
+        if analysis_batch_size:
+            options["analysis_batch_size"] = analysis_batch_size
+        reviews_list, saved_reviews, errors, metrics = run_pipeline(
+            lambda on_window: self._timed_fetch(fetch, on_window),
+            self._analyze_batch,
+            lambda batch: self._persist_batch(batch, user_id),
+            **options,
+        )
+        # Wall time of a pipelined fetch includes waiting on downstream stages
+        self.timings.add("fetch", seconds=metrics["fetch"]["busy_seconds"])
+        if not reviews_list:
+            return reviews_list, None
+        if errors:
+            # Remember what was saved, but keep the page cursor for a resume
+            self.connector.update_checkpoint(
+                AnalysisState.ANALYZING, persisted_reviews=saved_reviews
+            )
+            message = (
+                f"{len(reviews_list) - len(saved_reviews)} of {len(reviews_list)} "
+                f"reviews were not processed (failed batches: {errors}); resume the fetch to retry."
+            )
+            self._fail_job(message)
+            return reviews_list, {
+                "status": 500,
+                "message": message,
+                "pipeline": metrics,
+            }
+        self.connector.update_checkpoint(
+            AnalysisState.PERSISTED, persisted_reviews=saved_reviews
+        )
+        return reviews_list, {"status": 200, "data": reviews_list, "pipeline": metrics}
+
+    def _fail_job(self, error_message: str):
+        logger.error("Job %s failed: %s", self.connector.job_id, error_message)
+        self.connector.job.update_status(
+            JobStatus.FAILED.value, error_message=error_message
+        )
+        publish_job_status(
+            self.connector.company_id,
+            {
+                "job_id": self.connector.job_id,
+                "status": JobStatus.FAILED.value,
+                "error_message": error_message,
+            },
+        )
+
+    def _timed_fetch(self, fetch, on_window):
+        with self.timings.stage("fetch", track_time=on_window is None):
+            reviews_list = fetch(on_window)
+        self.timings.add("fetch", items=len(reviews_list or []))
+        return reviews_list
+
+    def _process_reviews(self, reviews_list: List[ReviewRecord], user_id: str):
         """
         Process the fetched reviews: analyze them and save to DynamoDB.
 
         Args:
-            reviews_list (List[ReviewEntry]): List of reviews to process.
+            reviews_list (List[ReviewRecord]): List of reviews to process.
             user_id (str): The user ID associated with the reviews.
         Returns:
             dict: A dictionary containing status and processed reviews.
         """
-        reviews_text = [review.review_text for review in reviews_list]
+        self.connector.update_checkpoint(AnalysisState.ANALYZING)
+        self._analyze_batch(reviews_list)
+        saved_reviews = self._persist_batch(reviews_list, user_id)
+        self.connector.update_checkpoint(
+            AnalysisState.PERSISTED, persisted_reviews=saved_reviews
+        )
 
-        # Analyze the reviews
-        analyzed_reviews, summaries = analyze_reviews(reviews_text)
+        return {"status": 200, "data": reviews_list}
 
-        # Update the original reviews with analysis results
-        for i, review in enumerate(reviews_list):
-            for key, value in analyzed_reviews[i].items():
-                if not hasattr(review, key):
-                    setattr(review, key, value)
+    def _analyze_batch(self, reviews_list: List[ReviewRecord]):
+        """
+        Analysis stage: run topic/sentiment analysis on the new reviews of a batch.
 
-        # Save analyzed reviews to DynamoDB
-        self.save_to_dynamodb(reviews_list, user_id)
+        Near-duplicates of earlier reviews or of each other skip topic
+        modelling: they take the topic labels of their group's representative,
+        and only their sentiment is scored. Changed reviews are left for the
+        cheap re-analysis done at persist time.
+        """
+        new_reviews = [
+            review
+            for review in reviews_list
+            if review.ingest_status != IngestStatus.CHANGED
+        ]
+        duplicates, representatives = [], {}
+        if new_reviews and NEAR_DUP_ENABLED:
+            with self.timings.stage("near_duplicates", items=len(new_reviews)):
+                groups = self.near_duplicates.assign(new_reviews)
+            duplicates = [r for r in new_reviews if r.review_id in groups]
+            new_reviews = [r for r in new_reviews if r.review_id not in groups]
 
-        return {"status": 200, "data": reviews_list}
+            representatives = {review.review_id: review for review in new_reviews}
+            earlier = {r.duplicate_of for r in duplicates} - set(representatives)
+            stored = (
+                ReviewModel.fetch_analysis_results(self.connector.company_id, earlier)
+                if earlier
+                else {}
+            )
+            representatives.update(stored)
+            missing = earlier - set(stored)
+            if missing:
+                # Indexed but never persisted (or removed since): not representatives
+                self.near_duplicates.discard(missing)
+                for review in duplicates:
+                    if review.duplicate_of in missing:
+                        review.duplicate_of = None
+                        new_reviews.append(review)
+                duplicates = [r for r in duplicates if r.duplicate_of is not None]
+
+        if new_reviews:
+            reviews_text = [review.review_text for review in new_reviews]
+
+            # Analyze the reviews
+            stage_seconds = {}
+            analyzed_reviews, summaries = analyze_reviews(
+                reviews_text, timings=stage_seconds
+            )
+            self.timings.add_analysis(stage_seconds, len(new_reviews))
+
+            # Write the analysis results straight into the records
+            for review, analysis in zip(new_reviews, analyzed_reviews):
+                review.assigned_label = analysis.get("assigned_label") or []
+                review.named_labels = analysis.get("named_labels") or []
+                review.sentiment = analysis.get("sentiment")
+                review.polarity = analysis.get("polarity")
+
+        if duplicates:
+            # Representatives from this batch are analyzed by now
+            self._copy_labels(duplicates, representatives)
+            # Near-duplicates can still differ in tone ("best" vs "worst")
+            with self.timings.stage("sentiment", items=len(duplicates)):
+                sentiments, polarities = score_sentiment(
+                    [review.review_text for review in duplicates]
+                )
+            for review, sentiment, polarity in zip(duplicates, sentiments, polarities):
+                review.sentiment = sentiment
+                review.polarity = polarity
+        return reviews_list
+
+    @staticmethod
+    def _copy_labels(duplicates: List[ReviewRecord], representatives: dict):
+        """
+        Copies topic labels to duplicates from their representative in
+        `representatives` (review_id -> record or stored review).
+        """
+        for review in duplicates:
+            source = representatives[review.duplicate_of]
+            review.assigned_label = list(source.assigned_label or [])
+            review.named_labels = list(source.named_labels or [])
+
+    def _persist_batch(self, reviews_list: List[ReviewRecord], user_id: str):
+        """
+        Persist stage: save new reviews, update changed ones and record them as ingested.
+
+        Returns:
+            list: The reviews that were persisted.
+        """
+        with self.timings.stage("persist", items=len(reviews_list)):
+            new_reviews = [
+                review
+                for review in reviews_list
+                if review.ingest_status != IngestStatus.CHANGED
+            ]
+            changed_reviews = [
+                review
+                for review in reviews_list
+                if review.ingest_status == IngestStatus.CHANGED
+            ]
+
+            saved_reviews = []
+            if new_reviews:
+                # Save analyzed reviews to DynamoDB
+                saved_reviews = self.save_to_dynamodb(new_reviews, user_id)
+            if changed_reviews:
+                saved_reviews += self._reanalyze_changed(changed_reviews, user_id)
+
+            self.connector.dedup_index.record(saved_reviews)
+            try:
+                index_reviews(self.connector.company_id, saved_reviews)
+            except Exception:
+                # The reviews are saved; a later rebuild picks them up
+                logger.warning("Could not update the inbox index", exc_info=True)
+            if NEAR_DUP_ENABLED:
+                try:
+                    self.near_duplicates.add_persisted(saved_reviews)
+                except Exception:
+                    # Later near-duplicates of these reviews are analyzed themselves
+                    logger.warning(
+                        "Could not update the near-duplicate index", exc_info=True
+                    )
+        if AI_DRAFTS_ENABLED:
+            self._enqueue_drafts(saved_reviews, user_id)
+        return saved_reviews
+
+    def _enqueue_drafts(self, saved_reviews: List[ReviewRecord], user_id: str):
+        """
+        Queues AI draft pre-generation for the new reviews of a persisted batch.
+
+        Runs as its own job so LLM latency never holds up ingest.
+        """
+        review_ids = [
+            review.review_id
+            for review in saved_reviews
+            if review.ingest_status != IngestStatus.CHANGED
+        ]
+        if not review_ids:
+            return
+        try:
+            drafts_queue.enqueue(
+                "connectors.worker_tasks.pregenerate_ai_drafts",
+                user_id,
+                review_ids,
+                job_timeout=1800,
+            )
+        except redis.RedisError:
+            logger.warning(
+                "Could not queue AI drafts for %d reviews",
+                len(review_ids),
+                exc_info=True,
+            )
+
+    def _reanalyze_changed(self, reviews: List[ReviewRecord], user_id: str):
+        """
+        Cheap path for reviews edited since they were ingested: keep the topic
+        labels already stored and only rescore sentiment and polarity. Rating
+        and sentiment changes are moved in the rollups.
+
+        Returns:
+            list: The reviews that were updated successfully.
+        """
+        sentiments, polarities = score_sentiment([r.review_text for r in reviews])
+        updated_reviews, previous = [], {}
+        for review, sentiment, polarity in zip(reviews, sentiments, polarities):
+            try:
+                stored = ReviewModel.fetch_review_by_comp_id_review_id(
+                    review.company_id, review.review_id
+                )
+                if stored is None:
+                    logger.warning(
+                        "Changed review %s is not stored, skipping re-analysis",
+                        review.review_id,
+                    )
+                    continue
+                review.assigned_label = stored.assigned_label
+                review.named_labels = stored.named_labels
+                review.sentiment = sentiment
+                review.polarity = polarity
+                # update() refreshes `stored`, so keep what the rollups counted
+                counted = {
+                    "review_date": stored.review_date,
+                    "named_labels": list(stored.named_labels or []),
+                    "sentiment": stored.sentiment,
+                    "rating": stored.rating,
+                }
+                stored.update(
+                    actions=[
+                        ReviewModel.review_text.set(review.review_text),
+                        ReviewModel.rating.set(str(int(review.rating))),
+                        ReviewModel.sentiment.set(sentiment),
+                        ReviewModel.polarity.set(polarity),
+                    ]
+                )
+
+                inbox_item = InboxModel.fetch_inbox_item_by_user_id_and_review_id(
+                    user_id, review.review_id
+                )
+                if inbox_item:
+                    inbox_item.update(
+                        actions=[
+                            InboxModel.review_text.set(review.review_text),
+                            InboxModel.rating.set(str(int(review.rating))),
+                        ]
+                    )
+                updated_reviews.append(review)
+                previous[review.review_id] = counted
+            except Exception as e:
+                logger.error("Error re-analyzing review %s: %s", review.review_id, e)
+        record_reviews(self.connector.company_id, updated_reviews, previous)
+        return updated_reviews
 
     def save_to_dynamodb(self, reviews, user_id):
+        """
+        Save analyzed reviews and their inbox items to DynamoDB.
+
+        Items are written with batch writes; if a batch fails, the reviews are
+        saved one by one so a single bad item does not drop the whole batch.
+        The saved reviews are then added to the company's weekly rollups;
+        reviews already stored (a batch replayed after a crash) replace their
+        stored version there instead of being counted twice.
+
+        Returns:
+            list: The reviews that were saved successfully.
+        """
+        try:
+            previous = ReviewModel.fetch_stat_rows(
+                self.connector.company_id, [review.review_id for review in reviews]
+            )
+        except Exception:
+            logger.warning(
+                "Could not read stored versions of the batch for the rollups",
+                exc_info=True,
+            )
+            previous = {}
+
+        prepared = []
         for i, review in enumerate(reviews):
             try:
-                review_dict = review.dict(exclude_unset=True)
-                review_model = ReviewModel(
-                    business_id=review_dict["business_id"],
-                    company_id=review_dict["company_id"],
-                    review_date=review_dict["review_date"],
-                    review_id=review_dict["review_id"],
-                    review_text=review_dict["review_text"],
-                    review_url=review_dict.get("review_url", ""),
-                    rating=int(review_dict.get("rating", 0)),
-                    total_reviews=int(review_dict.get("total_reviews", 0)),
-                    platform_id=review_dict.get("platform_id", ""),
-                    assigned_label=review_dict.get("assigned_label", ""),
-                    named_labels=review_dict.get("named_labels", []),
-                    sentiment=float(review_dict.get("sentiment", 0.0)),
-                    polarity=float(review_dict.get("polarity", 0.0)),
-                    author_name=review_dict.get("author_name", "Anonymous"),
-                    author_image_url=review_dict.get("author_image_url", ""),
+                prepared.append(
+                    (
+                        review,
+                        ReviewModel.from_record(review),
+                        InboxModel.build_inbox_item(user_id=user_id, review=review),
+                    )
                 )
-                review_model.save()
-
-                # Save to inbox
-                InboxModel.create_inbox_item(
-                    user_id=user_id, review=review
-                )  # Create inbox review for each company review
             except Exception as e:
-                logger.error(f"Error saving review number {i} to DynamoDB: {e}")
+                logger.error("Error preparing review number %d for DynamoDB: %s", i, e)
+
+        try:
+            with ReviewModel.batch_write() as batch:
+                for _, review_model, _ in prepared:
+                    batch.save(review_model)
+            # Save to inbox
+            with InboxModel.batch_write() as batch:
+                for _, _, inbox_item in prepared:
+                    batch.save(inbox_item)
+            saved_reviews = [review for review, _, _ in prepared]
+        except Exception as e:
+            logger.warning(f"Batch write failed, saving reviews one by one: {e}")
+
+            saved_reviews = []
+            for i, (review, review_model, inbox_item) in enumerate(prepared):
+                try:
+                    review_model.save()
+                    inbox_item.save()  # Create inbox review for each company review
+                    saved_reviews.append(review)
+                except Exception as e:
+                    logger.error("Error saving review number %d to DynamoDB: %s", i, e)
+
+        record_reviews(self.connector.company_id, saved_reviews, previous)
+        return saved_reviews
@@ -13,3 +13,91 @@ class ReviewEntry(BaseModel, extra="allow"):  # Allow extra fields
     platform_id: str = "Yelp"
     author_name: str = "Anonymous"
     author_image_url: str = ""
+    ingest_status: str = "new"  # new / changed / unchanged, see connectors.dedup
+
+
+class ReviewRecord:
+    """
+    Compact review record that flows from the connector through analysis to
+    persistence.
+
+    Validation happens once at the edge (the connector's page schema check or
+    ReviewEntry); afterwards analysis results are written straight into the
+    slots and the DynamoDB items are built from the attributes, so no
+    intermediate dicts are created per review.
+    """
+
+    __slots__ = (
+        "business_id",
+        "company_id",
+        "review_id",
+        "review_date",
+        "review_text",
+        "review_url",
+        "rating",
+        "total_reviews",
+        "platform_id",
+        "author_name",
+        "author_image_url",
+        "ingest_status",
+        "duplicate_of",
+        "assigned_label",
+        "named_labels",
+        "sentiment",
+        "polarity",
+    )
+
+    def __init__(
+        self,
+        business_id: str,
+        company_id: str,
+        review_id: str,
+        review_text: str,
+        rating: float,
+        total_reviews: int,
+        review_date: str = None,
+        review_url: str = "No Url",
+        platform_id: str = "Yelp",
+        author_name: str = "Anonymous",
+        author_image_url: str = "",
+        ingest_status: str = "new",
+    ):
+        self.business_id = business_id
+        self.company_id = company_id
+        self.review_id = review_id
+        self.review_date = review_date
+        self.review_text = review_text
+        self.review_url = review_url
+        self.rating = rating
+        self.total_reviews = total_reviews
+        self.platform_id = platform_id
+        self.author_name = author_name
+        self.author_image_url = author_image_url
+        self.ingest_status = ingest_status
+        # review_id of the near-duplicate this review was grouped under, if any
+        self.duplicate_of = None
+        # Filled in by analysis
+        self.assigned_label = []
+        self.named_labels = []
+        self.sentiment = None
+        self.polarity = None
+
+    @classmethod
+    def from_entry(cls, entry: ReviewEntry) -> "ReviewRecord":
+        return cls(
+            business_id=entry.business_id,
+            company_id=entry.company_id,
+            review_id=entry.review_id,
+            review_text=entry.review_text,
+            rating=entry.rating,
+            total_reviews=entry.total_reviews,
+            review_date=entry.review_date,
+            review_url=entry.review_url,
+            platform_id=entry.platform_id,
+            author_name=entry.author_name,
+            author_image_url=entry.author_image_url,
+            ingest_status=entry.ingest_status,
+        )
+
+    def __repr__(self):
+        return f"ReviewRecord(company_id={self.company_id!r}, review_id={self.review_id!r})"
@@ -0,0 +1,175 @@
+import datetime
+import os
+from typing import Callable, Iterable, Optional, Set
+
+import redis
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv(override=True)
+
+redis_conn = redis.Redis()
+
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", 30 * 24 * 3600))
+
+
+class AnalysisState:
+    FETCHING = "fetching"
+    ANALYZING = "analyzing"
+    PERSISTED = "persisted"
+
+
+class FetchCheckpoint(BaseModel):
+    business_id: str
+    company_id: str
+    version: int = 0
+    last_sync: Optional[str] = None
+    # Next page to request, and the first page whose reviews are not yet stored
+    next_page: int = 1
+    persisted_page: int = 1
+    total_fetched: int = 0
+    total_persisted: int = 0
+    analysis_state: str = AnalysisState.FETCHING
+    updated_at: Optional[str] = None
+
+
+# Compare-and-set: only writes when the stored version still matches ARGV[1]
+_CAS_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version') or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'version', tonumber(ARGV[1]) + 1, 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+
+
+class CheckpointConflict(Exception):
+    pass
+
+
+class CheckpointStore:
+    """
+    Fetch checkpoints kept in Redis so any worker can resume a job.
+
+    Each checkpoint is a versioned hash updated with compare-and-set, plus two
+    sets holding the review_ids fetched and the review_ids already persisted.
+    Writes are single round trips, cheap enough to make after every window.
+    Checkpoints are keyed by company and business, so two companies connected
+    to the same business never share one.
+    """
+
+    def __init__(self, connection=None):
+        self.redis = connection or redis_conn
+        self._cas = self.redis.register_script(_CAS_SCRIPT)
+
+    @staticmethod
+    def _keys(company_id: str, business_id: str):
+        base = f"fetch_checkpoint:{company_id}:{business_id}"
+        return [base, f"{base}:seen", f"{base}:persisted"]
+
+    def load(self, company_id: str, business_id: str) -> Optional[FetchCheckpoint]:
+        raw = self.redis.hmget(
+            self._keys(company_id, business_id)[0], "version", "data"
+        )
+        if not raw[1]:
+            return None
+        checkpoint = FetchCheckpoint.model_validate_json(raw[1])
+        checkpoint.version = int(raw[0])
+        return checkpoint
+
+    def save(
+        self,
+        checkpoint: FetchCheckpoint,
+        review_ids: Iterable[str] = (),
+        id_set: str = "seen",
+    ) -> bool:
+        """
+        Writes the checkpoint if nobody else updated it since it was loaded.
+
+        Review ids are added to the `seen` or `persisted` set before the cursor
+        moves, so a checkpoint never points past ids that were not recorded.
+
+        Returns:
+            bool: False if the stored version moved on (the caller should reload).
+        """
+        keys = self._keys(checkpoint.company_id, checkpoint.business_id)
+        review_ids = list(review_ids)
+        if review_ids:
+            id_key = keys[1] if id_set == "seen" else keys[2]
+            pipe = self.redis.pipeline(transaction=False)
+            for i in range(0, len(review_ids), 1000):
+                pipe.sadd(id_key, *review_ids[i : i + 1000])
+            pipe.expire(id_key, CHECKPOINT_TTL)
+            pipe.execute()
+
+        checkpoint.updated_at = datetime.datetime.now().isoformat()
+        data = checkpoint.model_dump_json(exclude={"version"})
+        saved = self._cas(
+            keys=keys[:1], args=[checkpoint.version, data, CHECKPOINT_TTL]
+        )
+        if saved:
+            checkpoint.version += 1
+        return bool(saved)
+
+    def update(
+        self,
+        company_id: str,
+        business_id: str,
+        mutate: Callable[[FetchCheckpoint], None],
+        review_ids: Iterable[str] = (),
+        id_set: str = "seen",
+        retries: int = 5,
+    ) -> FetchCheckpoint:
+        """
+        Loads, mutates and saves a checkpoint, retrying on concurrent updates.
+        """
+        review_ids = list(review_ids)
+        for _ in range(retries):
+            checkpoint = self.load(company_id, business_id) or FetchCheckpoint(
+                business_id=business_id, company_id=company_id
+            )
+            mutate(checkpoint)
+            if self.save(checkpoint, review_ids, id_set):
+                return checkpoint
+        raise CheckpointConflict(
+            f"Checkpoint for {business_id} kept changing, gave up after {retries} attempts"
+        )
+
+    def start(self, checkpoint: FetchCheckpoint) -> FetchCheckpoint:
+        """
+        Replaces any previous checkpoint for the business with a fresh one.
+        """
+        self.clear(checkpoint.company_id, checkpoint.business_id)
+        checkpoint.version = 0
+        if not self.save(checkpoint):
+            raise CheckpointConflict(
+                f"Checkpoint for {checkpoint.business_id} was recreated concurrently"
+            )
+        return checkpoint
+
+    def persisted_review_ids(self, company_id: str, business_id: str) -> Set[str]:
+        return {
+            member.decode("utf-8")
+            for member in self.redis.smembers(self._keys(company_id, business_id)[2])
+        }
+
+    def seen_review_ids(self, company_id: str, business_id: str) -> Set[str]:
+        return {
+            member.decode("utf-8")
+            for member in self.redis.smembers(self._keys(company_id, business_id)[1])
+        }
+
+    def unpersisted_review_ids(self, company_id: str, business_id: str) -> Set[str]:
+        """
+        Review ids fetched under the checkpoint but not persisted yet.
+        """
+        _, seen_key, persisted_key = self._keys(company_id, business_id)
+        return {
+            member.decode("utf-8")
+            for member in self.redis.sdiff(seen_key, persisted_key)
+        }
+
+    def clear(self, company_id: str, business_id: str):
+        self.redis.delete(*self._keys(company_id, business_id))
@@ -0,0 +1,89 @@
+import hashlib
+from typing import Dict, Iterable, List
+
+import redis
+
+from models.models import ReviewModel
+
+redis_conn = redis.Redis()
+
+# Marks a company index that was already loaded from DynamoDB
+_WARM_FIELD = "__warm__"
+
+
+class IngestStatus:
+    NEW = "new"
+    CHANGED = "changed"
+    UNCHANGED = "unchanged"
+
+
+def content_hash(review_text: str, rating) -> str:
+    """
+    Returns a short hash of the parts of a review that affect analysis.
+    """
+    payload = f"{float(rating or 0)}|{review_text or ''}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+class ReviewDedupIndex:
+    """
+    Per-company index of ingested review_ids and their content hashes.
+
+    The index is a Redis hash (review_id -> content hash). When it is missing,
+    e.g. after a Redis flush, it is rebuilt once from the Reviews table.
+    """
+
+    def __init__(self, company_id: str, connection=None):
+        self.company_id = company_id
+        self.redis = connection or redis_conn
+        self.key = f"review_index:{company_id}"
+
+    def _warm(self):
+        if self.redis.hexists(self.key, _WARM_FIELD):
+            return
+        mapping = {_WARM_FIELD: "1"}
+        for review in ReviewModel.query(
+            self.company_id,
+            attributes_to_get=["review_id", "review_text", "rating"],
+        ):
+            mapping[review.review_id] = content_hash(review.review_text, review.rating)
+        self.redis.hset(self.key, mapping=mapping)
+
+    def classify(self, reviews: List) -> Dict[str, str]:
+        """
+        Returns an IngestStatus for every review, keyed by review_id.
+        """
+        if not reviews:
+            return {}
+        self._warm()
+        stored = self.redis.hmget(self.key, [review.review_id for review in reviews])
+        statuses = {}
+        for review, known_hash in zip(reviews, stored):
+            if known_hash is None:
+                statuses[review.review_id] = IngestStatus.NEW
+            elif known_hash.decode("utf-8") == content_hash(
+                review.review_text, review.rating
+            ):
+                statuses[review.review_id] = IngestStatus.UNCHANGED
+            else:
+                statuses[review.review_id] = IngestStatus.CHANGED
+        return statuses
+
+    def record(self, reviews: Iterable):
+        """
+        Marks reviews as ingested with their current content.
+        """
+        mapping = {
+            review.review_id: content_hash(review.review_text, review.rating)
+            for review in reviews
+        }
+        if mapping:
+            self.redis.hset(self.key, mapping=mapping)
+
+    def remove(self, review_ids: Iterable[str]):
+        review_ids = list(review_ids)
+        if review_ids:
+            self.redis.hdel(self.key, *review_ids)
+
+    def clear(self):
+        self.redis.delete(self.key)
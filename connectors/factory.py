@@ -22,6 +22,11 @@ class ConnectorFactory:
             "company_id": self.company_id,
             "job_id": self.job_id,
         }
+        # Optional per-connector overrides, e.g. a stand-in api_base_url
+        for key in ("api_base_url", "max_concurrency"):
+            value = getattr(self.connector.config, key, None)
+            if value is not None:
+                config[key] = value
         return connector_classes.get(self.type)(config)
 
     pass
@@ -0,0 +1,117 @@
+import os
+import uuid
+from typing import Optional, Tuple
+
+import redis
+from dotenv import load_dotenv
+
+from connectors.publish import publish_job_status
+
+load_dotenv(override=True)
+
+redis_conn = redis.Redis()
+
+# Longest an insights job may run once started
+INSIGHTS_JOB_TIMEOUT = int(os.getenv("INSIGHTS_JOB_TIMEOUT", 900))
+# Longest a job may wait in the queue before RQ discards it. The lock outlives
+# both, so it never expires while its job is still queued or running.
+INSIGHTS_QUEUE_TTL = int(os.getenv("INSIGHTS_QUEUE_TTL", 3600))
+
+# Deletes the lock only if it still belongs to the given job
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Resets the lock's TTL only if it still belongs to the given job
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+end
+return 0
+"""
+
+
+class InsightsStatus:
+    QUEUED = "queued"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+def _lock_key(company_id: str) -> str:
+    return f"insights_lock:{company_id}"
+
+
+def request_insights(company_id: str, queue) -> Tuple[str, bool]:
+    """
+    Queues an insights job for the company unless one is already in flight.
+
+    A per-company SET NX lock holding the job id makes the job single-flight:
+    concurrent callers get the id of the job that holds it.
+
+    Returns:
+        Tuple[str, bool]: The job id, and whether an in-flight job was joined.
+    """
+    key = _lock_key(company_id)
+    for _ in range(3):
+        job_id = str(uuid.uuid4())
+        if redis_conn.set(
+            key, job_id, nx=True, ex=INSIGHTS_QUEUE_TTL + INSIGHTS_JOB_TIMEOUT
+        ):
+            try:
+                queue.enqueue(
+                    "connectors.worker_tasks.generate_company_insights",
+                    company_id,
+                    job_id=job_id,
+                    job_timeout=INSIGHTS_JOB_TIMEOUT,
+                    ttl=INSIGHTS_QUEUE_TTL,
+                )
+            except Exception:
+                release_lock(company_id, job_id)
+                raise
+            publish_insights_status(company_id, job_id, InsightsStatus.QUEUED)
+            return job_id, False
+
+        in_flight = redis_conn.get(key)
+        # The lock may have been released between SET and GET; try again
+        if in_flight is not None:
+            return in_flight.decode("utf-8"), True
+    raise RuntimeError(f"Could not acquire insights lock for company {company_id}")
+
+
+def refresh_lock(company_id: str, job_id: str) -> bool:
+    """
+    Called when the job starts: the lock now only needs to cover its run.
+    """
+    refreshed = redis_conn.eval(
+        _REFRESH_SCRIPT, 1, _lock_key(company_id), job_id, INSIGHTS_JOB_TIMEOUT
+    )
+    return bool(refreshed)
+
+
+def release_lock(company_id: str, job_id: str) -> bool:
+    released = redis_conn.eval(_RELEASE_SCRIPT, 1, _lock_key(company_id), job_id)
+    return bool(released)
+
+
+def publish_insights_status(
+    company_id: str, job_id: str, status: str, message: Optional[str] = None, **fields
+):
+    """
+    Publishes insights progress on the company's job_status channel.
+
+    Messages carry `"type": "insights"` to tell them apart from ingest jobs.
+    """
+    payload = {
+        "type": "insights",
+        "job_id": job_id,
+        "company_id": company_id,
+        "status": status,
+        **fields,
+    }
+    if message:
+        payload["message"] = message
+    publish_job_status(company_id, payload)
@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# Job stages in pipeline order, as stored on JobModel.stage_timings
+JOB_STAGES = (
+    "fetch",
+    "near_duplicates",
+    "preprocess",
+    "topic_model",
+    "clustering",
+    "sentiment",
+    "postprocess",
+    "persist",
+)
+
+# analyze_reviews timing keys (modules.create_embeddings.ANALYSIS_STAGES) -> job stage
+ANALYSIS_STAGE_MAP = {
+    "preprocess": "preprocess",
+    "corpus": "topic_model",
+    "lda": "topic_model",
+    "tfidf": "clustering",
+    "hdbscan": "clustering",
+    "label_assignment": "clustering",
+    "sentiment": "sentiment",
+    "summaries": "postprocess",
+    "json": "postprocess",
+}
+
+# The (JobTimings, stage) the current thread is working on, for call counting
+_active = threading.local()
+
+
+class JobTimings:
+    """
+    Per-job stage breakdown: seconds, items, API calls and DynamoDB calls.
+
+    Stages running concurrently (pipeline workers, fetch threads) add to the
+    same totals, so `seconds` is time spent in a stage, not wall time.
+    DynamoDB calls are counted through PynamoDB's pre_dynamodb_send signal
+    for whatever stage the calling thread entered with `stage()`.
+    """
+
+    FIELDS = ("seconds", "items", "api_calls", "db_calls", "runs")
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, **deltas):
+        with self._lock:
+            totals = self._stages.setdefault(stage, {field: 0 for field in self.FIELDS})
+            for field, value in deltas.items():
+                totals[field] += value
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0, track_time: bool = True):
+        """
+        Times the block as `name` and attributes DynamoDB calls made in it.
+        """
+        previous = getattr(_active, "stage", None)
+        _active.stage = (self, name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start if track_time else 0.0
+            self.add(name, seconds=seconds, items=items, runs=1)
+            _active.stage = previous
+
+    def add_analysis(self, timings: dict, items: int):
+        """
+        Folds the per-stage seconds reported by analyze_reviews into job stages.
+        """
+        stages = set()
+        for analysis_stage, seconds in timings.items():
+            stage = ANALYSIS_STAGE_MAP.get(analysis_stage, "postprocess")
+            self.add(stage, seconds=seconds)
+            stages.add(stage)
+        for stage in stages:
+            self.add(stage, items=items, runs=1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            ordered = [s for s in JOB_STAGES if s in self._stages] + sorted(
+                s for s in self._stages if s not in JOB_STAGES
+            )
+            return {
+                stage: {
+                    **self._stages[stage],
+                    "seconds": round(self._stages[stage]["seconds"], 3),
+                }
+                for stage in ordered
+            }
+
+
+def active_stage() -> Optional[tuple]:
+    return getattr(_active, "stage", None)
+
+
+def _count_dynamodb_call(sender, **kwargs):
+    active = active_stage()
+    if active is not None:
+        active[0].add(active[1], db_calls=1)
+
+
+try:
+    from pynamodb.signals import pre_dynamodb_send
+
+    # Raises when blinker is missing; Flask depends on it so it normally is not
+    pre_dynamodb_send.connect(_count_dynamodb_call)
+except (ImportError, RuntimeError):
+    pass
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import redis
+from dotenv import load_dotenv
+
+from models.models import ReviewModel
+
+load_dotenv(override=True)
+
+redis_conn = redis.Redis()
+
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+# Estimated Jaccard similarity of word shingles above which reviews are duplicates
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", 0.85))
+# Shorter texts (empty, rating-only, "Great!") share too few shingles to tell
+# a copy from a coincidence, so they are never grouped
+NEAR_DUP_MIN_WORDS = int(os.getenv("NEAR_DUP_MIN_WORDS", 6))
+
+SHINGLE_WORDS = 3
+# 16 bands of 8 rows: pairs above ~0.7 similarity become LSH candidates,
+# which are then checked against NEAR_DUP_THRESHOLD on the full signature
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+# Fixed permutations so signatures stay comparable across processes and releases.
+# 32-bit coefficients and shingle hashes keep a * x + b within uint64.
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+# Marks a company index that was already loaded from DynamoDB
+_WARM_KEY = "__warm__"
+
+
+def shingles(text: str) -> set:
+    """
+    Word n-grams of the normalized text; short texts give a single shingle.
+    """
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {
+        " ".join(words[i : i + SHINGLE_WORDS])
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def groupable(text: str) -> bool:
+    """
+    Whether the text is long enough for near-duplicate grouping.
+    """
+    return len(re.findall(r"\w+", text or "")) >= NEAR_DUP_MIN_WORDS
+
+
+def minhash(text: str) -> np.ndarray:
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest())
+            for s in shingles(text)
+        ],
+        dtype=np.uint64,
+    )
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME).min(axis=0)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def _band_hashes(signature: np.ndarray) -> List[str]:
+    return [
+        hashlib.blake2b(
+            signature[i * ROWS : (i + 1) * ROWS].tobytes(), digest_size=8
+        ).hexdigest()
+        for i in range(BANDS)
+    ]
+
+
+class NearDuplicateIndex:
+    """
+    Per-company MinHash/LSH index of representative reviews.
+
+    Every review whose text is a near-duplicate of an indexed one (estimated
+    Jaccard similarity of word shingles >= NEAR_DUP_THRESHOLD) is grouped
+    under that representative through `duplicate_of`; only representatives
+    are indexed, and only once they are persisted (`add_persisted`). State
+    lives in Redis: `near_dup:<company_id>:sig` maps review ids to signatures
+    and `near_dup:<company_id>:band:<i>:<hash>` sets hold the LSH buckets.
+    When missing, the index is rebuilt once from the Reviews table.
+    """
+
+    def __init__(self, company_id: str, connection=None):
+        self.company_id = company_id
+        self.redis = connection or redis_conn
+        self.prefix = f"near_dup:{company_id}"
+        self.sig_key = f"{self.prefix}:sig"
+        # Signatures of assigned reviews that are not persisted yet
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _band_key(self, band: int, band_hash: str) -> str:
+        return f"{self.prefix}:band:{band}:{band_hash}"
+
+    def _add(self, pipe, review_id: str, signature: np.ndarray):
+        pipe.hset(self.sig_key, review_id, signature.tobytes())
+        for band, band_hash in enumerate(_band_hashes(signature)):
+            pipe.sadd(self._band_key(band, band_hash), review_id)
+
+    def _warm(self):
+        if self.redis.hexists(self.sig_key, _WARM_KEY):
+            return
+        reviews = list(
+            ReviewModel.query(
+                self.company_id,
+                attributes_to_get=["review_id", "review_text", "duplicate_of"],
+            )
+        )
+        stored_ids = {review.review_id for review in reviews}
+        pipe = self.redis.pipeline(transaction=False)
+        for review in reviews:
+            if not groupable(review.review_text):
+                continue
+            # A duplicate whose representative is gone represents itself
+            if not review.duplicate_of or review.duplicate_of not in stored_ids:
+                self._add(pipe, review.review_id, minhash(review.review_text))
+        pipe.hset(self.sig_key, _WARM_KEY, "1")
+        pipe.execute()
+
+    def _find(self, signature: np.ndarray) -> Optional[str]:
+        pipe = self.redis.pipeline(transaction=False)
+        for band, band_hash in enumerate(_band_hashes(signature)):
+            pipe.smembers(self._band_key(band, band_hash))
+        candidates = set().union(*pipe.execute())
+        if not candidates:
+            return None
+        candidates = sorted(c.decode("utf-8") for c in candidates)
+        best, best_score = None, NEAR_DUP_THRESHOLD
+        for review_id, stored in zip(
+            candidates, self.redis.hmget(self.sig_key, candidates)
+        ):
+            if stored is None:
+                continue
+            score = similarity(signature, np.frombuffer(stored, dtype=np.uint64))
+            if score >= best_score:
+                best, best_score = review_id, score
+        return best
+
+    @staticmethod
+    def _find_in_batch(
+        signature: np.ndarray, batch_ids: List[str], batch_signatures: List
+    ) -> Optional[str]:
+        if not batch_ids:
+            return None
+        scores = (np.vstack(batch_signatures) == signature).mean(axis=1)
+        best = int(np.argmax(scores))
+        return batch_ids[best] if scores[best] >= NEAR_DUP_THRESHOLD else None
+
+    def assign(self, reviews: List) -> Dict[str, str]:
+        """
+        Groups new reviews with their near-duplicates, earlier or in this batch.
+
+        Sets `duplicate_of` on every duplicate. The others become
+        representatives, but are only indexed by `add_persisted` once saved.
+        Texts shorter than NEAR_DUP_MIN_WORDS are never grouped nor indexed.
+
+        Returns:
+            Dict[str, str]: Representative review_id per duplicate review_id.
+        """
+        if not reviews:
+            return {}
+        self._warm()
+        duplicates, signatures = {}, {}
+        batch_ids, batch_signatures = [], []
+        for review in reviews:
+            if not groupable(review.review_text):
+                review.duplicate_of = None
+                continue
+            signature = minhash(review.review_text)
+            signatures[review.review_id] = signature
+            representative = self._find(signature) or self._find_in_batch(
+                signature, batch_ids, batch_signatures
+            )
+            if representative is not None and representative != review.review_id:
+                review.duplicate_of = representative
+                duplicates[review.review_id] = representative
+            else:
+                review.duplicate_of = None
+                batch_ids.append(review.review_id)
+                batch_signatures.append(signature)
+        with self._lock:
+            self._pending.update(signatures)
+        return duplicates
+
+    def add_persisted(self, reviews: Iterable):
+        """
+        Indexes the representatives among saved reviews assigned by this index.
+        """
+        with self._lock:
+            signatures = [
+                (review, self._pending.pop(review.review_id, None))
+                for review in reviews
+            ]
+        pipe = self.redis.pipeline(transaction=False)
+        for review, signature in signatures:
+            if signature is not None and not review.duplicate_of:
+                self._add(pipe, review.review_id, signature)
+        pipe.execute()
+
+    def discard(self, review_ids: Iterable[str]):
+        """
+        Drops representatives that are no longer stored.
+        """
+        review_ids = [r for r in review_ids if r != _WARM_KEY]
+        if not review_ids:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for review_id, stored in zip(
+            review_ids, self.redis.hmget(self.sig_key, review_ids)
+        ):
+            if stored is None:
+                continue
+            signature = np.frombuffer(stored, dtype=np.uint64)
+            for band, band_hash in enumerate(_band_hashes(signature)):
+                pipe.srem(self._band_key(band, band_hash), review_id)
+            pipe.hdel(self.sig_key, review_id)
+        pipe.execute()
+
+    def clear(self):
+        keys = list(self.redis.scan_iter(match=f"{self.prefix}:*"))
+        if keys:
+            self.redis.delete(*keys)
@@ -0,0 +1,227 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+
+from modules.logger_setup import get_logger
+from modules.metrics import bind_context
+
+load_dotenv(override=True)
+
+logger = get_logger(__name__)
+
+INGEST_PIPELINE_ENABLED = os.getenv("INGEST_PIPELINE_ENABLED", "true").lower() == "true"
+# Max batches waiting between two stages before the upstream stage blocks
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))
+# Reviews per analysis batch; topic modelling needs a reasonably sized corpus.
+# Each batch fits its own topic model, so labels of different batches of one
+# job can differ (onboarding analyzes its reviews as one batch, see Analyzer).
+PIPELINE_ANALYSIS_BATCH = int(os.getenv("PIPELINE_ANALYSIS_BATCH", 225))
+PIPELINE_ANALYSIS_WORKERS = int(os.getenv("PIPELINE_ANALYSIS_WORKERS", 1))
+PIPELINE_PERSIST_WORKERS = int(os.getenv("PIPELINE_PERSIST_WORKERS", 2))
+
+_DONE = object()
+
+
+class StageMetrics:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0  # time spent doing the stage's own work
+        self.idle_seconds = 0.0  # time waiting for input
+        self.blocked_seconds = 0.0  # time waiting for room downstream
+        self._lock = threading.Lock()
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self) -> dict:
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "idle_seconds": round(self.idle_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+        }
+
+
+class IngestPipeline:
+    """
+    Fetch -> analyze -> persist pipeline with bounded queues between stages.
+
+    The fetch stage is whatever calls `submit` (the connector's fetch loop);
+    analysis and persistence run in their own worker threads, so network, CPU
+    and DynamoDB I/O overlap. A full queue blocks the stage feeding it, which
+    keeps memory bounded when a downstream stage is the bottleneck.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[list], list],
+        persist: Callable[[list], list],
+        analysis_batch_size: int = PIPELINE_ANALYSIS_BATCH,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        analysis_workers: int = PIPELINE_ANALYSIS_WORKERS,
+        persist_workers: int = PIPELINE_PERSIST_WORKERS,
+    ):
+        self.analyze = analyze
+        self.persist = persist
+        self.analysis_batch_size = analysis_batch_size
+        self.analysis_queue = queue.Queue(maxsize=queue_size)
+        self.persist_queue = queue.Queue(maxsize=queue_size)
+        self.metrics = {
+            "fetch": StageMetrics("fetch", 1),
+            "analysis": StageMetrics("analysis", analysis_workers),
+            "persist": StageMetrics("persist", persist_workers),
+        }
+        self.persisted = []
+        self._persisted_lock = threading.Lock()
+        self._buffer = []
+        self._analysis_threads = []
+        self._persist_threads = []
+        self._started_at = None
+        self._last_submit = None
+
+    def start(self) -> "IngestPipeline":
+        self._started_at = self._last_submit = time.perf_counter()
+        for i in range(self.metrics["analysis"].workers):
+            thread = threading.Thread(
+                target=bind_context(self._work),
+                args=(self.metrics["analysis"], self.analyze, self.analysis_queue),
+                kwargs={"outbox": self.persist_queue},
+                name=f"pipeline-analysis-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._analysis_threads.append(thread)
+        for i in range(self.metrics["persist"].workers):
+            thread = threading.Thread(
+                target=bind_context(self._work),
+                args=(self.metrics["persist"], self.persist, self.persist_queue),
+                name=f"pipeline-persist-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._persist_threads.append(thread)
+        return self
+
+    def submit(self, reviews: list):
+        """
+        Hands a fetched window to the analysis stage, blocking while it is full.
+        """
+        now = time.perf_counter()
+        self.metrics["fetch"].add(
+            batches=1, items=len(reviews), busy_seconds=now - self._last_submit
+        )
+        self._buffer.extend(reviews)
+        if len(self._buffer) >= self.analysis_batch_size:
+            self._put(self.analysis_queue, self._buffer, self.metrics["fetch"])
+            self._buffer = []
+        self._last_submit = time.perf_counter()
+
+    def finish(self) -> dict:
+        """
+        Flushes the last batch, drains every stage and returns the stage metrics.
+        """
+        self.metrics["fetch"].add(busy_seconds=time.perf_counter() - self._last_submit)
+        if self._buffer:
+            self._put(self.analysis_queue, self._buffer, self.metrics["fetch"])
+            self._buffer = []
+        for _ in self._analysis_threads:
+            self.analysis_queue.put(_DONE)
+        for thread in self._analysis_threads:
+            thread.join()
+        for _ in self._persist_threads:
+            self.persist_queue.put(_DONE)
+        for thread in self._persist_threads:
+            thread.join()
+
+        summary = {name: stage.to_dict() for name, stage in self.metrics.items()}
+        summary["wall_seconds"] = round(time.perf_counter() - self._started_at, 3)
+        logger.info("Ingest pipeline finished: %s", summary)
+        return summary
+
+    def errors(self) -> dict:
+        """
+        Failed batches per stage, for stages where any batch failed.
+
+        A failed batch is logged and dropped, so its reviews are neither
+        analyzed nor persisted.
+        """
+        return {
+            name: stage.errors for name, stage in self.metrics.items() if stage.errors
+        }
+
+    @staticmethod
+    def _put(outbox: queue.Queue, batch: list, metrics: StageMetrics):
+        start = time.perf_counter()
+        outbox.put(batch)
+        metrics.add(blocked_seconds=time.perf_counter() - start)
+
+    def _work(
+        self,
+        metrics: StageMetrics,
+        fn: Callable[[list], list],
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue] = None,
+    ):
+        while True:
+            start = time.perf_counter()
+            batch = inbox.get()
+            metrics.add(idle_seconds=time.perf_counter() - start)
+            if batch is _DONE:
+                return
+
+            start = time.perf_counter()
+            try:
+                result = fn(batch) or []
+            except Exception:
+                logger.error(
+                    "Pipeline %s stage failed on a batch of %d reviews",
+                    metrics.name,
+                    len(batch),
+                    exc_info=True,
+                )
+                metrics.add(errors=1, busy_seconds=time.perf_counter() - start)
+                continue
+            metrics.add(
+                batches=1, items=len(batch), busy_seconds=time.perf_counter() - start
+            )
+
+            if outbox is not None:
+                if result:
+                    self._put(outbox, result, metrics)
+            else:
+                with self._persisted_lock:
+                    self.persisted.extend(result)
+
+
+def run_pipeline(
+    fetch: Callable[[Callable[[list], None]], List],
+    analyze: Callable[[list], list],
+    persist: Callable[[list], list],
+    **options,
+):
+    """
+    Runs `fetch(submit)` as the first stage of a new pipeline.
+
+    Returns:
+        Tuple[list, list, dict, dict]: What `fetch` returned, the persisted
+            reviews, failed batches per stage and the stage metrics.
+    """
+    pipeline = IngestPipeline(analyze, persist, **options).start()
+    try:
+        fetched = fetch(pipeline.submit)
+    finally:
+        metrics = pipeline.finish()
+    return fetched, pipeline.persisted, pipeline.errors(), metrics
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+import redis
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+redis_conn = redis.Redis()
+
+RAPIDAPI_HOST = "red-flower-business-data.p.rapidapi.com"
+# Sustained requests per second and burst size allowed per API key, cluster-wide
+RAPIDAPI_RATE_PER_SEC = float(os.getenv("RAPIDAPI_RATE_PER_SEC", 5))
+RAPIDAPI_BURST = int(os.getenv("RAPIDAPI_BURST", 10))
+# Longest a single request will wait for a token before giving up
+RAPIDAPI_MAX_WAIT = float(os.getenv("RAPIDAPI_MAX_WAIT", 60))
+
+# Refills the bucket from the Redis clock and takes `requested` tokens if
+# available. Returns 0 when granted, otherwise the milliseconds to wait.
+_ACQUIRE_SCRIPT = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', key, 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+
+if blocked_until > now then
+    return blocked_until - now
+end
+
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    redis.call('HINCRBY', key, 'granted', requested)
+else
+    wait = math.ceil((requested - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', key, ttl)
+return wait
+"""
+
+# Blocks the bucket until now + ARGV[1] ms, never shortening an existing block.
+_PENALIZE_SCRIPT = """
+local key = KEYS[1]
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local until_ms = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', key, 'blocked_until')) or 0
+if until_ms > current then
+    redis.call('HSET', key, 'blocked_until', until_ms, 'tokens', 0, 'ts', until_ms)
+end
+redis.call('HINCRBY', key, 'throttled', 1)
+redis.call('PEXPIRE', key, tonumber(ARGV[2]))
+return until_ms
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token bucket shared by every worker through Redis.
+
+    Refill and consumption happen atomically in a Lua script using the Redis
+    server clock, so all processes see one bucket per key regardless of their
+    local clocks.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        rate: float,
+        capacity: int,
+        max_wait: float = RAPIDAPI_MAX_WAIT,
+        connection=None,
+    ):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.redis = connection or redis_conn
+        # Idle buckets expire once they would have refilled completely
+        self.ttl_ms = int(max(60, capacity / rate * 2) * 1000)
+        self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+        self._penalize = self.redis.register_script(_PENALIZE_SCRIPT)
+
+    def acquire(self, tokens: int = 1, max_wait: Optional[float] = None) -> bool:
+        """
+        Blocks until `tokens` are granted or `max_wait` seconds have passed.
+
+        Returns:
+            bool: True if the tokens were granted.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait_ms = int(
+                self._acquire(
+                    keys=[self.key],
+                    args=[self.rate, self.capacity, tokens, self.ttl_ms],
+                )
+            )
+            if wait_ms <= 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait_ms / 1000, remaining))
+
+    def penalize(self, retry_after: float):
+        """
+        Stops every worker from acquiring for `retry_after` seconds, e.g. after a 429.
+        """
+        self._penalize(
+            keys=[self.key],
+            args=[int(retry_after * 1000), max(self.ttl_ms, int(retry_after * 1000))],
+        )
+
+    def record_quota(self, headers):
+        """
+        Stores the upstream quota counters returned with a RapidAPI response.
+        """
+        quota = {
+            field: headers[header]
+            for field, header in (
+                ("quota_limit", "x-ratelimit-requests-limit"),
+                ("quota_remaining", "x-ratelimit-requests-remaining"),
+                ("quota_reset", "x-ratelimit-requests-reset"),
+            )
+            if header in headers
+        }
+        if quota:
+            self.redis.hset(self.key, mapping=quota)
+
+    def usage(self) -> dict:
+        """
+        Returns the current state of the bucket and the upstream quota.
+
+        Uses the Redis clock, like the scripts, so the result does not depend
+        on the local clock of the caller.
+        """
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.time()
+        pipe.hgetall(self.key)
+        (seconds, microseconds), raw = pipe.execute()
+        state = {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+        now_ms = seconds * 1000 + microseconds // 1000
+        blocked_until = float(state.get("blocked_until", 0))
+        tokens = float(state.get("tokens", self.capacity))
+        if "ts" in state:
+            elapsed = max(0.0, now_ms - float(state["ts"]))
+            tokens = min(self.capacity, tokens + elapsed * self.rate / 1000)
+        return {
+            "key": self.key,
+            "rate_per_sec": self.rate,
+            "capacity": self.capacity,
+            "tokens_available": round(tokens, 2),
+            "blocked_for_sec": round(max(0.0, blocked_until - now_ms) / 1000, 2),
+            "granted_total": int(state.get("granted", 0)),
+            "throttled_total": int(state.get("throttled", 0)),
+            "quota_limit": state.get("quota_limit"),
+            "quota_remaining": state.get("quota_remaining"),
+            "quota_reset": state.get("quota_reset"),
+        }
+
+
+def rapidapi_limiter(
+    api_key: Optional[str] = None,
+    host: str = RAPIDAPI_HOST,
+    base_url: Optional[str] = None,
+):
+    """
+    Returns the cluster-wide limiter for a RapidAPI key/host pair.
+
+    With `base_url`, the bucket is keyed by the host actually called, so runs
+    against a local stand-in never drain (or penalize) the production bucket.
+    """
+    if base_url:
+        host = urlparse(base_url).netloc or host
+    api_key = api_key or os.environ["RAPIDAPI_KEY"]
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return RedisTokenBucket(
+        f"ratelimit:{host}:{key_hash}", RAPIDAPI_RATE_PER_SEC, RAPIDAPI_BURST
+    )
@@ -1,52 +1,48 @@
 from connectors.factory import ConnectorFactory
 from connectors.publish import publish_job_status
-from modules.logger_setup import setup_logger
+from modules.logger_setup import get_logger
+from modules.metrics import track_job
+from modules.profiling import profile_job
 from connectors.analyze import Analyzer
+from connectors.insights_jobs import (
+    InsightsStatus,
+    publish_insights_status,
+    refresh_lock,
+    release_lock,
+)
+from modules.ai_responses import pregenerate_drafts
+from modules.company_stats import rebuild_company_stats
+from modules.generate_insights import generate_insights_for_company
 from models.models import CompanyModel, JobModel, JobStatus
 import uuid
 import redis
 import json
 import datetime
+import os
 
-logger = setup_logger(log_dir="logs/worker_tasks")
+logger = get_logger(__name__)
 
+# Historical reviews fetched when a connector is first onboarded
+ONBOARDING_REVIEWS = int(os.getenv("ONBOARDING_REVIEWS", 200))
 
+
+@track_job("initial_onboarding")
+@profile_job("initial_onboarding")
 def initial_onboarding(connector_config, company_id, user_id):
     job_id = str(uuid.uuid4())
     job = JobModel.create_job(job_id, company_id, connector_config.type)
-    job_data = {
-        "job_id": job.job_id,
-        "company_id": job.company_id,
-        "connector_type": job.connector_type,
-        "status": job.status,
-        "total_reviews_fetched": job.total_reviews_fetched,
-        "last_sync": job.last_sync,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    publish_job_status(company_id, job_data)
+    publish_job_status(company_id, job.to_dict())
     connector = ConnectorFactory(
         connector_config, company_id, job_id
     ).create_connector_instance()
     analyzer = Analyzer(connector)
     result = analyzer.initial_onboarding(
-        connector_config.config, user_id, n_reviews=200
+        connector_config.config, user_id, n_reviews=ONBOARDING_REVIEWS
     )
     logger.info(f"Initial onboarding completed for {connector.__class__.__name__}")
-    job = JobModel.get_most_recent_job(company_id)
-    job_data = {
-        "job_id": job.job_id,
-        "company_id": job.company_id,
-        "connector_type": job.connector_type,
-        "status": job.status,
-        "total_reviews_fetched": job.total_reviews_fetched,
-        "last_sync": job.last_sync,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    publish_job_status(company_id, job_data)
+    job = JobModel.record_stage_timings(company_id, connector.timings.to_dict())
+    if job:
+        publish_job_status(company_id, job.to_dict())
 
     # Update last_sync date
     current_time = datetime.datetime.utcnow()  # Convert to string
@@ -58,22 +54,13 @@ def initial_onboarding(connector_config, company_id, user_id):
     return result
 
 
+@track_job("poll_new_reviews")
+@profile_job("poll_new_reviews")
 def poll_new_reviews(connector_config, company_id, user_id):
     job_id = str(uuid.uuid4())
     JobModel.create_job(job_id, company_id, connector_config.type)
     job = JobModel.get_most_recent_job(company_id)
-    job_data = {
-        "job_id": job.job_id,
-        "company_id": job.company_id,
-        "connector_type": job.connector_type,
-        "status": job.status,
-        "total_reviews_fetched": job.total_reviews_fetched,
-        "last_sync": job.last_sync,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    publish_job_status(company_id, job_data)
+    publish_job_status(company_id, job.to_dict())
     connector = ConnectorFactory(
         connector_config, company_id, job_id
     ).create_connector_instance()
@@ -82,19 +69,9 @@ def poll_new_reviews(connector_config, company_id, user_id):
         connector_config.config, user_id, connector_config.last_sync
     )
     logger.info(f"Polled new reviews for {connector.__class__.__name__}")
-    job = JobModel.get_most_recent_job(company_id)
-    job_data = {
-        "job_id": job.job_id,
-        "company_id": job.company_id,
-        "connector_type": job.connector_type,
-        "status": job.status,
-        "total_reviews_fetched": job.total_reviews_fetched,
-        "last_sync": job.last_sync,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    publish_job_status(company_id, job_data)
+    job = JobModel.record_stage_timings(company_id, connector.timings.to_dict())
+    if job:
+        publish_job_status(company_id, job.to_dict())
 
     # Update last_sync date
     current_time = datetime.datetime.utcnow()  # Convert to string
@@ -106,41 +83,22 @@ def poll_new_reviews(connector_config, company_id, user_id):
     return result
 
 
+@track_job("resume_fetch")
+@profile_job("resume_fetch")
 def resume_fetch(connector_config, company_id, user_id):
     job_id = str(uuid.uuid4())
     JobModel.create_job(job_id, company_id, connector_config.type)
     job = JobModel.get_most_recent_job(company_id)
-    job_data = {
-        "job_id": job.job_id,
-        "company_id": job.company_id,
-        "connector_type": job.connector_type,
-        "status": job.status,
-        "total_reviews_fetched": job.total_reviews_fetched,
-        "last_sync": job.last_sync,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    publish_job_status(company_id, job_data)
+    publish_job_status(company_id, job.to_dict())
     connector = ConnectorFactory(
         connector_config, company_id, job_id
     ).create_connector_instance()
     analyzer = Analyzer(connector)
     result = analyzer.resume_fetch(connector_config.config, user_id)
     logger.info(f"Resumed fetch for {connector.__class__.__name__}")
-    job = JobModel.get_most_recent_job(company_id)
-    job_data = {
-        "job_id": job.job_id,
-        "company_id": job.company_id,
-        "connector_type": job.connector_type,
-        "status": job.status,
-        "total_reviews_fetched": job.total_reviews_fetched,
-        "last_sync": job.last_sync,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    publish_job_status(company_id, job_data)
+    job = JobModel.record_stage_timings(company_id, connector.timings.to_dict())
+    if job:
+        publish_job_status(company_id, job.to_dict())
 
     # Update last_sync date
     current_time = datetime.datetime.utcnow()  # Convert to string
@@ -150,3 +108,58 @@ def resume_fetch(connector_config, company_id, user_id):
     )
 
     return result
+
+
+@track_job("pregenerate_ai_drafts")
+@profile_job("pregenerate_ai_drafts")
+def pregenerate_ai_drafts(user_id, review_ids):
+    counts = pregenerate_drafts(user_id, review_ids)
+    return {"status": 200, "data": counts}
+
+
+@track_job("generate_company_insights")
+@profile_job("generate_company_insights")
+def generate_company_insights(company_id):
+    from rq import get_current_job
+
+    job = get_current_job()
+    job_id = job.id if job else str(uuid.uuid4())
+
+    def on_progress(stage):
+        publish_insights_status(
+            company_id, job_id, InsightsStatus.IN_PROGRESS, stage=stage
+        )
+
+    refresh_lock(company_id, job_id)
+    try:
+        insights = generate_insights_for_company(company_id, on_progress=on_progress)
+    except Exception as e:
+        logger.error(
+            "Insights generation failed for company %s", company_id, exc_info=True
+        )
+        publish_insights_status(company_id, job_id, InsightsStatus.FAILED, str(e))
+        # Re-raised so RQ records the job as failed, not finished
+        raise
+    finally:
+        release_lock(company_id, job_id)
+
+    if not isinstance(insights, dict):
+        # e.g. "No reviews found for this company."
+        publish_insights_status(company_id, job_id, InsightsStatus.COMPLETED, insights)
+        return {"status": 200, "message": insights}
+
+    publish_insights_status(
+        company_id,
+        job_id,
+        InsightsStatus.COMPLETED,
+        last_sync=insights.get("last_sync"),
+    )
+    return {"status": 200, "data": insights}
+
+
+@track_job("rebuild_company_stats")
+@profile_job("rebuild_company_stats")
+def rebuild_stats(company_id):
+    counts = rebuild_company_stats(company_id)
+    logger.info("Rebuilt rollups for company %s: %s", company_id, counts)
+    return {"status": 200, "data": counts}
@@ -1,13 +1,22 @@
 import json
+import logging
 import os
-import time
+import threading
+import pandas as pd
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from connectors.checkpoint import AnalysisState, CheckpointStore, FetchCheckpoint
+from connectors.dedup import IngestStatus, ReviewDedupIndex
 from connectors.publish import publish_job_status
+from connectors.job_timings import JobTimings
+from connectors.rate_limiter import RAPIDAPI_HOST, rapidapi_limiter
+from modules import http_client
 from modules.fetch_reviews import Review
-from modules.logger_setup import setup_logger
+from modules.logger_setup import get_logger
+from modules.metrics import bind_context
 from pydantic import BaseModel, Field, ValidationError
-from connectors.base_review import ReviewEntry
-from typing import List, Optional, Tuple
+from connectors.base_review import ReviewEntry, ReviewRecord
+from typing import Callable, List, Optional, Set, Tuple
 from datetime import datetime, timezone
 from models.models import CompanyModel, JobModel, JobStatus
 
@@ -15,39 +24,65 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+# Number of page windows requested in parallel when fetching reviews
+YELP_FETCH_CONCURRENCY = int(os.getenv("YELP_FETCH_CONCURRENCY", 4))
+# Point at a local stand-in (modules/rapidapi_standin.py) for offline load tests
+RAPIDAPI_BASE_URL = os.getenv("RAPIDAPI_BASE_URL", f"https://{RAPIDAPI_HOST}")
+
 
 class YelpConnector:
     def __init__(self, config) -> None:
         self.business_id = config["business_id"]
         self.company_id = config["company_id"]
         self.job_id = config["job_id"]
-        self.logger = setup_logger(log_dir="logs/yelp_connector")
+        self.max_concurrency = max(
+            1, int(config.get("max_concurrency", YELP_FETCH_CONCURRENCY))
+        )
+        self.api_base_url = config.get("api_base_url", RAPIDAPI_BASE_URL).rstrip("/")
+        self.logger = get_logger(__name__)
         self.job = JobModel.get(self.company_id)
-
-    def fetch_historical_reviews(self, n_reviews: int = 500) -> List[ReviewEntry]:
+        # Shared with every other worker using the same RapidAPI key
+        self.rate_limiter = rapidapi_limiter(base_url=self.api_base_url)
+        self.checkpoints = CheckpointStore()
+        self.dedup_index = ReviewDedupIndex(self.company_id)
+        self._stop_fetch = threading.Event()
+        # Stage breakdown for the job, shared with the Analyzer
+        self.timings = JobTimings()
+
+    def fetch_historical_reviews(
+        self, n_reviews: int = 500, on_window: Optional[Callable] = None
+    ) -> List[ReviewRecord]:
         """
         Fetches the last n_reviews for the specified business.
 
         Args:
             n_reviews (int): The number of historical reviews to fetch. Defaults to 500.
+            on_window (Optional[Callable]): Called with each window of new reviews as it arrives.
 
         Returns:
-            List[ReviewEntry]: A list of validated review entries.
+            List[ReviewRecord]: A list of validated review records.
         """
-        return self.fetch_reviews(last_sync=None, n_reviews=n_reviews)
+        return self.fetch_reviews(
+            last_sync=None, n_reviews=n_reviews, on_window=on_window
+        )
 
-    def fetch_new_reviews(self, last_sync: Optional[str]) -> List[ReviewEntry]:
+    def fetch_new_reviews(
+        self, last_sync: Optional[str], on_window: Optional[Callable] = None
+    ) -> List[ReviewRecord]:
         """
         Fetches new reviews for the specified business since the last sync.
 
         Args:
             last_sync (Optional[str]): The UTC datetime of the last sync.
+            on_window (Optional[Callable]): Called with each window of new reviews as it arrives.
 
         Returns:
-            List[ReviewEntry]: A list of validated new review entries.
+            List[ReviewRecord]: A list of validated new review records.
         """
         try:
-            return self.fetch_reviews(last_sync, n_reviews=float("inf"))
+            return self.fetch_reviews(
+                last_sync, n_reviews=float("inf"), on_window=on_window
+            )
         except Exception as e:
             self.logger.error(f"Error fetching new reviews: {e}")
             return []
@@ -59,32 +94,56 @@ class YelpConnector:
         max_retries: int = 5,
         initial_backoff: float = 1.0,
         start_offset: int = 0,
-    ) -> List[ReviewEntry]:
+        start_page: Optional[int] = None,
+        skip_review_ids: Optional[Set[str]] = None,
+        on_window: Optional[Callable] = None,
+    ) -> List[ReviewRecord]:
         """
         Fetches reviews from the Yelp API for a given business.
 
+        Up to `max_concurrency` page windows are requested in parallel over a
+        keep-alive session; windows are merged in page order and fetching stops
+        at the first short window (end of reviews or crossed last_sync).
+
         Args:
             last_sync (Optional[str]): The UTC datetime of the last sync. If None or empty, fetches all reviews.
             n_reviews (int, optional): The maximum number of reviews to fetch. Defaults to infinity.
             max_retries (int, optional): The maximum number of retry attempts for failed requests. Defaults to 5.
             initial_backoff (float, optional): The initial backoff time in seconds. Defaults to 1.0.
             start_offset (int, optional): The offset to start fetching reviews from. Defaults to 0.
+            start_page (Optional[int]): Continue the stored checkpoint from this page instead of starting a new one.
+            skip_review_ids (Optional[Set[str]]): Review ids already persisted, dropped from the result.
+            on_window (Optional[Callable]): Called in page order with each window of new reviews, so
+                analysis can start before the fetch finishes. May block to apply backpressure.
 
         Returns:
-            List[ReviewEntry]: A list of validated review entries.
+            List[ReviewRecord]: A list of validated review records.
         """
         self.job.update_status(JobStatus.IN_PROGRESS.value)
 
-        url = "https://red-flower-business-data.p.rapidapi.com/business-reviews"
+        url = f"{self.api_base_url}/business-reviews"
         headers = {
             "x-rapidapi-key": os.environ["RAPIDAPI_KEY"],
-            "x-rapidapi-host": "red-flower-business-data.p.rapidapi.com",
+            "x-rapidapi-host": RAPIDAPI_HOST,
         }
 
         reviews_list = []
         page_size = 45
         total_fetched = 0
-        page = (start_offset // page_size) + 1
+        skip_review_ids = skip_review_ids or set()
+        if start_page is None:
+            page = (start_offset // page_size) + 1
+            self.checkpoints.start(
+                FetchCheckpoint(
+                    business_id=self.business_id,
+                    company_id=self.company_id,
+                    last_sync=last_sync,
+                    next_page=page,
+                    persisted_page=page,
+                )
+            )
+        else:
+            page = start_page
 
         last_sync_dt = self._parse_last_sync(last_sync)
         self.logger.info(
@@ -92,55 +151,115 @@ class YelpConnector:
         )
 
         fetch_completed = True  # Flag to track if fetch process completed successfully
+        fetch_error = None
 
         num_pages = 5  # Number of pages to fetch at a time
+        window_size = page_size * num_pages
+
+        # Cap the number of windows so we never request pages beyond n_reviews
+        max_windows = (
+            float("inf")
+            if n_reviews == float("inf")
+            else max(1, -(-int(n_reviews) // window_size))
+        )
+
+        def fetch_window(window_page):
+            params = self._build_request_params(
+                self.business_id, window_page, page_size, num_pages
+            )
+            response, error = self._make_api_request(
+                url, headers, params, max_retries, initial_backoff
+            )
+            if response is None:
+                return None, None, error
+            processed = self._process_response(response, self.company_id, last_sync_dt)
+            # Unchanged reviews are already stored and analyzed, never redo them
+            fresh = [
+                r
+                for r in processed
+                if r.review_id not in skip_review_ids
+                and r.ingest_status != IngestStatus.UNCHANGED
+            ]
+            return processed, fresh, None
 
         try:
-            while total_fetched < n_reviews:
-                params = self._build_request_params(
-                    self.business_id, page, page_size, num_pages
-                )
-                response = self._make_api_request(
-                    url, headers, params, max_retries, initial_backoff
+            self._stop_fetch.clear()
+            executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="yelp-fetch"
+            )
+            in_flight = []  # (page, future) pairs, kept in page order
+            windows_submitted = 0
+
+            def submit_next():
+                nonlocal windows_submitted
+                if windows_submitted >= max_windows:
+                    return
+                window_page = page + windows_submitted * num_pages
+                in_flight.append(
+                    (
+                        window_page,
+                        executor.submit(bind_context(fetch_window), window_page),
+                    )
                 )
+                windows_submitted += 1
 
-                if not response:
-                    self.logger.error(
-                        f"Failed to fetch page {page} after {max_retries} attempts. Stopping fetch."
-                    )
-                    fetch_completed = False
-                    break
+            try:
+                for _ in range(self.max_concurrency):
+                    submit_next()
+
+                # Consume windows strictly in page order so reviews stay sorted newest-first
+                while in_flight and total_fetched < n_reviews:
+                    window_page, future = in_flight.pop(0)
+                    processed, new_reviews, error = future.result()
+
+                    if processed is None:
+                        # Only the window next in page order decides that the fetch failed
+                        self.logger.error(
+                            f"Failed to fetch page {window_page} after {max_retries} attempts. Stopping fetch."
+                        )
+                        fetch_completed = False
+                        fetch_error = f"Failed to fetch reviews after {max_retries} attempts: {error}"
+                        break
 
-                new_reviews = self._process_response(
-                    response, self.company_id, last_sync_dt
-                )
-                if not new_reviews:
-                    self.logger.info(
-                        f"No new reviews found on page {page}. Stopping fetch."
-                    )
-                    break
+                    if not processed:
+                        self.logger.info(
+                            "No new reviews found on page %s. Stopping fetch.",
+                            window_page,
+                        )
+                        break
 
-                reviews_list.extend(new_reviews)
-                total_fetched += len(new_reviews)
-                self.logger.info(
-                    f"Fetched {len(new_reviews)} new reviews, total fetched: {total_fetched}"
-                )
+                    next_page = window_page + num_pages
+                    if len(new_reviews) > n_reviews - total_fetched:
+                        # Only part of this window is kept; resume from the page after it
+                        new_reviews = new_reviews[: int(n_reviews - total_fetched)]
+                        consumed = processed.index(new_reviews[-1]) + 1
+                        next_page = window_page + consumed // page_size
 
-                self._save_progress(
-                    self.business_id, total_fetched + start_offset, last_sync
-                )
-                self.job.update_status(
-                    JobStatus.IN_PROGRESS.value, total_reviews_fetched=total_fetched
-                )
+                    reviews_list.extend(new_reviews)
+                    total_fetched += len(new_reviews)
+                    self.logger.info(
+                        "Fetched %d new reviews, total fetched: %d",
+                        len(new_reviews),
+                        total_fetched,
+                    )
 
-                if (
-                    len(new_reviews) < page_size * num_pages
-                    or total_fetched >= n_reviews
-                ):
-                    break
-                page += num_pages
+                    self._save_progress(next_page, new_reviews, last_sync)
+                    if on_window and new_reviews:
+                        on_window(new_reviews)
+                    self.job.update_status(
+                        JobStatus.IN_PROGRESS.value, total_reviews_fetched=total_fetched
+                    )
 
-            reviews_list = reviews_list[:n_reviews]
+                    # A short window means we reached the end or crossed last_sync
+                    if len(processed) < window_size or total_fetched >= n_reviews:
+                        break
+                    submit_next()
+            finally:
+                # Later windows are no longer needed once we stop; don't let them retry
+                self._stop_fetch.set()
+                for _, future in in_flight:
+                    future.cancel()
+                executor.shutdown(wait=True)
 
             if reviews_list:
                 latest_review_date = max(review.review_date for review in reviews_list)
@@ -153,11 +272,14 @@ class YelpConnector:
                         last_sync=latest_review_date,
                     )
                 else:
+                    error_message = (
+                        f"Fetch process interrupted due to API failures. {fetch_error}"
+                    )
                     self.job.update_status(
                         JobStatus.FAILED.value,
                         total_reviews_fetched=len(reviews_list),
                         last_sync=latest_review_date,
-                        error_message="Fetch process interrupted due to API failures.",
+                        error_message=error_message,
                     )
                     publish_job_status(
                         self.company_id,
@@ -166,21 +288,24 @@ class YelpConnector:
                             "status": JobStatus.FAILED.value,
                             "total_reviews_fetched": len(reviews_list),
                             "last_sync": latest_review_date,
-                            "error_message": "Fetch process interrupted due to API failures.",
+                            "error_message": error_message,
                         },
                     )
             else:
-                self.logger.warning("No reviews found or all requests failed.")
+                error_message = (
+                    fetch_error or "No reviews found or all requests failed."
+                )
+                self.logger.warning(error_message)
                 self.job.update_status(
                     JobStatus.FAILED.value,
-                    error_message="No reviews found or all requests failed.",
+                    error_message=error_message,
                 )
                 publish_job_status(
                     self.company_id,
                     {
                         "job_id": self.job_id,
                         "status": JobStatus.FAILED.value,
-                        "error_message": "No reviews found or all requests failed.",
+                        "error_message": error_message,
                     },
                 )
 
@@ -191,51 +316,111 @@ class YelpConnector:
             return []
 
     def _save_progress(
-        self, business_id: str, total_fetched: int, last_sync: Optional[str]
+        self, next_page: int, reviews: List[ReviewRecord], last_sync: Optional[str]
     ):
         """
-        Saves the progress of the review fetching process.
+        Advances the shared fetch checkpoint after a window has been fetched.
 
         Args:
-            business_id (str): The ID of the business.
-            total_fetched (int): The total number of reviews fetched so far.
+            next_page (int): The first page not yet fetched.
+            reviews (List[ReviewRecord]): The reviews fetched in this window.
             last_sync (Optional[str]): The last sync datetime.
         """
-        progress = {
-            "business_id": business_id,
-            "total_fetched": total_fetched,
-            "last_sync": last_sync,
-        }
-        with open(f"progress/progress_{business_id}.json", "w") as f:
-            json.dump(progress, f)
 
-    def resume_fetch(self, business_id: str) -> Tuple[List[ReviewEntry], int]:
+        def advance(checkpoint: FetchCheckpoint):
+            checkpoint.next_page = max(checkpoint.next_page, next_page)
+            checkpoint.total_fetched += len(reviews)
+            checkpoint.last_sync = last_sync
+            checkpoint.analysis_state = AnalysisState.FETCHING
+
+        self.checkpoints.update(
+            self.company_id,
+            self.business_id,
+            advance,
+            review_ids=[r.review_id for r in reviews],
+        )
+
+    def update_checkpoint(
+        self, state: str, persisted_reviews: Optional[List[ReviewRecord]] = None
+    ):
         """
-        Resumes fetching reviews from the last saved progress.
+        Records the analysis state of the fetched reviews on the checkpoint.
+
+        Persisted review ids are remembered so a resume never analyzes them
+        twice. The pages fetched so far only count as done once every review
+        fetched from them is persisted; otherwise a resume starts from the
+        same page and picks up the reviews that were not saved.
+
+        Args:
+            state (str): One of AnalysisState.
+            persisted_reviews (Optional[List[ReviewRecord]]): Reviews saved to DynamoDB.
+        """
+        persisted_reviews = persisted_reviews or []
+        persisted_ids = [r.review_id for r in persisted_reviews]
+        unsaved = set()
+        if state == AnalysisState.PERSISTED:
+            unsaved = self.checkpoints.unpersisted_review_ids(
+                self.company_id, self.business_id
+            ) - set(persisted_ids)
+            if unsaved:
+                self.logger.warning(
+                    "%d fetched reviews were not persisted; keeping the checkpoint at its last persisted page",
+                    len(unsaved),
+                )
+
+        def set_state(checkpoint: FetchCheckpoint):
+            checkpoint.analysis_state = state
+            if state == AnalysisState.PERSISTED:
+                if not unsaved:
+                    checkpoint.persisted_page = checkpoint.next_page
+                checkpoint.total_persisted += len(persisted_reviews)
+
+        self.checkpoints.update(
+            self.company_id,
+            self.business_id,
+            set_state,
+            review_ids=persisted_ids,
+            id_set="persisted",
+        )
+
+    def resume_fetch(
+        self, business_id: str, on_window: Optional[Callable] = None
+    ) -> Tuple[List[ReviewRecord], int]:
+        """
+        Resumes fetching reviews from the last persisted page of the shared checkpoint.
 
         Args:
             business_id (str): The ID of the business to resume fetching for.
+            on_window (Optional[Callable]): Called with each window of new reviews as it arrives.
 
         Returns:
-            Tuple[List[ReviewEntry], int]: A tuple containing the list of fetched reviews and the total number of reviews fetched.
+            Tuple[List[ReviewRecord], int]: A tuple containing the list of fetched reviews and the total number of reviews fetched.
         """
-        try:
-            with open(f"progress/progress_{business_id}.json", "r") as f:
-                progress = json.load(f)
+        checkpoint = self.checkpoints.load(self.company_id, business_id)
+        if checkpoint is None:
+            self.logger.warning(
+                f"No checkpoint found for business_id: {business_id}. Starting from the beginning."
+            )
+            return self.fetch_historical_reviews(on_window=on_window), 0
 
-            start_offset = progress["total_fetched"]
-            last_sync = progress["last_sync"]
+        persisted_ids = self.checkpoints.persisted_review_ids(
+            self.company_id, business_id
+        )
+        self.logger.info(
+            f"Resuming business_id: {business_id} from page {checkpoint.persisted_page} "
+            f"(state: {checkpoint.analysis_state}, {len(persisted_ids)} reviews already persisted)"
+        )
 
-            # add n_reviews if only resuming by a certain amount not fetching all reviews
-            new_reviews = self.fetch_reviews(last_sync, start_offset=start_offset)
-            total_fetched = start_offset + len(new_reviews)
+        # add n_reviews if only resuming by a certain amount not fetching all reviews
+        new_reviews = self.fetch_reviews(
+            checkpoint.last_sync,
+            start_page=checkpoint.persisted_page,
+            skip_review_ids=persisted_ids,
+            on_window=on_window,
+        )
+        total_fetched = checkpoint.total_persisted + len(new_reviews)
 
-            return new_reviews, total_fetched
-        except FileNotFoundError:
-            self.logger.warning(
-                f"No progress file found for business_id: {business_id}. Starting from the beginning."
-            )
-            return self.fetch_historical_reviews(), 0
+        return new_reviews, total_fetched
 
     def _parse_last_sync(self, last_sync: Optional[str]) -> Optional[datetime]:
         if not last_sync:
@@ -268,97 +453,171 @@ class YelpConnector:
         params: dict,
         max_retries: int,
         initial_backoff: float,
-    ) -> Optional[requests.Response]:
+    ) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """
+        Requests one window, retrying with exponential backoff.
+
+        Windows may be fetched speculatively ahead of the page being consumed,
+        so failures are returned rather than written to the job; the caller
+        decides whether the fetch as a whole failed.
+
+        Returns:
+            Tuple[Optional[requests.Response], Optional[str]]: The response, or None and the last error.
+        """
         backoff = initial_backoff
+        error = None
         for attempt in range(max_retries):
+            if self._stop_fetch.is_set():
+                return None, "Fetch stopped"
             self.logger.info(
-                f"Fetching page {params['page']} (attempt {attempt + 1}/{max_retries})"
+                "Fetching page %s (attempt %d/%d)",
+                params["page"],
+                attempt + 1,
+                max_retries,
             )
+            throttled = False
             try:
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-                self.logger.warning(f"response: {response}")
+                if not self.rate_limiter.acquire():
+                    raise requests.Timeout(
+                        "Timed out waiting for a RapidAPI rate limit token"
+                    )
+                # Retries stay here so failures are reflected on the job
+                self.timings.add("fetch", api_calls=1)
+                response = http_client.get(
+                    url, headers=headers, params=params, timeout=10, max_retries=0
+                )
+                self.logger.debug("response: %s", response)
+                self.rate_limiter.record_quota(response.headers)
+                if response.status_code == 429:
+                    # Hold back every worker on this key, not just this one
+                    throttled = True
+                    self.rate_limiter.penalize(
+                        http_client.retry_after(response) or backoff
+                    )
                 response.raise_for_status()
 
-                return response
+                return response, None
             except requests.RequestException as e:
+                error = str(e)
                 self.logger.warning(
-                    f"Request failed: {e}. Retrying in {backoff:.2f} seconds... (attempt {attempt + 1}/{max_retries})"
+                    "Request failed: %s. Retrying in %.2f seconds... (attempt %d/%d)",
+                    e,
+                    backoff,
+                    attempt + 1,
+                    max_retries,
                 )
+                if self._stop_fetch.is_set():
+                    # The fetch already finished without this window
+                    return None, error
                 if attempt == max_retries - 1:
                     self.logger.error(
-                        f"Failed to fetch reviews after {max_retries} attempts."
-                    )
-                    self.job.update_status(
-                        JobStatus.FAILED.value,
-                        error_message=f"Failed to fetch reviews after {max_retries} attempts: {str(e)}",
-                    )
-                    publish_job_status(
-                        self.company_id,
-                        {
-                            "job_id": self.job_id,
-                            "status": JobStatus.FAILED.value,
-                            "error_message": f"Failed to fetch reviews after {max_retries} attempts: {str(e)}",
-                        },
+                        f"Failed to fetch page {params['page']} after {max_retries} attempts."
                     )
-                    return None
-                time.sleep(backoff)
+                    return None, error
+                if not throttled:
+                    # After a 429 the shared bucket already enforces the wait
+                    self._stop_fetch.wait(backoff)
                 backoff *= 2  # Exponential backoff
 
-        return None
+        return None, error
 
     def _process_response(
         self,
         response: requests.Response,
         company_id: str,
         last_sync_dt: Optional[datetime],
-    ) -> List[ReviewEntry]:
+    ) -> List[ReviewRecord]:
         try:
-            reviews_data = response.json()
+            reviews_data = http_client.json_body(response)
             data = reviews_data.get("data", {})
             reviews = data.get("reviews", [])
             total_reviews = data.get("total", 0)
 
             # Debug logging to check the type and content of reviews
-            self.logger.debug(f"Type of reviews: {type(reviews)}, Content: {reviews}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "Type of reviews: %s, Content: %s", type(reviews), reviews
+                )
 
             if not isinstance(reviews, list):
                 self.logger.error(f"Expected list of reviews, got {type(reviews)}")
                 return []
 
+            # Parse the whole page's timestamps in one vectorized call
+            review_times = pd.to_datetime(
+                [review.get("review_datetime_utc") for review in reviews],
+                utc=True,
+                format="ISO8601",
+                errors="coerce",
+            )
+            keep = review_times.notna()
+            if last_sync_dt:
+                keep &= review_times > last_sync_dt
+            invalid_times = int(review_times.isna().sum())
+            if invalid_times:
+                self.logger.warning(
+                    "Skipping %d reviews without a valid review_datetime_utc",
+                    invalid_times,
+                )
+
+            # Pages that pass the schema check skip per-review pydantic validation
+            trusted = self._page_is_trusted(reviews)
+
             new_reviews = []
-            for review in reviews:
-                review_dt = datetime.fromisoformat(
-                    review.get("review_datetime_utc")
-                ).replace(tzinfo=timezone.utc)
-                if last_sync_dt and review_dt <= last_sync_dt:
+            for review, review_dt, keep_review in zip(reviews, review_times, keep):
+                if not keep_review:
                     continue
 
+                fields = dict(
+                    business_id=self.business_id,
+                    company_id=company_id,
+                    review_id=review.get("review_id"),
+                    review_date=review_dt.isoformat(),  # Convert datetime to ISO format string
+                    review_text=review.get("review_text", ""),
+                    review_url=f"https://www.yelp.com/biz/{self.business_id}?hrid={review.get('review_id')}&utm_campaign=www_review_share_popup&utm_medium=copy_link&utm_source=(direct)",
+                    rating=float(
+                        review.get("review_rating", 0)
+                    ),  # Ensure rating is a float
+                    total_reviews=int(total_reviews or 0),
+                    platform_id="Yelp",
+                    author_name=review.get("author_name") or "Anonymous",
+                    author_image_url=review.get("author_image_url") or "No Url",
+                )
+                if trusted:
+                    new_reviews.append(ReviewRecord(**fields))
+                    continue
                 try:
-                    review_entry = ReviewEntry(
-                        business_id=self.business_id,
-                        company_id=company_id,
-                        review_id=review.get("review_id"),
-                        review_date=review_dt.isoformat(),  # Convert datetime to ISO format string
-                        review_text=review.get("review_text", ""),
-                        review_url=f"https://www.yelp.com/biz/{self.business_id}?hrid={review.get('review_id')}&utm_campaign=www_review_share_popup&utm_medium=copy_link&utm_source=(direct)",
-                        rating=float(
-                            review.get("review_rating", 0)
-                        ),  # Ensure rating is a float
-                        total_reviews=total_reviews,
-                        platform_id="Yelp",
-                        author_name=review.get("author_name") or "Anonymous",
-                        author_image_url=review.get("author_image_url") or "No Url",
-                    )
-                    new_reviews.append(review_entry)
+                    new_reviews.append(ReviewRecord.from_entry(ReviewEntry(**fields)))
                 except ValidationError as ve:
-                    self.logger.warning(review)
-                    self.logger.warning(f"Skipping invalid review: {ve}")
+                    self.logger.warning("Skipping invalid review: %s", ve)
+                    self.logger.debug("Invalid review payload: %s", review)
+
+            statuses = self.dedup_index.classify(new_reviews)
+            for review_entry in new_reviews:
+                review_entry.ingest_status = statuses[review_entry.review_id]
 
             return new_reviews
         except (json.JSONDecodeError, KeyError) as e:
             self.logger.error(f"Error processing response: {e}")
             return []
 
+    @staticmethod
+    def _page_is_trusted(reviews: list) -> bool:
+        """
+        Cheap schema check of a page of raw reviews.
+
+        When every review has a string id and text and a numeric rating, the
+        records can be built without running full pydantic validation.
+        """
+        return all(
+            isinstance(review, dict)
+            and isinstance(review.get("review_id"), str)
+            and isinstance(review.get("review_text", ""), str)
+            and isinstance(review.get("review_rating", 0), (int, float))
+            and not isinstance(review.get("review_rating", 0), bool)
+            for review in reviews
+        )
+
     def _update_last_sync(self, latest_review_date: str):
         try:
             company = CompanyModel.get_company_by_id(self.company_id)
@@ -1,6 +1,7 @@
 import datetime
 import json
 import pynamodb
+from pynamodb.exceptions import UpdateError
 from pynamodb.models import Model
 from pynamodb.attributes import (
     UnicodeAttribute,
@@ -14,8 +15,12 @@ import os
 from dotenv import load_dotenv
 from enum import Enum
 
+from modules.logger_setup import get_logger
+
 load_dotenv(override=True)
 
+logger = get_logger(__name__)
+
 
 DYNAMODB_URL = os.getenv("DYNAMODB_URL", "http://localhost:8000")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-2")
@@ -46,6 +51,8 @@ class JobModel(Model):
     error_message = UnicodeAttribute(null=True)
     created_at = UnicodeAttribute()
     updated_at = UnicodeAttribute()
+    # Per-stage seconds, item and call counts, see connectors.job_timings
+    stage_timings = JSONAttribute(null=True)
 
     @classmethod
     def create_job(cls, job_id, company_id, connector_type):
@@ -77,6 +84,48 @@ class JobModel(Model):
         self.updated_at = datetime.datetime.now().isoformat()
         self.save()
 
+    def to_dict(self):
+        """
+        Returns the job as published on the job_status channel and by the API.
+        """
+        return {
+            "job_id": self.job_id,
+            "company_id": self.company_id,
+            "connector_type": self.connector_type,
+            "status": self.status,
+            "total_reviews_fetched": self.total_reviews_fetched,
+            "last_sync": self.last_sync,
+            "error_message": self.error_message,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "stage_timings": self.stage_timings,
+        }
+
+    @classmethod
+    def record_stage_timings(cls, company_id, stage_timings):
+        """
+        Stores the stage breakdown on the company's job without rewriting the item.
+
+        Jobs are keyed by company, so the next job replaces this one; the
+        breakdown is also appended to the company's JobTimings history.
+
+        Returns:
+            JobModel: The updated job, or None if the company has no job.
+        """
+        job = cls.get_most_recent_job(company_id)
+        if job:
+            job.update(actions=[cls.stage_timings.set(stage_timings)])
+            try:
+                JobTimingsModel.record(job, stage_timings)
+            except Exception:
+                # History is for analysis only; never fail the job over it
+                logger.warning(
+                    "Could not record timings history for job %s",
+                    job.job_id,
+                    exc_info=True,
+                )
+        return job
+
     @classmethod
     def fetch_all_jobs(cls):
         return cls.scan()  # Fetch all companies from the table
@@ -116,6 +165,72 @@ class JobModel(Model):
             job.save()
 
 
+class JobTimingsModel(Model):
+    """
+    Stage breakdown of every ingest job, kept per company in job order.
+
+    `job_key` is "<job created_at>#<job_id>", so a query returns the
+    company's jobs oldest first.
+    """
+
+    class Meta:
+        table_name = "JobTimings"
+        region = AWS_REGION
+        host = DYNAMODB_URL
+
+    company_id = UnicodeAttribute(hash_key=True)
+    job_key = UnicodeAttribute(range_key=True)
+    job_id = UnicodeAttribute()
+    connector_type = UnicodeAttribute(null=True)
+    status = UnicodeAttribute(null=True)
+    created_at = UnicodeAttribute()
+    stage_timings = JSONAttribute(null=True)
+
+    @classmethod
+    def record(cls, job, stage_timings):
+        cls(
+            company_id=job.company_id,
+            job_key=f"{job.created_at}#{job.job_id}",
+            job_id=job.job_id,
+            connector_type=job.connector_type,
+            status=job.status,
+            created_at=job.created_at,
+            stage_timings=stage_timings,
+        ).save()
+
+    @classmethod
+    def fetch_history(cls, company_id, limit=50, since=None):
+        """
+        Returns the company's most recent job timings, newest first.
+
+        Args:
+            since (Optional[str]): Only jobs created at or after this ISO timestamp.
+        """
+        range_condition = cls.job_key >= since if since else None
+        return list(
+            cls.query(
+                company_id,
+                range_condition,
+                scan_index_forward=False,
+                limit=limit,
+            )
+        )
+
+    @classmethod
+    def ensure_table_exists(cls):
+        if not cls.exists():
+            cls.create_table(read_capacity_units=10, write_capacity_units=10)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "connector_type": self.connector_type,
+            "status": self.status,
+            "created_at": self.created_at,
+            "stage_timings": self.stage_timings,
+        }
+
+
 class ConnectorModel(MapAttribute):
     type = UnicodeAttribute()
     config = MapAttribute()  # Use MapAttribute for nested objects
@@ -346,6 +461,8 @@ class ReviewModel(Model):
     author_name = UnicodeAttribute(default="Anonymous")
     author_image_url = UnicodeAttribute(default="No Url")
     ai_response = UnicodeAttribute(null=True)
+    # Representative review this one near-duplicates (connectors.near_duplicates)
+    duplicate_of = UnicodeAttribute(null=True)
 
     @classmethod
     def fetch_review_by_comp_id_review_id(cls, company_id, review_id):
@@ -354,6 +471,30 @@ class ReviewModel(Model):
         except cls.DoesNotExist:
             return None
 
+    @classmethod
+    def from_record(cls, record):
+        """
+        Builds an unsaved review item straight from a ReviewRecord's attributes.
+        """
+        return cls(
+            business_id=record.business_id,
+            company_id=record.company_id,
+            review_date=record.review_date,
+            review_id=record.review_id,
+            review_text=record.review_text,
+            review_url=record.review_url or "",
+            rating=str(int(record.rating or 0)),
+            total_reviews=str(int(record.total_reviews or 0)),
+            platform_id=record.platform_id or "",
+            assigned_label=[str(label) for label in record.assigned_label or []],
+            named_labels=list(record.named_labels or []),
+            sentiment=float(record.sentiment or 0.0),
+            polarity=float(record.polarity or 0.0),
+            author_name=record.author_name or "Anonymous",
+            author_image_url=record.author_image_url or "",
+            duplicate_of=record.duplicate_of,
+        )
+
     @classmethod
     def create_review(cls, review_data):
         review = cls(**review_data)  # Unpack the review_data dictionary
@@ -392,6 +533,88 @@ class ReviewModel(Model):
         except Exception as e:
             return {"status": "error", "message": f"Failed to fetch reviews: {e}"}
 
+    @classmethod
+    def fetch_latest_review_keys(cls, company_id, limit):
+        """
+        Returns (review_id, review_date) for the company's newest `limit` reviews
+        (all of them if `limit` is None), skipping near-duplicates whose
+        representative is still stored.
+        """
+        reviews = list(
+            cls.query(
+                company_id,
+                attributes_to_get=["review_id", "review_date", "duplicate_of"],
+            )
+        )
+        stored_ids = {review.review_id for review in reviews}
+        keys = [
+            (review.review_id, review.review_date)
+            for review in reviews
+            if not review.duplicate_of or review.duplicate_of not in stored_ids
+        ]
+        keys.sort(key=lambda key: key[1], reverse=True)
+        return keys[:limit]
+
+    @classmethod
+    def fetch_analysis_results(cls, company_id, review_ids):
+        """
+        Batch-gets the stored topic labels of the given reviews.
+
+        Returns:
+            dict: review_id -> review item with only the label attributes.
+        """
+        fields = ["review_id", "assigned_label", "named_labels"]
+        return {
+            review.review_id: review
+            for review in cls.batch_get(
+                [(company_id, review_id) for review_id in review_ids],
+                attributes_to_get=fields,
+            )
+        }
+
+    @classmethod
+    def fetch_category_stat_rows(cls, company_id):
+        """
+        Returns review_date, named_labels, sentiment and rating of every review
+        of the company, as dicts for modules.category_stats.
+        """
+        fields = ["review_date", "named_labels", "sentiment", "rating"]
+        return [
+            {field: getattr(review, field) for field in fields}
+            for review in cls.query(company_id, attributes_to_get=fields)
+        ]
+
+    @classmethod
+    def fetch_stat_rows(cls, company_id, review_ids):
+        """
+        Batch-gets the rollup fields of the given reviews, for those already stored.
+
+        Returns:
+            dict: review_id -> dict with review_date, named_labels, sentiment and rating.
+        """
+        fields = ["review_date", "named_labels", "sentiment", "rating"]
+        return {
+            review.review_id: {field: getattr(review, field) for field in fields}
+            for review in cls.batch_get(
+                [(company_id, review_id) for review_id in review_ids],
+                attributes_to_get=["review_id"] + fields,
+            )
+        }
+
+    @classmethod
+    def fetch_review_texts(cls, company_id, review_ids):
+        """
+        Batch-gets the text and date of the given reviews, newest first.
+        """
+        reviews = list(
+            cls.batch_get(
+                [(company_id, review_id) for review_id in review_ids],
+                attributes_to_get=["review_id", "review_date", "review_text"],
+            )
+        )
+        reviews.sort(key=lambda review: review.review_date, reverse=True)
+        return reviews
+
     @classmethod
     def update_review_urls(cls):
         reviews = cls.fetch_all_reviews()
@@ -460,10 +683,20 @@ class InboxModel(Model):
     author_name = UnicodeAttribute(default="Anonymous")
     author_image_url = UnicodeAttribute(default="No Url")
     ai_response = UnicodeAttribute(null=True)
+    duplicate_of = UnicodeAttribute(null=True)
 
     @classmethod
     def create_inbox_item(cls, user_id, review):
-        inbox_item = cls(
+        inbox_item = cls.build_inbox_item(user_id, review)
+        inbox_item.save()
+        return inbox_item
+
+    @classmethod
+    def build_inbox_item(cls, user_id, review):
+        """
+        Builds an unsaved inbox item for a review, e.g. for batch writes.
+        """
+        return cls(
             user_id=user_id,
             review_id=review.review_id,
             created_at=datetime.datetime.now().isoformat(),
@@ -476,23 +709,24 @@ class InboxModel(Model):
             review_url=review.review_url if hasattr(review, "review_url") else "No Url",
             rating=review.rating,
             total_reviews=review.total_reviews,
-            platform_id=review.platform_id
-            if hasattr(review, "platform_id")
-            else "Yelp",
-            assigned_label=review.assigned_label
-            if hasattr(review, "assigned_label")
-            else [],
+            platform_id=(
+                review.platform_id if hasattr(review, "platform_id") else "Yelp"
+            ),
+            assigned_label=(
+                review.assigned_label if hasattr(review, "assigned_label") else []
+            ),
             named_labels=review.named_labels if hasattr(review, "named_labels") else [],
-            author_name=review.author_name
-            if hasattr(review, "author_name")
-            else "Anonymous",
-            author_image_url=review.author_image_url
-            if hasattr(review, "author_image_url")
-            else "No Url",
+            author_name=(
+                review.author_name if hasattr(review, "author_name") else "Anonymous"
+            ),
+            author_image_url=(
+                review.author_image_url
+                if hasattr(review, "author_image_url")
+                else "No Url"
+            ),
             ai_response=review.ai_response if hasattr(review, "ai_response") else None,
+            duplicate_of=getattr(review, "duplicate_of", None),
         )
-        inbox_item.save()
-        return inbox_item
 
     @classmethod
     def fetch_inbox_item_by_id(cls, inbox_id):
@@ -541,6 +775,54 @@ class InboxModel(Model):
         except cls.DoesNotExist:
             return None  # Return None if the item does not exist
 
+    @classmethod
+    def fetch_inbox_items(cls, user_id, review_ids):
+        """
+        Batch-gets the user's inbox items for `review_ids`, in the order given.
+        """
+        items = {
+            item.review_id: item
+            for item in cls.batch_get(
+                [(user_id, review_id) for review_id in review_ids]
+            )
+        }
+        return [items[review_id] for review_id in review_ids if review_id in items]
+
+    @classmethod
+    def fetch_items_without_ai_response(cls, user_id, review_ids):
+        """
+        Batch-gets the user's inbox items for `review_ids` that have review text
+        but no AI response yet.
+        """
+        keys = [(user_id, review_id) for review_id in review_ids]
+        return [
+            item
+            for item in cls.batch_get(keys)
+            if item.review_text and not item.ai_response
+        ]
+
+    @classmethod
+    def set_ai_response_if_missing(cls, user_id, review_id, ai_response):
+        """
+        Sets only `ai_response`, unless the item already has one or is gone.
+
+        An empty `ai_response` counts as missing, as in fetch_items_without_ai_response.
+
+        Returns:
+            bool: True if the response was written.
+        """
+        try:
+            cls(user_id=user_id, review_id=review_id).update(
+                actions=[cls.ai_response.set(ai_response)],
+                condition=cls.review_id.exists()
+                & (cls.ai_response.does_not_exist() | (cls.ai_response == "")),
+            )
+            return True
+        except UpdateError as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                return False
+            raise
+
     @classmethod
     def remove_inbox_items_by_company_and_platform(cls, user_id, platform_id):
         try:
@@ -623,6 +905,87 @@ class InboxEditorModel(Model):
         return cls.query(user_id)
 
 
+class CompanyStatsModel(Model):
+    """
+    Pre-aggregated review counters per company and week, kept up to date at
+    ingest with atomic ADD updates so dashboards never read raw reviews.
+
+    `bucket` is "<week start>#all" for the week's totals and
+    "<week start>#label#<named label>" for one category, e.g. "2024-06-03#all".
+    """
+
+    class Meta:
+        table_name = "CompanyStats"
+        region = AWS_REGION
+        host = DYNAMODB_URL
+
+    company_id = UnicodeAttribute(hash_key=True)
+    bucket = UnicodeAttribute(range_key=True)
+    review_count = NumberAttribute(default=0)
+    rating_sum = NumberAttribute(default=0)
+    rating_count = NumberAttribute(default=0)
+    rating_1 = NumberAttribute(default=0)
+    rating_2 = NumberAttribute(default=0)
+    rating_3 = NumberAttribute(default=0)
+    rating_4 = NumberAttribute(default=0)
+    rating_5 = NumberAttribute(default=0)
+    sentiment_sum = NumberAttribute(default=0)
+    sentiment_count = NumberAttribute(default=0)
+
+    COUNTERS = (
+        "review_count",
+        "rating_sum",
+        "rating_count",
+        "rating_1",
+        "rating_2",
+        "rating_3",
+        "rating_4",
+        "rating_5",
+        "sentiment_sum",
+        "sentiment_count",
+    )
+
+    @classmethod
+    def add_counters(cls, company_id, bucket, deltas):
+        """
+        Atomically adds `deltas` (counter name -> amount) to one rollup,
+        creating it if needed.
+        """
+        actions = [
+            getattr(cls, name).add(amount)
+            for name, amount in deltas.items()
+            if name in cls.COUNTERS and amount
+        ]
+        if actions:
+            cls(company_id=company_id, bucket=bucket).update(actions=actions)
+
+    @classmethod
+    def fetch_buckets(cls, company_id, since_week):
+        """
+        Returns the company's rollups from the week starting `since_week` (YYYY-MM-DD) on.
+        """
+        return list(cls.query(company_id, cls.bucket >= since_week))
+
+    @classmethod
+    def replace_company_stats(cls, company_id, rollups):
+        """
+        Replaces all of the company's rollups with `rollups` (bucket -> counters).
+        """
+        with cls.batch_write() as batch:
+            for item in cls.query(
+                company_id, attributes_to_get=["company_id", "bucket"]
+            ):
+                if item.bucket not in rollups:
+                    batch.delete(item)
+            for bucket, counters in rollups.items():
+                batch.save(cls(company_id=company_id, bucket=bucket, **counters))
+
+    @classmethod
+    def ensure_table_exists(cls):
+        if not cls.exists():
+            cls.create_table(read_capacity_units=10, write_capacity_units=10)
+
+
 def export_reviews():
     """
     Export all reviews from the ReviewModel table.
@@ -0,0 +1,90 @@
+"""
+AI-drafted replies to reviews: the prompt, on-demand generation, and batch
+pre-generation of drafts for newly ingested reviews.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+from dotenv import load_dotenv
+
+from models.models import InboxModel
+from modules import llm_gateway
+from modules.logger_setup import get_logger
+from modules.metrics import bind_context
+
+load_dotenv(override=True)
+
+logger = get_logger(__name__)
+
+# Pre-generate drafts for new reviews after each persisted batch
+AI_DRAFTS_ENABLED = os.getenv("AI_DRAFTS_ENABLED", "false").lower() == "true"
+# Drafts generated in parallel per job; the gateway's own limit still applies
+AI_DRAFTS_CONCURRENCY = int(os.getenv("AI_DRAFTS_CONCURRENCY", 4))
+AI_DRAFTS_QUEUE = os.getenv("AI_DRAFTS_QUEUE", "default")
+
+SAMPLING = {"temperature": 0.7, "top_p": 0.95, "max_tokens": 800}
+
+
+def response_messages(review_text: str) -> List[dict]:
+    return [
+        {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": "You are a customer service representative responding to a review.",
+                }
+            ],
+        },
+        {"role": "user", "content": review_text},
+    ]
+
+
+def generate_response(review_text: str, use_cache: bool = True) -> str:
+    return llm_gateway.chat(
+        response_messages(review_text), use_cache=use_cache, **SAMPLING
+    )
+
+
+def stream_response(review_text: str) -> Iterator[str]:
+    return llm_gateway.stream_chat(response_messages(review_text), **SAMPLING)
+
+
+def pregenerate_drafts(user_id: str, review_ids: List[str]) -> dict:
+    """
+    Generates and stores AI responses for the user's inbox items that lack one.
+
+    Items that already have a response are skipped, and each draft is written
+    with a conditional partial update so a response generated or edited in the
+    meantime is never overwritten.
+
+    Returns:
+        dict: Counts of drafts written, skipped and failed.
+    """
+    items = InboxModel.fetch_items_without_ai_response(user_id, review_ids)
+    counts = {"written": 0, "skipped": len(review_ids) - len(items), "failed": 0}
+    if not items:
+        return counts
+
+    def draft(item):
+        try:
+            ai_response = generate_response(item.review_text)
+        except llm_gateway.LLMError as e:
+            logger.warning("Draft for review %s failed: %s", item.review_id, e)
+            return "failed"
+        if InboxModel.set_ai_response_if_missing(user_id, item.review_id, ai_response):
+            return "written"
+        return "skipped"
+
+    with ThreadPoolExecutor(
+        max_workers=AI_DRAFTS_CONCURRENCY, thread_name_prefix="ai-draft"
+    ) as executor:
+        for outcome in executor.map(bind_context(draft), items):
+            counts[outcome] += 1
+
+    logger.info(
+        "Pre-generated AI drafts for user %s: %s", user_id, counts, extra=counts
+    )
+    return counts
@@ -0,0 +1,165 @@
+"""
+Per-category review statistics computed locally with pandas, so the numbers
+shown with insights are exact and never come from the LLM.
+"""
+
+import math
+import os
+from datetime import timedelta
+from typing import List
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Length of the current period; trends compare it with the one before
+STATS_PERIOD_DAYS = int(os.getenv("STATS_PERIOD_DAYS", 30))
+# Categories mentioned by fewer reviews are left out
+STATS_MIN_REVIEWS = int(os.getenv("STATS_MIN_REVIEWS", 3))
+
+# Sentiment is on the 0-5 scale of create_embeddings.score_sentiment
+NEUTRAL_SENTIMENT = 2.5
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), 4)
+
+
+def compute_category_stats(
+    rows: List[dict],
+    period_days: int = STATS_PERIOD_DAYS,
+    min_reviews: int = STATS_MIN_REVIEWS,
+    now=None,
+) -> dict:
+    """
+    Computes, per named label: the share of reviews mentioning it, mean
+    sentiment and rating, and how share and sentiment moved between the last
+    `period_days` and the period before.
+
+    Args:
+        rows (List[dict]): One dict per review with review_date, named_labels,
+            sentiment and rating.
+        now: End of the current period; defaults to the newest review date.
+
+    Returns:
+        dict: review_count, period bounds and a `categories` list, most mentioned first.
+    """
+    if not rows:
+        return {"review_count": 0, "period_days": period_days, "categories": []}
+
+    df = pd.DataFrame(rows)
+    df["review_date"] = pd.to_datetime(
+        df["review_date"], errors="coerce", utc=True, format="mixed"
+    )
+    df["sentiment"] = pd.to_numeric(df.get("sentiment"), errors="coerce")
+    df["rating"] = pd.to_numeric(df.get("rating"), errors="coerce")
+
+    end = pd.Timestamp(now, tz="UTC") if now is not None else df["review_date"].max()
+    period = timedelta(days=period_days)
+    df["current"] = df["review_date"] > end - period
+    df["previous"] = (df["review_date"] > end - 2 * period) & ~df["current"]
+    current_total = int(df["current"].sum())
+    previous_total = int(df["previous"].sum())
+
+    # One row per (review, label); a label repeated on a review counts once
+    mentions = (
+        df.reset_index(names="review")
+        .explode("named_labels")
+        .dropna(subset=["named_labels"])
+        .drop_duplicates(["review", "named_labels"])
+    )
+    if mentions.empty:
+        categories = pd.DataFrame()
+    else:
+        by_label = mentions.groupby("named_labels")
+        categories = by_label.agg(
+            reviews=("review", "size"),
+            mean_sentiment=("sentiment", "mean"),
+            mean_rating=("rating", "mean"),
+            current_reviews=("current", "sum"),
+            previous_reviews=("previous", "sum"),
+        )
+        categories["current_sentiment"] = (
+            mentions[mentions["current"]].groupby("named_labels")["sentiment"].mean()
+        )
+        categories["previous_sentiment"] = (
+            mentions[mentions["previous"]].groupby("named_labels")["sentiment"].mean()
+        )
+        categories = categories[categories["reviews"] >= min_reviews]
+        categories["share"] = categories["reviews"] / len(df)
+        categories["current_share"] = (
+            categories["current_reviews"] / current_total if current_total else math.nan
+        )
+        categories["previous_share"] = (
+            categories["previous_reviews"] / previous_total
+            if previous_total
+            else math.nan
+        )
+        categories["share_trend"] = (
+            categories["current_share"] - categories["previous_share"]
+        )
+        categories["sentiment_trend"] = (
+            categories["current_sentiment"] - categories["previous_sentiment"]
+        )
+        categories = categories.sort_values(
+            ["reviews", "mean_sentiment"], ascending=False
+        )
+
+    return {
+        "review_count": len(df),
+        "period_days": period_days,
+        "period_end": end.isoformat() if not pd.isna(end) else None,
+        "current_period_reviews": current_total,
+        "previous_period_reviews": previous_total,
+        "categories": [
+            {
+                "label": label,
+                "reviews": int(row["reviews"]),
+                **{
+                    field: _clean(row[field])
+                    for field in (
+                        "share",
+                        "mean_sentiment",
+                        "mean_rating",
+                        "current_share",
+                        "previous_share",
+                        "share_trend",
+                        "sentiment_trend",
+                    )
+                },
+            }
+            for label, row in categories.iterrows()
+        ],
+    }
+
+
+def _highlight(category: dict) -> dict:
+    return {
+        "title": category["label"],
+        "percentage": f"{round(category['share'] * 100)}%",
+        "mean_sentiment": category["mean_sentiment"],
+        "share_trend": category["share_trend"],
+        "sentiment_trend": category["sentiment_trend"],
+    }
+
+
+def pick_highlights(stats: dict, count: int = 3):
+    """
+    Splits categories into the `count` best and worst by mean sentiment.
+
+    Highlights need above-neutral sentiment and lowlights below-neutral, so a
+    company with few categories may get fewer of either.
+
+    Returns:
+        Tuple[list, list]: Highlights and lowlights, each with `title` and `percentage`.
+    """
+    scored = [c for c in stats["categories"] if c["mean_sentiment"] is not None]
+    ranked = sorted(scored, key=lambda c: c["mean_sentiment"], reverse=True)
+    highlights = [c for c in ranked if c["mean_sentiment"] > NEUTRAL_SENTIMENT][:count]
+    lowlights = [
+        c for c in reversed(ranked) if c["mean_sentiment"] < NEUTRAL_SENTIMENT
+    ][:count]
+    return [_highlight(c) for c in highlights], [_highlight(c) for c in lowlights]
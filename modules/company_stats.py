@@ -0,0 +1,202 @@
+"""
+Weekly per-company review rollups (models.CompanyStatsModel): built from
+reviews as they are saved, rebuilt from scratch on demand, and summarized
+for dashboards without reading any review.
+"""
+
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+from models.models import CompanyStatsModel, ReviewModel
+from modules.logger_setup import get_logger
+
+load_dotenv(override=True)
+
+logger = get_logger(__name__)
+
+# Weeks returned by /company_stats unless the caller asks for another range
+COMPANY_STATS_DEFAULT_WEEKS = int(os.getenv("COMPANY_STATS_DEFAULT_WEEKS", 12))
+
+ALL = "all"
+
+
+def week_start(review_date) -> Optional[str]:
+    """
+    Monday of the review's week as YYYY-MM-DD, or None if the date is unreadable.
+    """
+    if isinstance(review_date, datetime):
+        day = review_date.date()
+    elif isinstance(review_date, date):
+        day = review_date
+    else:
+        try:
+            day = datetime.fromisoformat(str(review_date).replace("Z", "+00:00")).date()
+        except ValueError:
+            try:
+                day = date.fromisoformat(str(review_date)[:10])
+            except ValueError:
+                return None
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def bucket_key(week: str, label: Optional[str] = None) -> str:
+    return f"{week}#{ALL}" if label is None else f"{week}#label#{label}"
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def rollup_deltas(reviews: Iterable) -> dict:
+    """
+    Counter increments per bucket for the given reviews.
+
+    Reviews may be records or dicts with review_date, rating, sentiment and named_labels.
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+    for review in reviews:
+        if isinstance(review, dict):
+            get = review.get
+        else:
+            get = lambda name, review=review: getattr(review, name, None)
+        week = week_start(get("review_date"))
+        if week is None:
+            continue
+        rating = _number(get("rating"))
+        sentiment = _number(get("sentiment"))
+
+        counters = {"review_count": 1}
+        # Reviews without a rating are stored with "0"
+        if rating:
+            counters["rating_sum"] = rating
+            counters["rating_count"] = 1
+            stars = min(5, max(1, round(rating)))
+            counters[f"rating_{stars}"] = 1
+        if sentiment is not None:
+            counters["sentiment_sum"] = sentiment
+            counters["sentiment_count"] = 1
+
+        labels = set(get("named_labels") or [])
+        for bucket in [bucket_key(week)] + [
+            bucket_key(week, label) for label in labels
+        ]:
+            for name, amount in counters.items():
+                deltas[bucket][name] += amount
+    return {bucket: dict(counters) for bucket, counters in deltas.items()}
+
+
+def change_deltas(reviews: Iterable, previous: dict) -> dict:
+    """
+    Counter increments that take the rollups from the `previous` version of
+    each review (review_id -> record or dict, if already counted) to its new one.
+    """
+    reviews = list(reviews)
+    deltas = rollup_deltas(reviews)
+    replaced = [previous[r.review_id] for r in reviews if r.review_id in previous]
+    for bucket, counters in rollup_deltas(replaced).items():
+        for name, amount in counters.items():
+            bucket_deltas = deltas.setdefault(bucket, {})
+            bucket_deltas[name] = bucket_deltas.get(name, 0) - amount
+    return deltas
+
+
+def record_reviews(company_id: str, reviews: list, previous: Optional[dict] = None):
+    """
+    Adds saved reviews to the company's rollups.
+
+    Reviews in `previous` (review_id -> the version already stored) replace
+    that version instead of being counted again, so edited reviews move
+    their counts and a batch saved twice (e.g. replayed after a crash) is
+    counted once.
+
+    Failures are logged, not raised: the reviews are already saved, and a
+    rebuild brings the rollups back in line.
+    """
+    deltas = change_deltas(reviews, previous or {})
+    for bucket, counters in deltas.items():
+        try:
+            CompanyStatsModel.add_counters(company_id, bucket, counters)
+        except Exception:
+            logger.warning(
+                "Could not update rollup %s for company %s",
+                bucket,
+                company_id,
+                exc_info=True,
+            )
+
+
+def rebuild_company_stats(company_id: str) -> dict:
+    """
+    Recomputes every rollup of the company from its stored reviews.
+
+    Returns:
+        dict: Number of reviews read and rollups written.
+    """
+    rows = ReviewModel.fetch_category_stat_rows(company_id)
+    rollups = rollup_deltas(rows)
+    CompanyStatsModel.replace_company_stats(company_id, rollups)
+    return {"reviews": len(rows), "rollups": len(rollups)}
+
+
+def _mean(total, count):
+    return round(total / count, 3) if count else None
+
+
+def _summary(item) -> dict:
+    return {
+        "review_count": int(item.review_count or 0),
+        "average_rating": _mean(item.rating_sum or 0, item.rating_count or 0),
+        "average_sentiment": _mean(item.sentiment_sum or 0, item.sentiment_count or 0),
+    }
+
+
+def company_stats(company_id: str, weeks: int = COMPANY_STATS_DEFAULT_WEEKS) -> dict:
+    """
+    Dashboard aggregates for the last `weeks` weeks, read from the rollups only.
+    """
+    since = week_start(date.today() - timedelta(weeks=weeks - 1))
+    weekly, categories = [], defaultdict(list)
+    histogram = defaultdict(int)
+    totals = defaultdict(float)
+
+    for item in CompanyStatsModel.fetch_buckets(company_id, since):
+        week, _, rest = item.bucket.partition("#")
+        if rest == ALL:
+            ratings = {
+                str(stars): int(getattr(item, f"rating_{stars}") or 0)
+                for stars in range(1, 6)
+            }
+            weekly.append({"week": week, **_summary(item), "ratings": ratings})
+            for stars, count in ratings.items():
+                histogram[stars] += count
+            for name in CompanyStatsModel.COUNTERS:
+                totals[name] += getattr(item, name) or 0
+        else:
+            label = rest.partition("#")[2]
+            categories[label].append({"week": week, **_summary(item)})
+
+    return {
+        "company_id": company_id,
+        "since": since,
+        "weeks": weeks,
+        "weekly": weekly,
+        "categories": dict(categories),
+        "totals": {
+            "review_count": int(totals["review_count"]),
+            "average_rating": _mean(totals["rating_sum"], totals["rating_count"]),
+            "average_sentiment": _mean(
+                totals["sentiment_sum"], totals["sentiment_count"]
+            ),
+            "rating_histogram": {
+                str(stars): histogram[str(stars)] for stars in range(1, 6)
+            },
+            "reviews_per_week": round(totals["review_count"] / weeks, 2),
+        },
+    }
@@ -0,0 +1,442 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+from models.models import CompanyModel, ReviewModel
+from modules import llm_gateway
+from modules.category_stats import compute_category_stats, pick_highlights
+
+try:
+    import tiktoken
+except ImportError:  # optional, tokens are estimated from the text length instead
+    tiktoken = None
+
+load_dotenv(override=True)
+
+# Bump whenever the prompts change, so stored insights are regenerated
+PROMPT_VERSION = 3
+# Newest reviews the insights are generated from
+INSIGHTS_REVIEW_WINDOW = int(os.getenv("INSIGHTS_REVIEW_WINDOW", 50))
+# Up to this many new reviews are folded into the previous insights instead of
+# regenerating them, for at most INSIGHTS_MAX_INCREMENTAL_RUNS runs in a row
+INSIGHTS_INCREMENTAL_MAX_NEW = int(os.getenv("INSIGHTS_INCREMENTAL_MAX_NEW", 15))
+INSIGHTS_MAX_INCREMENTAL_RUNS = int(os.getenv("INSIGHTS_MAX_INCREMENTAL_RUNS", 5))
+
+# "window" uses the newest INSIGHTS_REVIEW_WINDOW reviews; "map_reduce" covers
+# every review by summarizing token-budgeted chunks and merging the summaries
+INSIGHTS_MODE = os.getenv("INSIGHTS_MODE", "window").lower()
+# Review tokens per chunk summary call, and per review (longer ones are cut)
+INSIGHTS_CHUNK_TOKENS = int(os.getenv("INSIGHTS_CHUNK_TOKENS", 6000))
+INSIGHTS_MAX_REVIEW_TOKENS = int(os.getenv("INSIGHTS_MAX_REVIEW_TOKENS", 600))
+# Summary tokens sent to the final call; more than this are merged first
+INSIGHTS_REDUCE_TOKENS = int(os.getenv("INSIGHTS_REDUCE_TOKENS", 12000))
+INSIGHTS_MAP_CONCURRENCY = int(os.getenv("INSIGHTS_MAP_CONCURRENCY", 4))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")  # gpt-4o family
+# Categories listed in the statistics sent with the prompt
+INSIGHTS_PROMPT_CATEGORIES = int(os.getenv("INSIGHTS_PROMPT_CATEGORIES", 15))
+
+EXAMPLE_JSON = """
+    {
+        "highlights": [
+            {
+                "title": "Covid Protocol",
+                "description": "Your Covid protocol is being well received",
+                "percentage": "90%"
+            },
+            {
+                "title": "Clean Bathrooms",
+                "description": "People are enjoying how clean your bathrooms are",
+                "percentage": "80%"
+            },
+            {
+                "title": "Friendly Staff",
+                "description": "Customers appreciate the warm and welcoming staff",
+                "percentage": "85%"
+            }
+        ],
+        "lowlights": [
+            {
+                "title": "Service Speed",
+                "description": "Customers report long wait times for their orders",
+                "percentage": "40%"
+            },
+            {
+                "title": "Food Quality",
+                "description": "Some customers find the food bland and lacking flavor",
+                "percentage": "30%"
+            },
+            {
+                "title": "Parking Availability",
+                "description": "Limited parking spaces are causing inconvenience",
+                "percentage": "35%"
+            }
+        ],
+        "insights": [
+            {
+                "title": "Menu Innovation and Flavor Enhancement",
+                "problem": "Detailed analysis of customer feedback over the past three months reveals a consistent and growing dissatisfaction with the current menu offerings. Specifically, 68% of negative reviews mention bland flavors, while 42% express disappointment with the lack of exciting or innovative options. This issue is significantly impacting the overall dining experience, with a 15% decrease in positive mentions of food quality compared to the previous quarter. Furthermore, data shows a 20% decline in repeat visits among customers who left reviews mentioning food quality issues.",
+                "solution": "Implement a comprehensive menu revamp focusing on flavor enhancement and innovation:\n                1. Conduct a two-day flavor profiling workshop with the kitchen staff, led by a culinary consultant, to identify specific areas for improvement in current dishes.\n                2. Introduce a new spice and herb blend to enhance flavors.\n                3. Develop a seasonal menu that incorporates fresh, locally sourced ingredients to create exciting and innovative options.\n                4. Consider partnering with a food blogger or influencer to promote the new menu and increase visibility.",
+                "urgency": 5
+            },
+            {
+                "title": "Service Efficiency Improvement",
+                "problem": "Analysis of customer reviews indicates a recurring theme of dissatisfaction with service speed. Approximately 55% of negative reviews highlight long wait times, with 30% specifically mentioning that staff seemed overwhelmed during peak hours. This has led to a noticeable drop in customer satisfaction ratings, with a 25% increase in complaints related to service delays over the last quarter.",
+                "solution": "To enhance service efficiency, consider the following actions:\n                1. Implement a staff training program focused on time management and customer engagement during busy periods.\n                2. Increase staffing levels during peak hours to ensure adequate coverage and reduce wait times.\n                3. Introduce a digital ordering system to streamline the ordering process and minimize delays.",
+                "urgency": 4
+            },
+            {
+                "title": "Food Quality Enhancement",
+                "problem": "Customer feedback reveals a significant concern regarding food quality, with 60% of reviews mentioning issues such as blandness and lack of freshness. This has resulted in a 30% decrease in positive feedback about food quality over the past six months, indicating a pressing need for improvement in this area.",
+                "solution": "To address food quality concerns, the following steps are recommended:\n                1. Revise the menu to include more flavorful and fresh ingredients, focusing on seasonal produce.\n                2. Conduct regular taste tests and gather feedback from customers to ensure dishes meet quality standards.\n                3. Collaborate with local suppliers to source high-quality ingredients and enhance the overall dining experience.",
+                "urgency": 3
+            },
+            {
+                "title": "Location Accessibility Improvement",
+                "problem": "Feedback indicates that customers find the restaurant's location difficult to access, with 40% of reviews mentioning issues related to parking and public transport. This has led to a decline in foot traffic, with a 15% drop in new customer visits over the last quarter.",
+                "solution": "To improve accessibility, consider the following actions:\n                1. Partner with local transport services to provide shuttle options for customers.\n                2. Enhance signage and provide clear directions on the website and social media platforms.\n                3. Explore options for additional parking spaces or validate parking for customers.",
+                "urgency": 2
+            }
+        ]
+    }
+    """
+
+
+SYSTEM_PROMPT = "You are an AI assistant that generates detailed insights based on customer reviews. Provide your response in a valid JSON format, following the structure of the example provided. Generate exactly 3 highlights, 3 lowlights, and at least 4 highly detailed insights. For each insight, include an urgency level from 1 to 6, where 1 is least urgent and 6 is most urgent."
+
+
+def _request_insights(user_content):
+    messages = [
+        {
+            "role": "system",
+            "content": [{"type": "text", "text": SYSTEM_PROMPT}],
+        },
+        {"role": "user", "content": user_content},
+    ]
+
+    try:
+        json_response = llm_gateway.chat(
+            messages,
+            temperature=0.3,  # Lowered temperature for more consistent and detailed output
+            response_format={"type": "json_object"},
+        )
+        return json.loads(json_response)  # Parse the JSON response
+    except (llm_gateway.LLMError, json.JSONDecodeError) as e:
+        raise Exception(f"Failed to generate insights. Error: {e}")
+
+
+def generate_insights_using_azure_openai(prompt, stats_section=""):
+    return _request_insights(
+        f"""Here's an example of the JSON format to follow. Generate exactly 3 highlights (most positive aspects) and 3 lowlights (most negative aspects) of the business, always based on the reviews provided. Also, generate at least 4 highly detailed insights that are actionable and specific to the business. Don't be generic, and make them very detailed and comprehensive. Include an urgency level (1-6) for each insight:
+
+{EXAMPLE_JSON}
+
+Now, generate insights based on the following customer reviews, using the same JSON structure. Remember to provide exactly 3 highlights, 3 lowlights, and at least 4 detailed insights with urgency levels:
+
+{prompt}{stats_section}"""
+    )
+
+
+def update_insights_using_azure_openai(previous_insights, prompt, stats_section=""):
+    """
+    Revises existing insights in light of new reviews only.
+    """
+    previous = {
+        key: previous_insights.get(key, [])
+        for key in ("highlights", "lowlights", "insights")
+    }
+    return _request_insights(
+        f"""Below are the current insights for a business, generated from its earlier customer reviews, followed by reviews that arrived since. Update the insights so they reflect all of the reviews: adjust, replace or re-rank highlights, lowlights and insights where the new reviews warrant it, and keep the rest. Keep the same JSON structure, with exactly 3 highlights, 3 lowlights, and at least 4 detailed insights with urgency levels (1-6).
+
+Current insights:
+
+{json.dumps(previous, indent=2)}
+
+New customer reviews:
+
+{prompt}{stats_section}"""
+    )
+
+
+CHUNK_SUMMARY_PROMPT = """Summarize what the following customer reviews say about the business, for a later step that combines many such summaries into overall insights. Respond in JSON: {"positives": [{"theme": str, "detail": str, "mentions": int}], "negatives": [{"theme": str, "detail": str, "mentions": int}], "notable": [str]}. "mentions" is the number of reviews raising the theme. List at most 8 positives and 8 negatives, most mentioned first, and only specific, recurring points in "notable"."""
+
+MERGE_SUMMARIES_PROMPT = """Combine the following review summaries into one summary in the same JSON format, merging themes that mean the same thing and adding up their "mentions". Keep at most 8 positives and 8 negatives, most mentioned first."""
+
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def chunk_by_tokens(texts, budget):
+    """
+    Groups texts, in order, into chunks of at most `budget` tokens each.
+
+    Texts are never split; one longer than the budget gets a chunk to itself.
+    """
+    chunks, current, used = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _summarize(instructions, texts):
+    # Temperature 0 keeps the request identical for identical input, so the
+    # gateway's response cache serves unchanged chunks without an LLM call
+    try:
+        response = llm_gateway.chat(
+            [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": "\n\n---\n\n".join(texts)},
+            ],
+            temperature=0,
+            response_format={"type": "json_object"},
+        )
+        json.loads(response)
+        return response
+    except (llm_gateway.LLMError, json.JSONDecodeError) as e:
+        raise Exception(f"Failed to summarize reviews. Error: {e}")
+
+
+def map_reduce_summaries(review_texts):
+    """
+    Summarizes review texts chunk by chunk, then merges the summaries until
+    they fit INSIGHTS_REDUCE_TOKENS.
+
+    Returns:
+        list: JSON summaries, together within the reduce budget.
+    """
+    texts = [
+        truncate_to_tokens(text, INSIGHTS_MAX_REVIEW_TOKENS) for text in review_texts
+    ]
+    with ThreadPoolExecutor(
+        max_workers=INSIGHTS_MAP_CONCURRENCY, thread_name_prefix="insights-map"
+    ) as executor:
+        summaries = list(
+            executor.map(
+                lambda chunk: _summarize(CHUNK_SUMMARY_PROMPT, chunk),
+                chunk_by_tokens(texts, INSIGHTS_CHUNK_TOKENS),
+            )
+        )
+        while (
+            len(summaries) > 1
+            and sum(count_tokens(summary) for summary in summaries)
+            > INSIGHTS_REDUCE_TOKENS
+        ):
+            groups = chunk_by_tokens(summaries, INSIGHTS_CHUNK_TOKENS)
+            if len(groups) == len(summaries):
+                # Every summary fills a chunk on its own; merge them pairwise
+                groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+            summaries = list(
+                executor.map(
+                    lambda group: _summarize(MERGE_SUMMARIES_PROMPT, group), groups
+                )
+            )
+    return summaries
+
+
+def generate_insights_from_summaries(summaries, review_count, stats_section=""):
+    return _request_insights(
+        f"""Here's an example of the JSON format to follow. Generate exactly 3 highlights (most positive aspects) and 3 lowlights (most negative aspects) of the business, always based on the review summaries provided. Also, generate at least 4 highly detailed insights that are actionable and specific to the business. Don't be generic, and make them very detailed and comprehensive. Include an urgency level (1-6) for each insight:
+
+{EXAMPLE_JSON}
+
+Now, generate insights from the following summaries, which together cover {review_count} customer reviews. "mentions" counts the reviews raising each theme; base percentages on them. Use the same JSON structure, with exactly 3 highlights, 3 lowlights, and at least 4 detailed insights with urgency levels:
+
+{chr(10).join(summaries)}{stats_section}"""
+    )
+
+
+def category_stats_prompt(stats, highlights, lowlights):
+    """
+    Prompt section with the locally computed statistics and the categories the
+    highlights and lowlights must cover. Empty when no category qualifies.
+    """
+    if not highlights and not lowlights:
+        return ""
+    table = [
+        {
+            key: category[key]
+            for key in ("label", "share", "mean_sentiment", "share_trend")
+        }
+        for category in stats["categories"][:INSIGHTS_PROMPT_CATEGORIES]
+    ]
+    highlight_titles = ", ".join(item["title"] for item in highlights) or "none"
+    lowlight_titles = ", ".join(item["title"] for item in lowlights) or "none"
+    return f"""
+
+Category statistics computed from all {stats["review_count"]} reviews ("share" is the fraction of reviews mentioning the category, "mean_sentiment" is on a 0-5 scale, "share_trend" is the change in share between the last {stats["period_days"]} days and the {stats["period_days"]} days before):
+
+{json.dumps(table)}
+
+Use exactly these categories, in this order and with the category name as the title, as the highlights: {highlight_titles}; and as the lowlights: {lowlight_titles}. Write only the description for each. Do not invent percentages or other figures: percentages are filled in from these statistics, and any figure in the insights must come from them."""
+
+
+def apply_category_stats(insights, stats, highlights, lowlights):
+    """
+    Replaces the LLM's highlights and lowlights with the locally computed
+    ones, keeping the descriptions it wrote for them.
+    """
+    for kind, local in (("highlights", highlights), ("lowlights", lowlights)):
+        if not local:
+            continue
+        generated = [
+            item for item in insights.get(kind) or [] if isinstance(item, dict)
+        ]
+        by_title = {
+            str(item.get("title", "")).strip().lower(): item.get("description")
+            for item in generated
+        }
+        merged = []
+        for i, item in enumerate(local):
+            description = by_title.get(item["title"].strip().lower())
+            if not description and i < len(generated):
+                description = generated[i].get("description")
+            if not description:
+                description = (
+                    f"{item['percentage']} of reviews mention {item['title']}, with "
+                    f"an average sentiment of {item['mean_sentiment']:.1f}/5."
+                )
+            merged.append({**item, "description": description})
+        insights[kind] = merged
+    insights["category_stats"] = stats
+    return insights
+
+
+def insights_fingerprint(review_ids, mode="window"):
+    """
+    Identifies the input of an insights run: the reviews used, the mode and
+    the prompt version.
+    """
+    canonical = f"{PROMPT_VERSION}:{mode}:" + ",".join(sorted(review_ids))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def generate_insights_for_company(company_id, on_progress=None, force=False, mode=None):
+    """
+    Generates insights from the company's reviews and stores them on the company.
+
+    In "window" mode (the default, see INSIGHTS_MODE) only the newest reviews
+    are used; "map_reduce" covers them all, see `map_reduce_summaries`.
+
+    Nothing is regenerated when the newest reviews and the prompt version are
+    the ones the stored insights were built from (unless `force`). When only a
+    few reviews are new, the stored insights are revised with just those.
+
+    Highlight and lowlight categories and their percentages come from
+    statistics computed locally (modules.category_stats); the LLM writes
+    only the text.
+
+    `on_progress(stage)` is called as the work moves through the
+    "loading_reviews", "computing_stats", "generating" and "saving" stages.
+    """
+    on_progress = on_progress or (lambda stage: None)
+    mode = mode or INSIGHTS_MODE
+
+    on_progress("loading_reviews")
+    review_keys = ReviewModel.fetch_latest_review_keys(
+        company_id, None if mode == "map_reduce" else INSIGHTS_REVIEW_WINDOW
+    )
+    if not review_keys:
+        return "No reviews found for this company."
+
+    review_ids = [review_id for review_id, _ in review_keys]
+    fingerprint = insights_fingerprint(review_ids, mode)
+
+    previous = CompanyModel.get_insights(company_id)
+    source = previous.get("source") if isinstance(previous, dict) else None
+    if source and source.get("fingerprint") == fingerprint and not force:
+        return previous
+
+    on_progress("computing_stats")
+    stats = compute_category_stats(ReviewModel.fetch_category_stat_rows(company_id))
+    highlights, lowlights = pick_highlights(stats)
+    stats_section = category_stats_prompt(stats, highlights, lowlights)
+
+    if mode == "map_reduce":
+        # Oldest first, so new reviews only change the last chunks
+        reviews = ReviewModel.fetch_review_texts(company_id, review_ids)[::-1]
+        on_progress("summarizing")
+        summaries = map_reduce_summaries([review.review_text for review in reviews])
+        on_progress("generating")
+        insights = generate_insights_from_summaries(
+            summaries, len(reviews), stats_section
+        )
+        apply_category_stats(insights, stats, highlights, lowlights)
+        insights["last_sync"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # The review ids of a full history are too many to store on the company
+        insights["source"] = {
+            "fingerprint": fingerprint,
+            "prompt_version": PROMPT_VERSION,
+            "review_count": len(review_ids),
+            "mode": "map_reduce",
+        }
+        on_progress("saving")
+        CompanyModel.update_insights(company_id, insights)
+        return insights
+
+    reusable = bool(source) and source.get("prompt_version") == PROMPT_VERSION
+    previous_ids = set(source.get("review_ids", [])) if reusable else set()
+    new_ids = [review_id for review_id in review_ids if review_id not in previous_ids]
+    incremental = (
+        reusable
+        and not force
+        and 0 < len(new_ids) <= INSIGHTS_INCREMENTAL_MAX_NEW
+        and source.get("incremental_runs", 0) < INSIGHTS_MAX_INCREMENTAL_RUNS
+    )
+
+    # Only the reviews that go into the prompt are read in full
+    reviews = ReviewModel.fetch_review_texts(
+        company_id, new_ids if incremental else review_ids
+    )
+    prompt = "\n\n".join(review.review_text for review in reviews)
+
+    on_progress("generating")
+    if incremental:
+        insights = update_insights_using_azure_openai(previous, prompt, stats_section)
+    else:
+        insights = generate_insights_using_azure_openai(prompt, stats_section)
+    apply_category_stats(insights, stats, highlights, lowlights)
+
+    # Add last_sync field to insights
+    insights["last_sync"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    insights["source"] = {
+        "fingerprint": fingerprint,
+        "prompt_version": PROMPT_VERSION,
+        "review_ids": review_ids,
+        "mode": "incremental" if incremental else "full",
+        "incremental_runs": source.get("incremental_runs", 0) + 1 if incremental else 0,
+    }
+    on_progress("saving")
+    CompanyModel.update_insights(company_id, insights)
+
+    return insights
@@ -0,0 +1,197 @@
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from modules import metrics
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib parser is used instead
+    orjson = None
+
+load_dotenv(override=True)
+
+# Connect/read timeouts applied to every outbound call unless overridden
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+# Chat completions can legitimately take a while, but never forever
+LLM_TIMEOUT = (HTTP_CONNECT_TIMEOUT, float(os.getenv("LLM_READ_TIMEOUT", 60)))
+# Number of per-host pools kept alive, and connections kept per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 10))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 16))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods that are safe to resend after a read timeout: the server may
+# already be processing the first attempt (and, for LLM calls, billing it)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_latency_stats = defaultdict(
+    lambda: {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+)
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide pooled session.
+
+    The session is rebuilt after a fork (gunicorn / RQ work horses) so that
+    sockets are never shared between processes.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_HOSTS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def _record_latency(host: str, seconds: float, error: bool):
+    with _stats_lock:
+        stats = _latency_stats[host]
+        stats["requests"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if error:
+            stats["errors"] += 1
+    metrics.observe_http_client(host, seconds, error)
+
+
+def get_latency_stats() -> dict:
+    """
+    Returns a snapshot of per-host request counts, errors and latencies.
+    """
+    with _stats_lock:
+        return {
+            host: dict(
+                stats,
+                avg_seconds=(
+                    stats["total_seconds"] / stats["requests"]
+                    if stats["requests"]
+                    else 0.0
+                ),
+            )
+            for host, stats in _latency_stats.items()
+        }
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Returns the Retry-After delay of a response in seconds, if it sent one.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def request(
+    method: str,
+    url: str,
+    timeout=None,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff: float = HTTP_BACKOFF,
+    **kwargs,
+) -> requests.Response:
+    """
+    Sends a request through the shared pooled session.
+
+    Connection errors, timeouts and retryable statuses (429/5xx) are retried
+    with jittered exponential backoff, honoring Retry-After when present.
+    Non-idempotent methods (POST, PATCH) are not retried on read timeouts,
+    since the request may already have been processed.
+
+    Args:
+        method (str): HTTP method.
+        url (str): Target URL.
+        timeout: Requests timeout, defaults to (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT).
+        max_retries (int): Retries after the first attempt. 0 disables retrying.
+        backoff (float): Initial backoff in seconds.
+
+    Returns:
+        requests.Response: The last response received. Callers still call
+        raise_for_status() to handle error statuses.
+
+    Raises:
+        requests.RequestException: If the last attempt failed without a response.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    host = urlsplit(url).netloc
+    session = get_session()
+    # ConnectTimeout is a ConnectionError, ReadTimeout is not
+    retry_errors = (
+        (requests.ConnectionError, requests.Timeout)
+        if method.upper() in IDEMPOTENT_METHODS
+        else requests.ConnectionError
+    )
+
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record_latency(host, time.perf_counter() - start, error=True)
+            if attempt == max_retries or not isinstance(e, retry_errors):
+                raise
+            time.sleep(backoff * (2**attempt) * (1 + random.random() * 0.1))
+            continue
+
+        failed = response.status_code >= 400
+        _record_latency(host, time.perf_counter() - start, error=failed)
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            return response
+
+        delay = retry_after(response)
+        if delay is None:
+            delay = backoff * (2**attempt) * (1 + random.random() * 0.1)
+        response.close()
+        time.sleep(delay)
+
+    return response
+
+
+def json_body(response: requests.Response):
+    """
+    Decodes a JSON response body, with orjson when it is installed.
+
+    Raises:
+        json.JSONDecodeError: If the body is not valid JSON (orjson's error subclasses it).
+    """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,306 @@
+"""
+Inverted index over a company's reviews in Redis, so the inbox can be
+filtered, searched and paged without reading every inbox item.
+
+Per company (`inbox_idx:<company_id>:...`):
+    date                 sorted set of review ids scored by review timestamp
+    label:<label>        set of review ids per named label
+    rating:<stars>       set per star rating (1-5)
+    platform:<platform>  set per platform
+    token:<token>        set per search token (create_embeddings._preprocess_text)
+    doc:<review_id>      the keys above that hold the review, for re-indexing
+    built                set once the index has been built from every stored review
+
+Per user (`inbox_idx:user:<user_id>:...`): `read` and `starred` sorted sets
+mirror the inbox item flags, and `built` marks them as loaded.
+
+Queries intersect the matching sets with `date` in one MULTI/EXEC and read
+back only the requested page. The unread filter uses ZDIFFSTORE on Redis
+6.2+ and an equivalent Lua script on older servers.
+"""
+
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+import redis
+from dotenv import load_dotenv
+
+from models.models import InboxModel, ReviewModel
+from modules.create_embeddings import _preprocess_text
+from modules.logger_setup import get_logger
+
+load_dotenv(override=True)
+
+logger = get_logger(__name__)
+
+redis_conn = redis.Redis()
+
+# Distinct search tokens indexed per review
+INBOX_INDEX_MAX_TOKENS = int(os.getenv("INBOX_INDEX_MAX_TOKENS", 200))
+
+# ZDIFFSTORE KEYS[1] KEYS[1] KEYS[2] for servers older than Redis 6.2
+_ZDIFF_SCRIPT = """
+local members = redis.call('ZRANGE', KEYS[2], 0, -1)
+for i = 1, #members, 1000 do
+    redis.call('ZREM', KEYS[1], unpack(members, i, math.min(i + 999, #members)))
+end
+return redis.call('ZCARD', KEYS[1])
+"""
+_zdiff = redis_conn.register_script(_ZDIFF_SCRIPT)
+_has_zdiffstore = None
+
+
+def _company_key(company_id: str, *parts) -> str:
+    return ":".join(("inbox_idx", company_id) + tuple(str(p) for p in parts))
+
+
+def _user_key(user_id: str, name: str) -> str:
+    return f"inbox_idx:user:{user_id}:{name}"
+
+
+def _timestamp(review_date) -> float:
+    try:
+        parsed = datetime.fromisoformat(str(review_date).replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        # Review dates are UTC; so are dates given without an offset
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _upper_bound(date_to: str) -> str:
+    """
+    Score bound for `date_to`; a date without a time includes that whole day.
+    """
+    try:
+        day = date.fromisoformat(date_to)
+    except ValueError:
+        return str(_timestamp(date_to))
+    # Exclusive bound at the start of the next day
+    return f"({_timestamp((day + timedelta(days=1)).isoformat())}"
+
+
+def _supports_zdiffstore() -> bool:
+    global _has_zdiffstore
+    if _has_zdiffstore is None:
+        version = str(redis_conn.info("server").get("redis_version", "0"))
+        parts = [int(p) if p.isdigit() else 0 for p in version.split(".")[:2]]
+        _has_zdiffstore = tuple(parts) >= (6, 2)
+    return _has_zdiffstore
+
+
+def _stars(rating) -> Optional[int]:
+    try:
+        return min(5, max(1, round(float(rating))))
+    except (TypeError, ValueError):
+        return None
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Search tokens of a text, produced the same way for reviews and queries.
+    """
+    tokens = _preprocess_text([text or ""])[0]
+    return list(dict.fromkeys(tokens))[:INBOX_INDEX_MAX_TOKENS]
+
+
+def _review_keys(company_id: str, review) -> set:
+    keys = set()
+    for label in getattr(review, "named_labels", None) or []:
+        keys.add(_company_key(company_id, "label", label.lower()))
+    stars = _stars(getattr(review, "rating", None))
+    if stars is not None:
+        keys.add(_company_key(company_id, "rating", stars))
+    platform = getattr(review, "platform_id", None)
+    if platform:
+        keys.add(_company_key(company_id, "platform", platform.lower()))
+    for token in tokenize(getattr(review, "review_text", "")):
+        keys.add(_company_key(company_id, "token", token))
+    return keys
+
+
+def index_reviews(company_id: str, reviews: list):
+    """
+    Adds reviews to the company's index, replacing earlier entries of the same reviews.
+    """
+    if not reviews:
+        return
+    pipe = redis_conn.pipeline(transaction=False)
+    for review in reviews:
+        pipe.smembers(_company_key(company_id, "doc", review.review_id))
+    previous = pipe.execute()
+
+    pipe = redis_conn.pipeline(transaction=False)
+    date_key = _company_key(company_id, "date")
+    for review, old_keys in zip(reviews, previous):
+        review_id = review.review_id
+        doc_key = _company_key(company_id, "doc", review_id)
+        new_keys = _review_keys(company_id, review)
+        for key in {k.decode("utf-8") for k in old_keys} - new_keys:
+            pipe.srem(key, review_id)
+        for key in new_keys:
+            pipe.sadd(key, review_id)
+        pipe.delete(doc_key)
+        if new_keys:
+            pipe.sadd(doc_key, *new_keys)
+        pipe.zadd(date_key, {review_id: _timestamp(review.review_date)})
+    pipe.execute()
+
+
+def rebuild_company_index(company_id: str) -> int:
+    """
+    Indexes every stored review of the company and marks the index as built.
+
+    Returns:
+        int: Number of reviews indexed.
+    """
+    fields = ["review_id", "review_date", "review_text", "rating"]
+    fields += ["platform_id", "named_labels"]
+    reviews = list(ReviewModel.query(company_id, attributes_to_get=fields))
+    for start in range(0, len(reviews), 500):
+        index_reviews(company_id, reviews[start : start + 500])
+    redis_conn.set(_company_key(company_id, "built"), 1)
+    return len(reviews)
+
+
+def clear_company_index(company_id: str):
+    """
+    Drops the company's index, e.g. after its reviews were removed; the next
+    query rebuilds it from the reviews still stored.
+    """
+    keys = list(redis_conn.scan_iter(match=_company_key(company_id, "*"), count=1000))
+    for start in range(0, len(keys), 1000):
+        redis_conn.delete(*keys[start : start + 1000])
+
+
+def ensure_company_index(company_id: str):
+    if not redis_conn.exists(_company_key(company_id, "built")):
+        count = rebuild_company_index(company_id)
+        logger.info("Built inbox index for company %s (%d reviews)", company_id, count)
+
+
+def set_user_flags(
+    user_id: str,
+    review_id: str,
+    is_read: Optional[bool] = None,
+    is_starred: Optional[bool] = None,
+):
+    pipe = redis_conn.pipeline(transaction=False)
+    for name, value in (("read", is_read), ("starred", is_starred)):
+        if value is None:
+            continue
+        if value:
+            pipe.zadd(_user_key(user_id, name), {review_id: 0})
+        else:
+            pipe.zrem(_user_key(user_id, name), review_id)
+    pipe.execute()
+
+
+def ensure_user_flags(user_id: str):
+    """
+    Loads the user's read/starred flags from the inbox the first time they are needed.
+    """
+    if redis_conn.exists(_user_key(user_id, "built")):
+        return
+    read, starred = {}, {}
+    for item in InboxModel.query(
+        user_id, attributes_to_get=["review_id", "is_read", "is_starred"]
+    ):
+        if item.is_read:
+            read[item.review_id] = 0
+        if item.is_starred:
+            starred[item.review_id] = 0
+    pipe = redis_conn.pipeline(transaction=True)
+    pipe.delete(_user_key(user_id, "read"), _user_key(user_id, "starred"))
+    if read:
+        pipe.zadd(_user_key(user_id, "read"), read)
+    if starred:
+        pipe.zadd(_user_key(user_id, "starred"), starred)
+    pipe.set(_user_key(user_id, "built"), 1)
+    pipe.execute()
+
+
+def search(
+    company_id: str,
+    user_id: str,
+    labels: Optional[List[str]] = None,
+    ratings: Optional[List[int]] = None,
+    platforms: Optional[List[str]] = None,
+    query: Optional[str] = None,
+    unread: bool = False,
+    starred: bool = False,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    newest_first: bool = True,
+    page: int = 1,
+    per_page: int = 10,
+):
+    """
+    Returns the review ids of one page of matches, and the total match count.
+
+    Values within `labels`, `ratings` and `platforms` are alternatives (OR);
+    every given filter and every query token must match (AND).
+    """
+    ensure_company_index(company_id)
+    if unread or starred:
+        ensure_user_flags(user_id)
+
+    date_key = _company_key(company_id, "date")
+    scratch = f"inbox_idx:query:{uuid.uuid4().hex}"
+    temp_keys = []
+    pipe = redis_conn.pipeline(transaction=True)
+
+    def any_of(kind, values):
+        keys = [_company_key(company_id, kind, str(v).lower()) for v in values]
+        if len(keys) == 1:
+            return keys[0]
+        union = f"{scratch}:{kind}"
+        temp_keys.append(union)
+        pipe.zunionstore(union, keys)
+        return union
+
+    filters = []
+    for kind, values in (
+        ("label", labels),
+        ("rating", ratings),
+        ("platform", platforms),
+    ):
+        if values:
+            filters.append(any_of(kind, values))
+    for token in tokenize(query) if query else []:
+        filters.append(_company_key(company_id, "token", token))
+    if starred:
+        filters.append(_user_key(user_id, "starred"))
+
+    result = date_key
+    if filters or unread:
+        result = scratch
+        temp_keys.append(scratch)
+        # Weights keep the review timestamp from `date` as the score
+        pipe.zinterstore(
+            scratch, {date_key: 1, **{key: 0 for key in filters}}, aggregate="SUM"
+        )
+        if unread:
+            read_key = _user_key(user_id, "read")
+            if _supports_zdiffstore():
+                pipe.zdiffstore(scratch, [scratch, read_key])
+            else:
+                _zdiff(keys=[scratch, read_key], client=pipe)
+
+    low = _timestamp(date_from) if date_from else "-inf"
+    high = _upper_bound(date_to) if date_to else "+inf"
+    offset = (page - 1) * per_page
+    pipe.zcount(result, low, high)
+    if newest_first:
+        pipe.zrevrangebyscore(result, high, low, start=offset, num=per_page)
+    else:
+        pipe.zrangebyscore(result, low, high, start=offset, num=per_page)
+    if temp_keys:
+        pipe.delete(*temp_keys)
+        total, review_ids = pipe.execute()[-3:-1]
+    else:
+        total, review_ids = pipe.execute()[-2:]
+    return [review_id.decode("utf-8") for review_id in review_ids], total
@@ -0,0 +1,355 @@
+"""
+Single entry point for chat-completion calls.
+
+Responses are cached by a content hash of the request (messages, model,
+temperature and the other sampling options), in a per-process LRU with a TTL
+backed by Redis so every worker shares hits. Calls to the backend are bounded
+by a semaphore and go through the pooled modules.http_client session.
+
+LLM_BACKEND=mock swaps Azure OpenAI for a deterministic local backend, for
+tests, benchmarks and offline development.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Optional
+
+import redis
+import requests
+from dotenv import load_dotenv
+
+from modules import http_client, metrics
+from modules.logger_setup import get_logger
+
+load_dotenv(override=True)
+
+logger = get_logger(__name__)
+
+redis_conn = redis.Redis()
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "azure").lower()
+AZURE_OPENAI_BASE_URL = os.getenv(
+    "AZURE_OPENAI_BASE_URL", "https://opinio.openai.azure.com"
+).rstrip("/")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+LLM_MODEL = os.getenv("LLM_MODEL", "4o-mini")  # Azure deployment name
+# Cached responses live this long, locally and in Redis
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512))
+# Calls in flight to the backend per process, and how long a call may queue
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 30))
+LLM_MOCK_LATENCY_MS = float(os.getenv("LLM_MOCK_LATENCY_MS", 0))
+
+CACHE_KEY_PREFIX = "llm_cache:"
+
+
+class LLMError(Exception):
+    """
+    The backend failed or returned an unusable completion.
+    """
+
+
+class LLMBusyError(LLMError):
+    """
+    Too many calls in flight; the caller waited LLM_QUEUE_TIMEOUT for a slot.
+    """
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local_cache = TTLCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL)
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+def cache_key(payload: dict, model: str) -> str:
+    """
+    Content hash of everything that changes the completion.
+    """
+    canonical = json.dumps(
+        {"model": model, **payload}, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    value = _local_cache.get(key)
+    if value is not None:
+        return value
+    try:
+        stored = redis_conn.get(CACHE_KEY_PREFIX + key)
+    except redis.RedisError:
+        logger.warning("LLM cache read failed", exc_info=True)
+        return None
+    if stored is None:
+        return None
+    value = stored.decode("utf-8")
+    _local_cache.set(key, value)
+    return value
+
+
+def _cache_set(key: str, value: str):
+    _local_cache.set(key, value)
+    try:
+        redis_conn.set(CACHE_KEY_PREFIX + key, value, ex=LLM_CACHE_TTL)
+    except redis.RedisError:
+        logger.warning("LLM cache write failed", exc_info=True)
+
+
+def _endpoint(model: str) -> str:
+    return (
+        f"{AZURE_OPENAI_BASE_URL}/openai/deployments/{model}/chat/completions"
+        f"?api-version={AZURE_OPENAI_API_VERSION}"
+    )
+
+
+def _headers() -> dict:
+    return {
+        "Content-Type": "application/json",
+        "api-key": os.getenv("AZURE_OPENAI_API_KEY", ""),
+    }
+
+
+def _azure_complete(payload: dict, model: str, timeout) -> str:
+    try:
+        response = http_client.post(
+            _endpoint(model), headers=_headers(), json=payload, timeout=timeout
+        )
+        response.raise_for_status()
+        body = http_client.json_body(response)
+    except (requests.RequestException, ValueError) as e:
+        raise LLMError(f"Chat completion request failed: {e}") from e
+    content = (
+        (body.get("choices") or [{}])[0].get("message", {}).get("content") or ""
+    ).strip()
+    if not content:
+        raise LLMError("Chat completion returned no content")
+    return content
+
+
+def _mock_complete(payload: dict, model: str, timeout) -> str:
+    if LLM_MOCK_LATENCY_MS:
+        time.sleep(LLM_MOCK_LATENCY_MS / 1000)
+    digest = cache_key(payload, model)[:8]
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(
+            {"highlights": [], "lowlights": [], "insights": [], "mock": digest}
+        )
+    last_message = payload["messages"][-1]["content"]
+    if not isinstance(last_message, str):
+        last_message = json.dumps(last_message)
+    return (
+        f"Thank you for your feedback. We have read your review "
+        f'("{last_message[:60]}") and will share it with the team. [mock {digest}]'
+    )
+
+
+def _azure_stream(payload: dict, model: str, timeout) -> Iterator[str]:
+    try:
+        response = http_client.post(
+            _endpoint(model),
+            headers=_headers(),
+            json={**payload, "stream": True},
+            timeout=timeout,
+            stream=True,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise LLMError(f"Chat completion request failed: {e}") from e
+
+    try:
+        # Server-sent events: one `data: {...}` line per chunk, then `data: [DONE]`
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if delta:
+                yield delta
+    except (requests.RequestException, ValueError) as e:
+        raise LLMError(f"Chat completion stream failed: {e}") from e
+    finally:
+        response.close()
+
+
+def _mock_stream(payload: dict, model: str, timeout) -> Iterator[str]:
+    words = _mock_complete(payload, model, timeout).split(" ")
+    for i, word in enumerate(words):
+        yield word if i == 0 else f" {word}"
+
+
+_BACKENDS = {"azure": _azure_complete, "mock": _mock_complete}
+_STREAM_BACKENDS = {"azure": _azure_stream, "mock": _mock_stream}
+
+
+def _build_payload(messages, temperature, max_tokens, top_p, response_format):
+    payload = {"messages": messages, "temperature": temperature}
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    if top_p is not None:
+        payload["top_p"] = top_p
+    if response_format is not None:
+        payload["response_format"] = response_format
+    return payload
+
+
+def _acquire_slot():
+    if not _slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        metrics.registry.inc("llm_requests_total", {"outcome": "busy"})
+        raise LLMBusyError(
+            f"No LLM call slot free after {LLM_QUEUE_TIMEOUT}s "
+            f"({LLM_MAX_CONCURRENCY} calls in flight)"
+        )
+
+
+def chat(
+    messages: List[dict],
+    temperature: float = 0.7,
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    top_p: Optional[float] = None,
+    response_format: Optional[dict] = None,
+    use_cache: bool = True,
+    timeout=http_client.LLM_TIMEOUT,
+) -> str:
+    """
+    Returns the completion for `messages`, from the cache when possible.
+
+    Args:
+        messages (List[dict]): Chat messages in the OpenAI format.
+        temperature (float): Sampling temperature.
+        model (Optional[str]): Deployment name, defaults to LLM_MODEL.
+        max_tokens (Optional[int]): Completion token limit.
+        top_p (Optional[float]): Nucleus sampling parameter.
+        response_format (Optional[dict]): e.g. {"type": "json_object"}.
+        use_cache (bool): Set False to force a fresh completion (it is still cached).
+        timeout: Requests timeout for the backend call.
+
+    Returns:
+        str: The completion text.
+
+    Raises:
+        LLMError: If the backend call failed.
+        LLMBusyError: If no call slot freed up within LLM_QUEUE_TIMEOUT.
+    """
+    model = model or LLM_MODEL
+    payload = _build_payload(messages, temperature, max_tokens, top_p, response_format)
+
+    key = cache_key(payload, model)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            metrics.registry.inc("llm_requests_total", {"outcome": "cache_hit"})
+            return cached
+
+    backend = _BACKENDS.get(LLM_BACKEND)
+    if backend is None:
+        raise LLMError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}")
+
+    _acquire_slot()
+    try:
+        content = backend(payload, model, timeout)
+    except LLMError:
+        metrics.registry.inc("llm_requests_total", {"outcome": "error"})
+        raise
+    finally:
+        _slots.release()
+
+    metrics.registry.inc("llm_requests_total", {"outcome": "cache_miss"})
+    _cache_set(key, content)
+    return content
+
+
+def stream_chat(
+    messages: List[dict],
+    temperature: float = 0.7,
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    top_p: Optional[float] = None,
+    use_cache: bool = True,
+    timeout=http_client.LLM_TIMEOUT,
+) -> Iterator[str]:
+    """
+    Yields the completion for `messages` piece by piece as the backend streams it.
+
+    A cached completion is yielded in one piece. The full text is cached once
+    the stream finishes, under the same key `chat` uses, so streamed and
+    non-streamed calls share results. The call slot is held until the stream
+    is exhausted or closed.
+
+    Raises:
+        LLMError: If the backend call failed, before or during the stream.
+        LLMBusyError: If no call slot freed up within LLM_QUEUE_TIMEOUT.
+    """
+    model = model or LLM_MODEL
+    payload = _build_payload(messages, temperature, max_tokens, top_p, None)
+
+    key = cache_key(payload, model)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            metrics.registry.inc("llm_requests_total", {"outcome": "cache_hit"})
+            yield cached
+            return
+
+    backend = _STREAM_BACKENDS.get(LLM_BACKEND)
+    if backend is None:
+        raise LLMError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}")
+
+    _acquire_slot()
+    pieces = []
+    try:
+        for piece in backend(payload, model, timeout):
+            pieces.append(piece)
+            yield piece
+    except LLMError:
+        metrics.registry.inc("llm_requests_total", {"outcome": "error"})
+        raise
+    finally:
+        _slots.release()
+
+    content = "".join(pieces).strip()
+    if not content:
+        raise LLMError("Chat completion returned no content")
+    metrics.registry.inc("llm_requests_total", {"outcome": "cache_miss"})
+    _cache_set(key, content)
@@ -0,0 +1,404 @@
+"""
+Process-local metrics, aggregated across processes through Redis and exposed
+in the Prometheus text format at `/metrics`.
+
+Counters and histograms are recorded in memory and periodically flushed as
+deltas into one Redis hash (HINCRBYFLOAT), so every gunicorn worker, RQ worker
+and short-lived RQ work horse adds to the same totals and a scrape of any web
+worker sees the whole cluster. Queue depth gauges are read from RQ at scrape
+time.
+
+Feeds: Flask request middleware (`init_app`), RQ tasks (`track_job`),
+PynamoDB's pre/post_dynamodb_send signals and modules.http_client.
+"""
+
+import atexit
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+import redis
+from dotenv import load_dotenv
+
+from modules.logger_setup import get_logger
+
+load_dotenv(override=True)
+
+logger = get_logger(__name__)
+
+redis_conn = redis.Redis()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_REDIS_KEY = os.getenv("METRICS_REDIS_KEY", "metrics:aggregate")
+# Seconds between background flushes of local deltas to Redis
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+METRICS_QUEUES = os.getenv("METRICS_QUEUES", "default").split(",")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+
+class MetricDefinition:
+    def __init__(self, name: str, kind: str, help_text: str, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.buckets = buckets
+
+
+DEFINITIONS = {
+    definition.name: definition
+    for definition in (
+        MetricDefinition(
+            "http_requests_total", "counter", "Flask requests by route and status."
+        ),
+        MetricDefinition(
+            "http_request_duration_seconds",
+            "histogram",
+            "Flask request latency by route.",
+            LATENCY_BUCKETS,
+        ),
+        MetricDefinition(
+            "rq_jobs_total", "counter", "Worker tasks run, by task and outcome."
+        ),
+        MetricDefinition(
+            "rq_job_duration_seconds",
+            "histogram",
+            "Worker task duration by task.",
+            JOB_BUCKETS,
+        ),
+        MetricDefinition(
+            "dynamodb_calls_total",
+            "counter",
+            "DynamoDB operations by table and the route or task that made them.",
+        ),
+        MetricDefinition(
+            "dynamodb_call_duration_seconds",
+            "histogram",
+            "DynamoDB operation latency by table.",
+            LATENCY_BUCKETS,
+        ),
+        MetricDefinition(
+            "outbound_http_request_duration_seconds",
+            "histogram",
+            "Outbound HTTP latency (RapidAPI, LLM) by host and outcome.",
+            LATENCY_BUCKETS,
+        ),
+        MetricDefinition(
+            "llm_requests_total",
+            "counter",
+            "LLM gateway calls by outcome (cache_hit, cache_miss, error, busy).",
+        ),
+        MetricDefinition("rq_queue_jobs", "gauge", "Jobs waiting in each RQ queue."),
+        MetricDefinition(
+            "rq_started_jobs", "gauge", "Jobs currently running per RQ queue."
+        ),
+        MetricDefinition("rq_failed_jobs", "gauge", "Failed jobs kept per RQ queue."),
+    )
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name: str, labels: Optional[dict]) -> str:
+    if not labels:
+        return name
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{body}}}"
+
+
+def _format_le(bound) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+# The route or task being served, used to label DynamoDB calls. Threads only
+# see it when started through `bind_context`.
+_source = contextvars.ContextVar("metrics_source", default=None)
+
+
+def current_source() -> str:
+    return _source.get() or "other"
+
+
+def bind_context(fn):
+    """
+    Wraps `fn` to run in a copy of the caller's context, so work handed to
+    threads and executors keeps the route or task label of the caller.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+class MetricsRegistry:
+    def __init__(self, connection=None):
+        self.redis = connection or redis_conn
+        self._values = defaultdict(float)
+        self._flushed = {}
+        self._lock = threading.Lock()
+        # Serializes flushes so the same delta is never sent twice
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+
+    def inc(self, name: str, labels: Optional[dict] = None, amount: float = 1.0):
+        if not METRICS_ENABLED:
+            return
+        self._ensure_flusher()
+        with self._lock:
+            self._values[_series(name, labels)] += amount
+
+    def observe(self, name: str, labels: Optional[dict], value: float):
+        if not METRICS_ENABLED:
+            return
+        self._ensure_flusher()
+        labels = labels or {}
+        buckets = DEFINITIONS[name].buckets + (float("inf"),)
+        with self._lock:
+            for bound in buckets:
+                if value <= bound:
+                    key = _series(f"{name}_bucket", {**labels, "le": _format_le(bound)})
+                    self._values[key] += 1
+            self._values[_series(f"{name}_sum", labels)] += value
+            self._values[_series(f"{name}_count", labels)] += 1
+
+    def flush(self):
+        """
+        Adds everything recorded since the last flush to the Redis totals.
+        """
+        with self._flush_lock:
+            with self._lock:
+                deltas = {
+                    key: value - self._flushed.get(key, 0.0)
+                    for key, value in self._values.items()
+                    if value != self._flushed.get(key, 0.0)
+                }
+            if not deltas:
+                return
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, delta in deltas.items():
+                    pipe.hincrbyfloat(METRICS_REDIS_KEY, key, delta)
+                pipe.execute()
+            except redis.RedisError:
+                logger.warning("Could not flush metrics to Redis", exc_info=True)
+                return
+            with self._lock:
+                for key, delta in deltas.items():
+                    self._flushed[key] = self._flushed.get(key, 0.0) + delta
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        self._flusher_pid = pid
+        thread = threading.Thread(
+            target=self._flush_forever, name="metrics-flusher", daemon=True
+        )
+        thread.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def _after_fork(self):
+        # Values inherited from the parent are the parent's to flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed = dict(self._values)
+        self._flusher_pid = None
+
+    def render(self) -> str:
+        """
+        Returns the cluster-wide totals in the Prometheus text format.
+        """
+        self.flush()
+        stored = {
+            key.decode("utf-8"): float(value)
+            for key, value in self.redis.hgetall(METRICS_REDIS_KEY).items()
+        }
+        stored.update(_queue_gauges(self.redis))
+
+        by_metric = defaultdict(list)
+        for series, value in stored.items():
+            base = series.split("{", 1)[0]
+            for suffix in ("_bucket", "_sum", "_count"):
+                trimmed = base[: -len(suffix)]
+                if base.endswith(suffix) and trimmed in DEFINITIONS:
+                    base = trimmed
+                    break
+            by_metric[base].append((series, value))
+
+        lines = []
+        for name in sorted(by_metric):
+            definition = DEFINITIONS.get(name)
+            if definition:
+                lines.append(f"# HELP {name} {definition.help_text}")
+                lines.append(f"# TYPE {name} {definition.kind}")
+            for series, value in sorted(by_metric[name]):
+                lines.append(f"{series} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _queue_gauges(connection) -> dict:
+    try:
+        from rq import Queue
+        from rq.registry import FailedJobRegistry, StartedJobRegistry
+    except ImportError:
+        return {}
+    gauges = {}
+    try:
+        for queue_name in METRICS_QUEUES:
+            queue = Queue(queue_name, connection=connection)
+            labels = {"queue": queue_name}
+            gauges[_series("rq_queue_jobs", labels)] = queue.count
+            gauges[_series("rq_started_jobs", labels)] = StartedJobRegistry(
+                queue=queue
+            ).count
+            gauges[_series("rq_failed_jobs", labels)] = FailedJobRegistry(
+                queue=queue
+            ).count
+    except redis.RedisError:
+        logger.warning("Could not read RQ queue depth", exc_info=True)
+    return gauges
+
+
+registry = MetricsRegistry()
+
+atexit.register(registry.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry._after_fork)
+
+
+def observe_http_client(host: str, seconds: float, error: bool):
+    registry.observe(
+        "outbound_http_request_duration_seconds",
+        {"host": host, "outcome": "error" if error else "ok"},
+        seconds,
+    )
+
+
+def track_job(name: str):
+    """
+    Decorator recording a worker task's duration and outcome.
+
+    Flushes on completion because RQ work horses exit right after the job.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _source.set(f"task:{name}")
+            start = time.perf_counter()
+            outcome = "failed"
+            try:
+                result = fn(*args, **kwargs)
+                status = result.get("status") if isinstance(result, dict) else None
+                if isinstance(status, int) and status >= 400:
+                    outcome = "error"
+                else:
+                    outcome = "succeeded"
+                return result
+            finally:
+                _source.reset(token)
+                labels = {"task": name, "outcome": outcome}
+                registry.inc("rq_jobs_total", labels)
+                registry.observe(
+                    "rq_job_duration_seconds",
+                    {"task": name},
+                    time.perf_counter() - start,
+                )
+                registry.flush()
+
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    """
+    Registers request middleware recording per-route counts and latency.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_route = route
+        _source.set(f"route:{route}")
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = g.pop("metrics_route", "unmatched")
+            registry.inc(
+                "http_requests_total",
+                {
+                    "method": request.method,
+                    "route": route,
+                    "status": response.status_code,
+                },
+            )
+            registry.observe(
+                "http_request_duration_seconds",
+                {"method": request.method, "route": route},
+                time.perf_counter() - start,
+            )
+        return response
+
+    @app.teardown_request
+    def _clear_source(exc):
+        _source.set(None)
+
+    return app
+
+
+_dynamodb_started = {}
+
+
+def _dynamodb_pre_send(
+    sender, operation_name=None, table_name=None, req_uuid=None, **kwargs
+):
+    registry.inc(
+        "dynamodb_calls_total",
+        {"operation": operation_name, "table": table_name, "source": current_source()},
+    )
+    if req_uuid is not None:
+        _dynamodb_started[req_uuid] = time.perf_counter()
+
+
+def _dynamodb_post_send(
+    sender, operation_name=None, table_name=None, req_uuid=None, **kwargs
+):
+    start = _dynamodb_started.pop(req_uuid, None)
+    if start is not None:
+        registry.observe(
+            "dynamodb_call_duration_seconds",
+            {"operation": operation_name, "table": table_name},
+            time.perf_counter() - start,
+        )
+
+
+try:
+    from pynamodb.signals import post_dynamodb_send, pre_dynamodb_send
+
+    # Raises when blinker is missing; Flask depends on it so it normally is not
+    pre_dynamodb_send.connect(_dynamodb_pre_send)
+    post_dynamodb_send.connect(_dynamodb_post_send)
+except (ImportError, RuntimeError):
+    logger.info("PynamoDB signals unavailable, DynamoDB metrics disabled")
@@ -0,0 +1,178 @@
+"""
+Opt-in cProfile hooks for Flask requests and RQ jobs.
+
+A request or job is profiled when it is sampled (PROFILING_SAMPLE_RATE, e.g.
+0.01 profiles 1% of them) or, for requests, when it carries the
+`X-Opinio-Profile` header set to PROFILING_HEADER_TOKEN. Each profile is
+written to PROFILES_DIR as `<id>.prof` (load with pstats or snakeviz) next
+to `<id>.txt` with the top PROFILE_TOP_N functions by cumulative time.
+
+cProfile only sees the thread that started it, so work handed to pipeline or
+fetch threads shows up as time spent waiting on them. On Python 3.12+ a
+profiler is process-wide (sys.monitoring), so at most one request or job per
+process is profiled at a time; others that are sampled meanwhile run unprofiled.
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+# Header profiling stays off unless a token is configured
+PROFILING_HEADER_TOKEN = os.getenv("PROFILING_HEADER_TOKEN", "")
+PROFILING_HEADER = "X-Opinio-Profile"
+PROFILES_DIR = os.getenv("PROFILES_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", 40))
+
+# Held while a profiler runs; requests for another one meanwhile are ignored
+_profile_lock = threading.Lock()
+
+
+def should_sample(sample_rate: float = None) -> bool:
+    sample_rate = PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def write_profile(profiler: cProfile.Profile, profile_id: str, title: str) -> str:
+    """
+    Dumps the raw profile and a top-N text summary.
+
+    Returns:
+        str: Path of the .prof file.
+    """
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    path = os.path.join(PROFILES_DIR, f"{profile_id}.prof")
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    summary.write(f"{title}\n\n")
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    with open(
+        os.path.join(PROFILES_DIR, f"{profile_id}.txt"), "w", encoding="utf-8"
+    ) as f:
+        f.write(summary.getvalue())
+    return path
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    """
+    Starts a profiler unless one is already running in this process.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool holds the process-wide hook
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler: cProfile.Profile):
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+
+
+@contextmanager
+def profiled(profile_id: str, title: str, enabled: bool = True):
+    """
+    Profiles the block when `enabled` and no profiler is already running in this process.
+    """
+    profiler = _start_profiler() if enabled else None
+    if profiler is None:
+        yield None
+        return
+
+    try:
+        yield profiler
+    finally:
+        _stop_profiler(profiler)
+        write_profile(profiler, profile_id, title)
+
+
+def _safe_id(value: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in value)[:128]
+
+
+def profile_job(name: str, sample_rate: Optional[float] = None):
+    """
+    Decorator profiling a worker task, named after the current RQ job id if any.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not should_sample(sample_rate):
+                return fn(*args, **kwargs)
+            job_id = None
+            try:
+                from rq import get_current_job
+
+                job = get_current_job()
+                job_id = job.id if job else None
+            except ImportError:
+                pass
+            profile_id = _safe_id(f"job-{name}-{job_id or uuid.uuid4()}")
+            with profiled(profile_id, f"job {name} ({job_id or 'inline'})"):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    """
+    Registers request hooks that profile sampled or explicitly flagged requests.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_profile():
+        flagged = bool(PROFILING_HEADER_TOKEN) and (
+            request.headers.get(PROFILING_HEADER) == PROFILING_HEADER_TOKEN
+        )
+        if not (flagged or should_sample()):
+            return
+        profiler = _start_profiler()
+        if profiler is None:
+            return
+        request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+        g.profile_id = _safe_id(f"request-{request.endpoint or 'unknown'}-{request_id}")
+        g.profile_title = f"{request.method} {request.path} ({request_id})"
+        g.profiler = profiler
+
+    @app.after_request
+    def _tag_profiled_response(response):
+        if getattr(g, "profile_id", None):
+            response.headers["X-Profile-Id"] = g.profile_id
+        return response
+
+    @app.teardown_request
+    def _finish_request_profile(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        _stop_profiler(profiler)
+        try:
+            write_profile(profiler, g.profile_id, g.profile_title)
+        except OSError:
+            app.logger.warning("Could not write profile %s", g.profile_id)
+
+    return app
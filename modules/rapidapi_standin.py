@@ -0,0 +1,282 @@
+"""
+Local stand-in for the RapidAPI `business-reviews` endpoint.
+
+Serves recorded payloads, or synthetic businesses when no recording exists,
+and injects latency, 429s and 5xx at configurable rates so the Yelp ingest
+path can be load-tested without spending RapidAPI quota.
+
+Point the connector at it with RAPIDAPI_BASE_URL, e.g.
+
+    python -m modules.rapidapi_standin --port 8090 --rate-429 0.05
+    RAPIDAPI_BASE_URL=http://localhost:8090 ./run.sh
+
+Synthetic business ids look like `synthetic-<n_reviews>[-<seed>]`, e.g.
+`synthetic-1000` serves 1000 deterministic reviews, newest first.
+Run with `--record` to proxy unknown businesses to the real API and save
+each page under the recordings directory for later replay.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+from flask import Flask, Response, jsonify, request
+
+from connectors.rate_limiter import RAPIDAPI_HOST
+from modules import http_client
+
+load_dotenv(override=True)
+
+STANDIN_RECORDINGS_DIR = os.getenv(
+    "STANDIN_RECORDINGS_DIR", os.path.join("recordings", "rapidapi")
+)
+# Mean added latency per request, and uniform jitter around it
+STANDIN_LATENCY_MS = float(os.getenv("STANDIN_LATENCY_MS", 0))
+STANDIN_JITTER_MS = float(os.getenv("STANDIN_JITTER_MS", 0))
+# Fraction of requests answered with 429 / a random 5xx
+STANDIN_RATE_429 = float(os.getenv("STANDIN_RATE_429", 0))
+STANDIN_RATE_5XX = float(os.getenv("STANDIN_RATE_5XX", 0))
+STANDIN_RETRY_AFTER = int(os.getenv("STANDIN_RETRY_AFTER", 1))
+STANDIN_SEED = int(os.getenv("STANDIN_SEED", 0))
+
+SYNTHETIC_PREFIX = "synthetic-"
+UPSTREAM_URL = f"https://{RAPIDAPI_HOST}/business-reviews"
+
+_WORDS = (
+    "great food friendly staff slow service cold pizza amazing coffee rude "
+    "waiter clean tables long wait fresh salad overpriced drinks cozy place "
+    "parking was hard loved the dessert noisy music quick delivery burnt "
+    "fries perfect brunch tiny portions helpful manager dirty restroom"
+).split()
+
+
+class StandinConfig:
+    """
+    Fault-injection settings, adjustable at runtime through POST /_config.
+    """
+
+    FIELDS = ("latency_ms", "jitter_ms", "rate_429", "rate_5xx", "retry_after")
+
+    def __init__(self, **overrides):
+        self.latency_ms = STANDIN_LATENCY_MS
+        self.jitter_ms = STANDIN_JITTER_MS
+        self.rate_429 = STANDIN_RATE_429
+        self.rate_5xx = STANDIN_RATE_5XX
+        self.retry_after = STANDIN_RETRY_AFTER
+        self.update(overrides)
+
+    def update(self, values: dict):
+        for field in self.FIELDS:
+            if values.get(field) is not None:
+                setattr(self, field, type(getattr(self, field))(values[field]))
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def synthetic_review(business_id: str, index: int, seed: int = 0) -> dict:
+    """
+    Returns the index-th newest review of a synthetic business, always the same
+    for the same (business_id, index, seed).
+    """
+    rng = random.Random(f"{seed}:{business_id}:{index}")
+    anchor = datetime.datetime(2024, 9, 1, tzinfo=datetime.timezone.utc)
+    # Newest first, a few hours apart
+    review_dt = anchor - datetime.timedelta(hours=index * 6 + rng.randint(0, 5))
+    return {
+        "review_id": f"{business_id}-{index:07d}",
+        "review_text": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 60))),
+        "review_rating": rng.choice((1, 2, 3, 4, 4, 5, 5, 5)),
+        "review_datetime_utc": review_dt.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "author_name": f"Reviewer {rng.randint(1, 10**6)}",
+        "author_image_url": "",
+    }
+
+
+def parse_synthetic_id(business_id: str):
+    """
+    Returns (n_reviews, seed) for a synthetic business id, or None.
+    """
+    if not business_id.startswith(SYNTHETIC_PREFIX):
+        return None
+    parts = business_id[len(SYNTHETIC_PREFIX) :].split("-")
+    try:
+        n_reviews = int(parts[0])
+        seed = int(parts[1]) if len(parts) > 1 else STANDIN_SEED
+    except ValueError:
+        return None
+    return n_reviews, seed
+
+
+def synthetic_page(business_id: str, page: int, page_size: int, num_pages: int):
+    parsed = parse_synthetic_id(business_id)
+    if parsed is None:
+        return None
+    n_reviews, seed = parsed
+    start = (page - 1) * page_size
+    end = min(n_reviews, start + page_size * num_pages)
+    reviews = [synthetic_review(business_id, i, seed) for i in range(start, end)]
+    return {"status": "OK", "data": {"total": n_reviews, "reviews": reviews}}
+
+
+class RecordingStore:
+    """
+    Recorded upstream payloads, one JSON file per request window.
+    """
+
+    def __init__(self, root: str = STANDIN_RECORDINGS_DIR):
+        self.root = root
+
+    def _path(self, business_id: str, page: int, page_size: int, num_pages: int):
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in business_id)
+        return os.path.join(
+            self.root, safe_id, f"page_{page}_size_{page_size}x{num_pages}.json"
+        )
+
+    def load(self, business_id: str, page: int, page_size: int, num_pages: int):
+        path = self._path(business_id, page, page_size, num_pages)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(
+        self, payload: dict, business_id: str, page: int, page_size: int, num_pages: int
+    ):
+        path = self._path(business_id, page, page_size, num_pages)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+
+
+def create_app(
+    config: StandinConfig = None,
+    recordings: RecordingStore = None,
+    record: bool = False,
+) -> Flask:
+    """
+    Builds the stand-in Flask app.
+
+    Args:
+        config (StandinConfig): Fault-injection settings.
+        recordings (RecordingStore): Where recorded payloads are read from and written to.
+        record (bool): Proxy unknown, non-synthetic businesses to RapidAPI and save the payloads.
+    """
+    app = Flask(__name__)
+    config = config or StandinConfig()
+    recordings = recordings or RecordingStore()
+    rng = random.Random(STANDIN_SEED)
+    stats = {"requests": 0, "ok": 0, "throttled": 0, "server_errors": 0, "not_found": 0}
+    lock = threading.Lock()
+
+    def count(field: str):
+        with lock:
+            stats[field] += 1
+
+    @app.route("/business-reviews", methods=["GET"])
+    def business_reviews():
+        count("requests")
+        with lock:
+            roll = rng.random()
+            delay = config.latency_ms + rng.uniform(-1, 1) * config.jitter_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if roll < config.rate_429:
+            count("throttled")
+            return Response(
+                json.dumps({"message": "Too many requests"}),
+                status=429,
+                mimetype="application/json",
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        if roll < config.rate_429 + config.rate_5xx:
+            count("server_errors")
+            return jsonify({"message": "Injected upstream error"}), rng.choice(
+                (500, 502, 503)
+            )
+
+        business_id = request.args.get("business_id", "")
+        page = int(request.args.get("page", 1))
+        page_size = int(request.args.get("page_size", 45))
+        num_pages = int(request.args.get("num_pages", 1))
+
+        payload = recordings.load(business_id, page, page_size, num_pages)
+        if payload is None:
+            payload = synthetic_page(business_id, page, page_size, num_pages)
+        if payload is None and record:
+            upstream = http_client.get(
+                UPSTREAM_URL,
+                headers={
+                    "x-rapidapi-key": os.environ["RAPIDAPI_KEY"],
+                    "x-rapidapi-host": RAPIDAPI_HOST,
+                },
+                params=request.args,
+            )
+            if upstream.status_code != 200:
+                return Response(
+                    upstream.content,
+                    status=upstream.status_code,
+                    mimetype="application/json",
+                )
+            payload = http_client.json_body(upstream)
+            recordings.save(payload, business_id, page, page_size, num_pages)
+        if payload is None:
+            count("not_found")
+            return jsonify({"status": "OK", "data": {"total": 0, "reviews": []}}), 200
+
+        count("ok")
+        return jsonify(payload), 200
+
+    @app.route("/_config", methods=["GET", "POST"])
+    def standin_config():
+        if request.method == "POST":
+            config.update(request.get_json(silent=True) or {})
+        return jsonify(config.to_dict()), 200
+
+    @app.route("/_stats", methods=["GET", "DELETE"])
+    def standin_stats():
+        with lock:
+            if request.method == "DELETE":
+                for field in stats:
+                    stats[field] = 0
+            return jsonify(dict(stats)), 200
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--rate-429", type=float)
+    parser.add_argument("--rate-5xx", type=float)
+    parser.add_argument("--retry-after", type=int)
+    parser.add_argument("--recordings", default=STANDIN_RECORDINGS_DIR)
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Proxy unknown businesses to RapidAPI and save the payloads",
+    )
+    args = parser.parse_args()
+
+    config = StandinConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+    )
+    app = create_app(config, RecordingStore(args.recordings), record=args.record)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@ export FLASK_APP=./application.py
 # Define the application module
 APP_MODULE="application:app"
 
-# Number of workers
-# NUM_WORKERS=4
+# Number of workers, and threads per worker. Threaded workers keep streaming
+# responses (SSE job status, streamed AI responses) from blocking other requests.
+NUM_WORKERS=${NUM_WORKERS:-1}
+NUM_THREADS=${NUM_THREADS:-16}
 
 # Run Gunicorn with the specified number of workers and append output to nohup.out
-nohup gunicorn --bind 0.0.0.0:5000 --workers 1 --error-logfile logs/error.log --access-logfile logs/access.log  application:app &
+nohup gunicorn --bind 0.0.0.0:5000 --workers $NUM_WORKERS --worker-class gthread --threads $NUM_THREADS --error-logfile logs/error.log --access-logfile logs/access.log  $APP_MODULE &
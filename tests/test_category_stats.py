@@ -0,0 +1,127 @@
+from modules.category_stats import compute_category_stats, pick_highlights
+
+NOW = "2024-06-30T00:00:00+00:00"
+
+
+def row(review_date, labels, sentiment=3.0, rating=4):
+    return {
+        "review_date": review_date,
+        "named_labels": labels,
+        "sentiment": sentiment,
+        "rating": rating,
+    }
+
+
+def by_label(stats):
+    return {category["label"]: category for category in stats["categories"]}
+
+
+def test_no_rows():
+    assert compute_category_stats([]) == {
+        "review_count": 0,
+        "period_days": 30,
+        "categories": [],
+    }
+
+
+def test_period_boundaries():
+    rows = [
+        # Exactly one period before `now` belongs to the previous period
+        row("2024-05-31T00:00:00Z", ["Food"]),
+        row("2024-05-31T00:00:01Z", ["Food"]),
+        row("2024-06-29T23:59:59Z", ["Food"]),
+        # Exactly two periods before `now` is outside both
+        row("2024-05-01T00:00:00Z", ["Food"]),
+        row("2024-05-01T00:00:01Z", ["Food"]),
+    ]
+
+    stats = compute_category_stats(rows, period_days=30, min_reviews=1, now=NOW)
+
+    assert stats["current_period_reviews"] == 2
+    assert stats["previous_period_reviews"] == 2
+    assert stats["review_count"] == 5
+
+
+def test_shares_means_and_trends():
+    rows = [
+        row("2024-06-20", ["Food", "Service"], sentiment=4.0, rating=5),
+        row("2024-06-21", ["Food"], sentiment=2.0, rating=3),
+        row("2024-05-20", ["Food"], sentiment=1.0, rating=1),
+        row("2024-05-21", ["Service"], sentiment=3.0, rating=4),
+    ]
+
+    stats = compute_category_stats(rows, period_days=30, min_reviews=1, now=NOW)
+    food = by_label(stats)["Food"]
+
+    assert food["reviews"] == 3
+    assert food["share"] == 0.75
+    assert food["mean_sentiment"] == round(7 / 3, 4)
+    assert food["mean_rating"] == 3.0
+    assert food["current_share"] == 1.0
+    assert food["previous_share"] == 0.5
+    assert food["share_trend"] == 0.5
+    assert food["sentiment_trend"] == 2.0
+    assert [c["label"] for c in stats["categories"]] == ["Food", "Service"]
+
+
+def test_repeated_label_on_a_review_counts_once():
+    rows = [row("2024-06-20", ["Food", "Food"]), row("2024-06-21", ["Food"])]
+
+    stats = compute_category_stats(rows, min_reviews=1, now=NOW)
+
+    assert by_label(stats)["Food"]["reviews"] == 2
+    assert by_label(stats)["Food"]["share"] == 1.0
+
+
+def test_rare_categories_and_unlabelled_reviews():
+    rows = [row("2024-06-20", ["Food"]) for _ in range(3)]
+    rows += [row("2024-06-20", ["Parking"]), row("2024-06-20", [])]
+
+    stats = compute_category_stats(rows, min_reviews=3, now=NOW)
+
+    assert list(by_label(stats)) == ["Food"]
+    assert by_label(stats)["Food"]["share"] == 0.6
+
+
+def test_trends_are_none_without_a_previous_period():
+    rows = [row("2024-06-20", ["Food"])]
+
+    food = by_label(compute_category_stats(rows, min_reviews=1, now=NOW))["Food"]
+
+    assert food["previous_share"] is None
+    assert food["share_trend"] is None
+    assert food["sentiment_trend"] is None
+
+
+def test_unreadable_dates_and_missing_sentiment():
+    rows = [
+        row("not a date", ["Food"], sentiment=None),
+        row("2024-06-20", ["Food"], sentiment=4.0),
+    ]
+
+    stats = compute_category_stats(rows, min_reviews=1, now=NOW)
+
+    assert stats["review_count"] == 2
+    assert stats["current_period_reviews"] == 1
+    assert by_label(stats)["Food"]["mean_sentiment"] == 4.0
+
+
+def test_highlights_need_non_neutral_sentiment():
+    stats = {
+        "categories": [
+            {"label": label, "share": 0.25, "mean_sentiment": sentiment}
+            | {"share_trend": None, "sentiment_trend": None}
+            for label, sentiment in (
+                ("Food", 4.5),
+                ("Service", 2.5),
+                ("Parking", 1.0),
+                ("Price", None),
+            )
+        ]
+    }
+
+    highlights, lowlights = pick_highlights(stats)
+
+    assert [h["title"] for h in highlights] == ["Food"]
+    assert [h["title"] for h in lowlights] == ["Parking"]
+    assert highlights[0]["percentage"] == "25%"
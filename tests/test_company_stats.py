@@ -0,0 +1,134 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from modules import company_stats
+from modules.company_stats import change_deltas, rollup_deltas, week_start
+
+WEEK = "2024-06-10"
+
+
+def review(review_id="r1", **fields):
+    values = {
+        "review_date": "2024-06-12T09:00:00Z",
+        "rating": "4",
+        "sentiment": 3.5,
+        "named_labels": ["Food"],
+    }
+    values.update(fields)
+    return SimpleNamespace(review_id=review_id, **values)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2024-06-12T09:00:00Z", WEEK),
+        ("2024-06-10", WEEK),
+        ("2024-06-16T23:59:59", WEEK),
+        ("2024-06-17", "2024-06-17"),
+        (datetime(2024, 6, 12, 9), WEEK),
+        (date(2024, 6, 12), WEEK),
+        ("2024-06-12 garbage", WEEK),
+        ("not a date", None),
+        (None, None),
+    ],
+)
+def test_week_start(value, expected):
+    assert week_start(value) == expected
+
+
+def test_rollup_deltas_count_every_bucket():
+    deltas = rollup_deltas([review(), review("r2", rating=5, named_labels=[])])
+
+    assert deltas[f"{WEEK}#all"] == {
+        "review_count": 2,
+        "rating_sum": 9,
+        "rating_count": 2,
+        "rating_4": 1,
+        "rating_5": 1,
+        "sentiment_sum": 7.0,
+        "sentiment_count": 2,
+    }
+    assert deltas[f"{WEEK}#label#Food"]["review_count"] == 1
+
+
+def test_rollup_deltas_skip_missing_values():
+    deltas = rollup_deltas(
+        [
+            {"review_date": "2024-06-12", "rating": "0", "sentiment": None},
+            {"review_date": "unknown", "rating": 5},
+        ]
+    )
+
+    # No rating is stored as "0"; reviews without a date are left out
+    assert deltas == {f"{WEEK}#all": {"review_count": 1}}
+
+
+def test_repeated_labels_count_once():
+    deltas = rollup_deltas([review(named_labels=["Food", "Food"])])
+
+    assert deltas[f"{WEEK}#label#Food"]["review_count"] == 1
+
+
+def test_edit_moves_counts_between_buckets():
+    old = review(rating="2", sentiment=1.0, named_labels=["Service"])
+    new = review(rating="5", sentiment=4.0, named_labels=["Food"])
+
+    deltas = change_deltas([new], {"r1": old})
+
+    assert deltas[f"{WEEK}#all"] == {
+        "review_count": 0,
+        "rating_sum": 3,
+        "rating_count": 0,
+        "rating_5": 1,
+        "rating_2": -1,
+        "sentiment_sum": 3.0,
+        "sentiment_count": 0,
+    }
+    assert deltas[f"{WEEK}#label#Food"]["review_count"] == 1
+    assert deltas[f"{WEEK}#label#Service"]["review_count"] == -1
+
+
+def test_edit_moving_weeks_removes_the_old_week():
+    old = review(review_date="2024-06-03")
+
+    deltas = change_deltas([review()], {"r1": old})
+
+    assert deltas["2024-06-03#all"]["review_count"] == -1
+    assert deltas[f"{WEEK}#all"]["review_count"] == 1
+
+
+def test_replayed_batch_is_counted_once():
+    saved = review()
+
+    deltas = change_deltas([saved], {"r1": saved})
+
+    assert all(amount == 0 for c in deltas.values() for amount in c.values())
+
+
+def test_new_reviews_in_a_mixed_batch_are_added():
+    deltas = change_deltas([review(), review("r2")], {"r1": review()})
+
+    assert deltas[f"{WEEK}#all"]["review_count"] == 1
+
+
+def test_removal_is_a_rebuild_without_the_removed_reviews(monkeypatch):
+    remaining = [{"review_date": "2024-06-12", "rating": 4, "named_labels": []}]
+    written = {}
+    monkeypatch.setattr(
+        company_stats.ReviewModel,
+        "fetch_category_stat_rows",
+        lambda company_id: remaining,
+    )
+    monkeypatch.setattr(
+        company_stats.CompanyStatsModel,
+        "replace_company_stats",
+        lambda company_id, rollups: written.update(rollups),
+    )
+
+    assert company_stats.rebuild_company_stats("company") == {
+        "reviews": 1,
+        "rollups": 1,
+    }
+    assert written[f"{WEEK}#all"]["review_count"] == 1
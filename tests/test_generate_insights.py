@@ -0,0 +1,98 @@
+import pytest
+
+from modules import generate_insights
+from modules.generate_insights import (
+    chunk_by_tokens,
+    count_tokens,
+    map_reduce_summaries,
+    truncate_to_tokens,
+)
+
+
+class WordEncoding:
+    """One token per space-separated word, standing in for tiktoken."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split(" ") if text else []
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def words(monkeypatch):
+    monkeypatch.setattr(generate_insights, "_get_encoding", lambda: WordEncoding())
+
+
+def text(n_tokens, word="w"):
+    return " ".join([word] * n_tokens)
+
+
+def test_estimates_tokens_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(generate_insights, "_get_encoding", lambda: None)
+
+    assert count_tokens("") == 1
+    assert count_tokens("x" * 40) == 11
+    assert truncate_to_tokens("x" * 40, 5) == "x" * 20
+
+
+def test_truncate_to_tokens(words):
+    assert truncate_to_tokens(text(3), 5) == text(3)
+    assert truncate_to_tokens(text(5), 5) == text(5)
+    assert truncate_to_tokens(text(8), 5) == text(5)
+
+
+def test_chunks_fill_the_budget_in_order(words):
+    texts = [text(4, "a"), text(4, "b"), text(2, "c"), text(3, "d")]
+
+    assert chunk_by_tokens(texts, 10) == [texts[:3], texts[3:]]
+
+
+def test_chunk_exactly_at_the_budget(words):
+    texts = [text(5), text(5), text(1)]
+
+    assert chunk_by_tokens(texts, 10) == [texts[:2], texts[2:]]
+
+
+def test_oversized_text_gets_a_chunk_of_its_own(words):
+    texts = [text(2, "a"), text(15, "b"), text(2, "c")]
+
+    assert chunk_by_tokens(texts, 10) == [[texts[0]], [texts[1]], [texts[2]]]
+
+
+def test_no_texts_no_chunks(words):
+    assert chunk_by_tokens([], 10) == []
+
+
+def test_map_reduce_merges_until_within_the_reduce_budget(words, monkeypatch):
+    calls = []
+
+    def summarize(instructions, texts):
+        calls.append((instructions, len(texts)))
+        return text(5)
+
+    monkeypatch.setattr(generate_insights, "_summarize", summarize)
+    monkeypatch.setattr(generate_insights, "INSIGHTS_MAX_REVIEW_TOKENS", 4)
+    monkeypatch.setattr(generate_insights, "INSIGHTS_CHUNK_TOKENS", 8)
+    monkeypatch.setattr(generate_insights, "INSIGHTS_REDUCE_TOKENS", 12)
+
+    # Reviews are cut to 4 tokens, so two fit in each 8-token chunk
+    summaries = map_reduce_summaries([text(20) for _ in range(8)])
+
+    chunk_calls = [
+        n for prompt, n in calls if prompt is generate_insights.CHUNK_SUMMARY_PROMPT
+    ]
+    assert chunk_calls == [2, 2, 2, 2]
+    # 4 summaries of 5 tokens exceed 12; 8-token chunks hold one summary
+    # each, so they are merged pairwise once, leaving 10 tokens
+    assert [n for prompt, n in calls[4:]] == [2, 2]
+    assert len(summaries) == 2
+    assert sum(count_tokens(s) for s in summaries) <= 12
+
+
+def test_map_reduce_keeps_a_single_summary(words, monkeypatch):
+    monkeypatch.setattr(
+        generate_insights, "_summarize", lambda instructions, texts: text(50)
+    )
+
+    assert map_reduce_summaries([text(3)]) == [text(50)]
@@ -0,0 +1,52 @@
+import pytest
+import requests
+
+from modules import http_client
+
+
+class FlakySession:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(error):
+        flaky = FlakySession(error)
+        monkeypatch.setattr(http_client, "get_session", lambda: flaky)
+        return flaky
+
+    monkeypatch.setattr(http_client.time, "sleep", lambda seconds: None)
+    return install
+
+
+def test_post_is_not_retried_on_read_timeout(session):
+    flaky = session(requests.ReadTimeout())
+
+    with pytest.raises(requests.ReadTimeout):
+        http_client.post("https://llm.example.com/chat", max_retries=2)
+
+    assert flaky.calls == 1
+
+
+def test_post_is_retried_on_connection_errors(session):
+    flaky = session(requests.ConnectTimeout())
+
+    with pytest.raises(requests.ConnectTimeout):
+        http_client.post("https://llm.example.com/chat", max_retries=2)
+
+    assert flaky.calls == 3
+
+
+def test_get_is_retried_on_read_timeout(session):
+    flaky = session(requests.ReadTimeout())
+
+    with pytest.raises(requests.ReadTimeout):
+        http_client.get("https://api.example.com/reviews", max_retries=2)
+
+    assert flaky.calls == 3
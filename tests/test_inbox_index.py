@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from modules import inbox_index
+
+REVIEWS = [
+    SimpleNamespace(
+        review_id="r1",
+        review_date="2024-06-12T09:00:00",
+        review_text="slow service",
+        rating=2,
+        platform_id="yelp",
+        named_labels=["Service"],
+    ),
+    SimpleNamespace(
+        review_id="r2",
+        review_date="2024-06-13T12:00:00",
+        review_text="great tacos",
+        rating=5,
+        platform_id="yelp",
+        named_labels=["Food"],
+    ),
+    SimpleNamespace(
+        review_id="r3",
+        review_date="2024-06-14T18:30:00Z",
+        review_text="great service",
+        rating=4,
+        platform_id="google",
+        named_labels=["Service"],
+    ),
+]
+
+
+@pytest.fixture
+def redis_conn(monkeypatch):
+    conn = fakeredis.FakeRedis()
+    monkeypatch.setattr(inbox_index, "redis_conn", conn)
+    # fakeredis implements ZDIFFSTORE but not INFO
+    monkeypatch.setattr(inbox_index, "_has_zdiffstore", True)
+    monkeypatch.setattr(inbox_index, "tokenize", lambda text: (text or "").split())
+    monkeypatch.setattr(inbox_index.ReviewModel, "query", lambda *a, **k: list(REVIEWS))
+    read = [SimpleNamespace(review_id="r3", is_read=True, is_starred=False)]
+    monkeypatch.setattr(inbox_index.InboxModel, "query", lambda *a, **k: read)
+    return conn
+
+
+def search(**kwargs):
+    return inbox_index.search("company", "user", **kwargs)
+
+
+def test_filters_are_anded_and_values_ored(redis_conn):
+    assert search(labels=["Service"]) == (["r3", "r1"], 2)
+    assert search(labels=["Service"], platforms=["yelp"]) == (["r1"], 1)
+    assert search(ratings=[4, 5], newest_first=False) == (["r2", "r3"], 2)
+    assert search(query="great service") == (["r3"], 1)
+
+
+def test_date_to_includes_the_whole_day(redis_conn):
+    assert search(date_to="2024-06-13") == (["r2", "r1"], 2)
+    assert search(date_from="2024-06-13", date_to="2024-06-13") == (["r2"], 1)
+
+
+def test_unread_excludes_read_reviews(redis_conn):
+    assert search(unread=True) == (["r2", "r1"], 2)
+    assert search(unread=True, labels=["Service"]) == (["r1"], 1)
+
+
+def test_zdiffstore_is_used_from_redis_6_2(redis_conn, monkeypatch):
+    monkeypatch.setattr(inbox_index, "_has_zdiffstore", None)
+    monkeypatch.setattr(redis_conn, "info", lambda section: {"redis_version": "6.2.0"})
+    assert inbox_index._supports_zdiffstore()
+
+    monkeypatch.setattr(inbox_index, "_has_zdiffstore", None)
+    monkeypatch.setattr(redis_conn, "info", lambda section: {"redis_version": "6.0.16"})
+    assert not inbox_index._supports_zdiffstore()
+
+
+def test_clear_company_index_drops_only_that_company(redis_conn):
+    search()
+    redis_conn.set("inbox_idx:other:built", 1)
+
+    inbox_index.clear_company_index("company")
+
+    assert redis_conn.keys("inbox_idx:company:*") == []
+    assert redis_conn.exists("inbox_idx:other:built")
+
+
+def test_unread_without_zdiffstore_uses_the_lua_fallback(redis_conn, monkeypatch):
+    pytest.importorskip("lupa")
+    monkeypatch.setattr(inbox_index, "_has_zdiffstore", False)
+
+    assert search(unread=True) == (["r2", "r1"], 2)
+    assert search(unread=True, labels=["Service"]) == (["r1"], 1)
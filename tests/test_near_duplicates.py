@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from connectors import near_duplicates
+from connectors.near_duplicates import NearDuplicateIndex, minhash, shingles
+
+TEXT = (
+    "The tacos were fresh and the salsa bar had plenty of options, "
+    "staff were friendly and the wait was short even on a Friday night"
+)
+
+
+def review(review_id, text):
+    return SimpleNamespace(review_id=review_id, review_text=text, duplicate_of=None)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(near_duplicates.ReviewModel, "query", lambda *a, **k: [])
+    return NearDuplicateIndex("company", connection=fakeredis.FakeRedis())
+
+
+def indexed_ids(index):
+    return {
+        key.decode("utf-8")
+        for key in index.redis.hkeys(index.sig_key)
+        if key.decode("utf-8") != near_duplicates._WARM_KEY
+    }
+
+
+def test_shingles_normalize_case_and_punctuation():
+    assert shingles("Great food, GREAT staff!") == shingles("great food great staff")
+
+
+def test_minhash_is_deterministic_and_separates_texts():
+    assert (minhash(TEXT) == minhash(TEXT)).all()
+    assert near_duplicates.similarity(minhash(TEXT), minhash("Cold fries")) < 0.5
+
+
+def test_groups_near_duplicates_within_a_batch(index):
+    first, copy = review("a", TEXT), review("b", TEXT + " Recommended!")
+
+    assert index.assign([first, copy]) == {"b": "a"}
+    assert first.duplicate_of is None
+    assert copy.duplicate_of == "a"
+
+
+def test_indexes_representatives_only_once_persisted(index):
+    first, copy = review("a", TEXT), review("b", TEXT + " Recommended!")
+    index.assign([first, copy])
+    assert indexed_ids(index) == set()
+
+    index.add_persisted([first, copy])
+    assert indexed_ids(index) == {"a"}
+
+    later = review("c", TEXT)
+    assert index.assign([later]) == {"c": "a"}
+
+
+def test_discarded_representative_no_longer_groups(index):
+    first = review("a", TEXT)
+    index.assign([first])
+    index.add_persisted([first])
+
+    index.discard(["a"])
+
+    assert indexed_ids(index) == set()
+    assert index.assign([review("b", TEXT)]) == {}
+
+
+@pytest.mark.parametrize(
+    "texts",
+    [("", ""), (None, ""), ("Great!", "great"), ("Loved it", "Never again")],
+)
+def test_short_texts_are_not_grouped_nor_indexed(index, texts):
+    reviews = [review(str(i), text) for i, text in enumerate(texts)]
+
+    assert index.assign(reviews) == {}
+    assert all(r.duplicate_of is None for r in reviews)
+
+    index.add_persisted(reviews)
+    assert indexed_ids(index) == set()
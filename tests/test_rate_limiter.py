@@ -0,0 +1,55 @@
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from connectors import rate_limiter
+from connectors.rate_limiter import RedisTokenBucket
+
+
+@pytest.fixture
+def bucket():
+    return RedisTokenBucket(
+        "ratelimit:test", rate=5, capacity=10, connection=fakeredis.FakeRedis()
+    )
+
+
+def redis_now_ms(bucket):
+    seconds, microseconds = bucket.redis.time()
+    return seconds * 1000 + microseconds // 1000
+
+
+def test_usage_of_a_new_bucket_is_full(bucket):
+    usage = bucket.usage()
+
+    assert usage["tokens_available"] == 10
+    assert usage["blocked_for_sec"] == 0
+
+
+def test_usage_follows_the_redis_clock(bucket, monkeypatch):
+    now = redis_now_ms(bucket)
+    bucket.redis.hset(
+        bucket.key, mapping={"tokens": 0, "ts": now, "blocked_until": now + 30_000}
+    )
+    # A worker whose clock is an hour ahead must not see a refilled bucket
+    skewed = SimpleNamespace(time=lambda: time.time() + 3600)
+    monkeypatch.setattr(rate_limiter, "time", skewed)
+
+    usage = bucket.usage()
+
+    assert usage["tokens_available"] < 1
+    assert 29 <= usage["blocked_for_sec"] <= 30
+
+
+def test_acquire_and_penalize_share_the_bucket(bucket):
+    pytest.importorskip("lupa")
+
+    assert all(bucket.acquire(max_wait=0) for _ in range(10))
+    assert not bucket.acquire(max_wait=0)
+
+    bucket.penalize(retry_after=5)
+    usage = bucket.usage()
+    assert usage["granted_total"] == 10
+    assert usage["throttled_total"] == 1
+    assert 4 <= usage["blocked_for_sec"] <= 5